@@ -0,0 +1,10 @@
+def __getattr__(name):
+    # `gunicorn app:app` still finds the web app, but importing the package for
+    # Celery, scripts or a submodule no longer builds it
+    if name == 'app':
+        from .app import create_app
+        flask_app = create_app()
+        # Importing the submodule bound `app` to it; point it at the Flask app
+        globals()['app'] = flask_app
+        return flask_app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
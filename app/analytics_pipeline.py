@@ -0,0 +1,153 @@
+"""Non-blocking analytics delivery.
+
+Request handlers only put events on a bounded in-process queue; a background
+thread drains it in batches and hands them to Segment, or appends them to a
+local JSON-lines file when ``mode`` is ``file``. When the queue is full the
+newest events are sampled in place of the oldest ones instead of blocking the
+request, and whatever is queued is flushed on shutdown.
+"""
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+
+import segment.analytics as segment_analytics
+
+logger = logging.getLogger(__name__)
+
+MODES = ('segment', 'file', 'off')
+
+
+class AnalyticsPipeline:
+    def __init__(self, mode='segment', max_queue_size=10000, batch_size=100, flush_interval=1.0,
+                 overflow_sample_rate=0.1, file_path='analytics_events.jsonl'):
+        if mode not in MODES:
+            raise ValueError(f"Unknown analytics mode: {mode}")
+        self.mode = mode
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.overflow_sample_rate = overflow_sample_rate
+        self.file_path = file_path
+        self.queue = queue.Queue(maxsize=max_queue_size)
+        self.counters = Counter()
+        self._stopping = threading.Event()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        atexit.register(self.shutdown)
+
+    @classmethod
+    def from_config(cls, config):
+        settings = config.get('analytics', {})
+        return cls(
+            mode=os.getenv('ANALYTICS_MODE', settings.get('mode', 'segment')),
+            max_queue_size=int(settings.get('max_queue_size', 10000)),
+            batch_size=int(settings.get('batch_size', 100)),
+            flush_interval=float(settings.get('flush_interval', 1.0)),
+            overflow_sample_rate=float(settings.get('overflow_sample_rate', 0.1)),
+            file_path=settings.get('file_path', 'analytics_events.jsonl')
+        )
+
+    def track(self, user_id, event, properties=None):
+        self._enqueue({'type': 'track', 'user_id': user_id, 'event': event, 'properties': properties or {}})
+
+    def identify(self, user_id, traits=None):
+        self._enqueue({'type': 'identify', 'user_id': user_id, 'traits': traits or {}})
+
+    def flush(self, timeout=5.0):
+        """Block until everything queued so far has been delivered, or ``timeout`` passes."""
+        deadline = time.time() + timeout
+        while self.queue.unfinished_tasks and time.time() < deadline:
+            time.sleep(0.01)
+        if self.mode == 'segment':
+            segment_analytics.flush()
+
+    def shutdown(self, timeout=5.0):
+        if self._thread is None:
+            return
+        self._stopping.set()
+        self._thread.join(timeout)
+        self._thread = None
+        if self.mode == 'segment':
+            segment_analytics.flush()
+        if self.counters['dropped']:
+            logger.warning(f"Analytics dropped {self.counters['dropped']} events on queue overflow")
+
+    def _enqueue(self, item):
+        if self.mode == 'off':
+            return
+        self._ensure_started()
+        item['timestamp'] = time.time()
+        try:
+            self.queue.put_nowait(item)
+            return
+        except queue.Full:
+            pass
+
+        # Sample overflow: occasionally replace the oldest event so recent activity stays visible
+        self.counters['dropped'] += 1
+        if random.random() < self.overflow_sample_rate:
+            try:
+                self.queue.get_nowait()
+                self.queue.task_done()
+                self.queue.put_nowait(item)
+                self.counters['sampled'] += 1
+            except (queue.Empty, queue.Full):
+                pass
+
+    def _ensure_started(self):
+        # Started on first use so forked workers each get their own flusher
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name='analytics-flusher', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not (self._stopping.is_set() and self.queue.empty()):
+            batch = self._next_batch()
+            if not batch:
+                continue
+            try:
+                self._deliver(batch)
+                self.counters['delivered'] += len(batch)
+            except Exception as e:
+                self.counters['failed'] += len(batch)
+                logger.error(f"Error delivering {len(batch)} analytics events: {str(e)}")
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+    def _next_batch(self):
+        batch = []
+        deadline = time.time() + self.flush_interval
+        while len(batch) < self.batch_size:
+            timeout = deadline - time.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+        return batch
+
+    def _deliver(self, batch):
+        if self.mode == 'file':
+            with open(self.file_path, 'a') as f:
+                for item in batch:
+                    f.write(json.dumps(item, default=str) + '\n')
+            return
+
+        for item in batch:
+            timestamp = datetime.fromtimestamp(item['timestamp'], tz=timezone.utc)
+            if item['type'] == 'track':
+                segment_analytics.track(item['user_id'], item['event'], item['properties'], timestamp=timestamp)
+            else:
+                segment_analytics.identify(item['user_id'], item['traits'], timestamp=timestamp)
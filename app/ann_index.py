@@ -0,0 +1,107 @@
+"""Inverted-file (IVF) approximate nearest-neighbour index in NumPy.
+
+Rows of the embedding matrix are clustered with spherical k-means into
+``nlist`` lists. A query scores the centroids, then only the rows in its
+``nprobe`` closest lists, so the work per query shrinks roughly by
+``nlist / nprobe`` at the cost of occasionally missing a neighbour that sits
+in an unprobed list. The index is saved next to the embedding store and
+records which matrix generation it was built from, so a stale index is
+never used against a newer catalog.
+"""
+import logging
+import os
+import time
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+CHUNK_ROWS = 65536
+
+
+def index_path(base):
+    return f"{base}.ivf.npz"
+
+
+def normalized(matrix, start, stop):
+    chunk = np.asarray(matrix[start:stop], dtype=np.float32)
+    norms = np.linalg.norm(chunk, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return chunk / norms
+
+
+def assign(matrix, centroids):
+    """Nearest centroid for every row, computed a chunk at a time."""
+    labels = np.empty(len(matrix), dtype=np.int32)
+    for start in range(0, len(matrix), CHUNK_ROWS):
+        chunk = normalized(matrix, start, start + CHUNK_ROWS)
+        labels[start:start + len(chunk)] = np.argmax(chunk @ centroids.T, axis=1)
+    return labels
+
+
+class IVFIndex:
+    def __init__(self, centroids, order, offsets, matrix_file):
+        self.centroids = centroids
+        self.order = order
+        self.offsets = offsets
+        self.matrix_file = matrix_file
+
+    @property
+    def nlist(self):
+        return len(self.centroids)
+
+    @classmethod
+    def build(cls, matrix, matrix_file, nlist=None, iterations=10, train_sample=50000, seed=0):
+        start = time.time()
+        rows = len(matrix)
+        nlist = min(nlist or max(1, int(4 * np.sqrt(rows))), rows)
+        rng = np.random.default_rng(seed)
+
+        sample_rows = np.sort(rng.choice(rows, size=min(rows, max(train_sample, nlist)), replace=False))
+        sample = np.asarray(matrix[sample_rows], dtype=np.float32)
+        sample /= np.maximum(np.linalg.norm(sample, axis=1, keepdims=True), 1e-12)
+
+        centroids = sample[rng.choice(len(sample), size=nlist, replace=False)].copy()
+        for _ in range(iterations):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, sample)
+            counts = np.bincount(labels, minlength=nlist)
+            # Empty lists are reseeded from random sample points
+            empty = counts == 0
+            if empty.any():
+                sums[empty] = sample[rng.choice(len(sample), size=int(empty.sum()), replace=False)]
+            centroids = sums / np.maximum(np.linalg.norm(sums, axis=1, keepdims=True), 1e-12)
+
+        labels = assign(matrix, centroids)
+        order = np.argsort(labels, kind='stable').astype(np.int64)
+        offsets = np.zeros(nlist + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum(np.bincount(labels, minlength=nlist))
+        logger.info(f"Built IVF index with {nlist} lists over {rows} rows in {time.time() - start:.1f}s")
+        return cls(centroids.astype(np.float32), order, offsets, matrix_file)
+
+    def save(self, base):
+        path = index_path(base)
+        tmp_path = f"{path}.tmp.npz"
+        np.savez(tmp_path, centroids=self.centroids, order=self.order, offsets=self.offsets,
+                 matrix_file=np.array(self.matrix_file))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, base, matrix_file=None):
+        """Load the index for ``base``; ``None`` if missing or built from another generation."""
+        try:
+            with np.load(index_path(base)) as data:
+                index = cls(data['centroids'], data['order'], data['offsets'], str(data['matrix_file']))
+        except FileNotFoundError:
+            return None
+        if matrix_file is not None and index.matrix_file != matrix_file:
+            logger.warning(f"Ignoring stale IVF index built for {index.matrix_file}")
+            return None
+        return index
+
+    def probe(self, query, nprobe=8):
+        """Matrix rows in the ``nprobe`` lists closest to the normalized ``query``."""
+        nprobe = min(nprobe, self.nlist)
+        lists = np.argpartition(-(self.centroids @ query), nprobe - 1)[:nprobe]
+        return np.concatenate([self.order[self.offsets[i]:self.offsets[i + 1]] for i in lists])
@@ -1,60 +1,54 @@
-print("Starting app initialization...")
 import logging
-from openai import OpenAIError
-from flask import Flask, request, jsonify, render_template, send_from_directory, session, Response, stream_with_context, make_response
-from flask_session import Session
-from flask_wtf import FlaskForm, CSRFProtect
-from flask_wtf.csrf import CSRFProtect, generate_csrf, validate_csrf
+import os
+import threading
+from flask import Blueprint, Flask, current_app, request, jsonify, render_template, send_from_directory, session, Response, stream_with_context, make_response
+from flask_wtf.csrf import CSRFProtect, validate_csrf
 from flask_basicauth import BasicAuth
 from flask_jwt_extended import JWTManager, create_access_token
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 from flask_cors import CORS
-from .initialize import client, analytics, config
-from .session_manager import get_or_create_thread, ensure_str
-from .redis_config import redis_connection
-from .ask_helpers import ChatForm, generate_responses, create_or_get_thread
-from dotenv import load_dotenv
-import os
-from wtforms import TextAreaField
-from wtforms.validators import DataRequired
-
-print("Imports complete")
+from .initialize import analytics, config
+from .session_manager import ensure_str, invalidate_user_info
+from .redis_config import redis_connection, get_connection_pool, check_connection
+from .redis_session import LazyRedisSessionInterface
+from .csrf_tokens import issue_csrf_token
+from .logging_config import configure_logging
+from .product_cache import product_cache
+from .ask_helpers import ChatForm, generate_responses, stream_responses, streaming_available, create_or_get_thread
 
-logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
-try:
-    # Load environment variables
-    load_dotenv()
-    print("Environment variables loaded")
-        
-    print("Creating Flask app")
+CORS_ORIGINS = ["https://www.eqbay.co", "https://eqbay.co", "https://epona.eqbay.co", "http://localhost:*", "http://127.0.0.1:*"]
+
+# Pages and the widget bootstrap hand out a token; static files, SSE streams
+# and API calls don't need one minted on every response
+CSRF_BOOTSTRAP_ENDPOINTS = {'main.home', 'main.chat_widget', 'main.get_welcome_message'}
+
+bp = Blueprint('main', __name__)
+csrf = CSRFProtect()
+basic_auth = BasicAuth()
+jwt = JWTManager()
+
+
+def create_app():
+    """Build the web app; nothing here connects to Redis or OpenAI."""
+    configure_logging(config)
     app = Flask(__name__, template_folder='templates', static_folder='static')
-    print("Flask app created")
 
-    print("Setting up CORS")
     CORS(app, resources={
         r"/*": {
-            "origins": ["https://www.eqbay.co", "https://eqbay.co", "https://epona.eqbay.co", "http://localhost:*", "http://127.0.0.1:*"],
+            "origins": CORS_ORIGINS,
             "methods": ["GET", "POST", "OPTIONS"],
             "allow_headers": ["Content-Type", "X-CSRFToken"],
             "supports_credentials": True
         }
     })
-    print("CORS setup complete")
-
-    print("Loading Segment configuration")
-    analytics.write_key = config['segment_write_key']
-    print("Segment configuration loaded")
 
-    print("Updating Flask configuration")
     app.config.update(
         SECRET_KEY=os.getenv('SECRET_KEY'),
-        SESSION_TYPE='redis',
         SESSION_PERMANENT=False,
         SESSION_USE_SIGNER=True,
-        SESSION_REDIS=redis_connection,
         SESSION_COOKIE_HTTPONLY=True,
         SESSION_COOKIE_SECURE=True,  # Ensure cookies are sent over HTTPS only
         SESSION_COOKIE_SAMESITE='Lax',
@@ -62,294 +56,298 @@ try:
         REMEMBER_COOKIE_SECURE=True, # Ensure 'remember me' cookies are sent over HTTPS
         WTF_CSRF_ENABLED=True,
         WTF_CSRF_SECRET_KEY=os.environ.get("SECRET_KEY"),
-        WTF_CSRF_SSL_STRICT=True     # Ensure CSRF protection is strict for HTTPS
+        WTF_CSRF_SSL_STRICT=True,    # Ensure CSRF protection is strict for HTTPS
+        CSRF_ROTATE_AFTER=config.get('csrf_rotate_after', 1800)
     )
-    print("Flask configuration updated")
-
-    print("Setting additional Flask config options")
     app.config['BASIC_AUTH_USERNAME'] = os.getenv('BASIC_AUTH_USERNAME')
     app.config['BASIC_AUTH_PASSWORD'] = os.getenv('BASIC_AUTH_PASSWORD')
     app.config['CELERY_BROKER_URL'] = os.getenv("REDIS_URL", "redis://localhost:6379/0")
     app.config['CELERY_RESULT_BACKEND'] = os.getenv("REDIS_URL", "redis://localhost:6379/0")
     app.config['ASSISTANT_ID'] = config['assistant_id']
-    app.config['DEBUG'] = True
+    app.config['DEBUG'] = os.getenv('FLASK_DEBUG', '0') == '1'
     app.config['PREFERRED_URL_SCHEME'] = 'https'
-    print("Additional Flask config options set")
-
-    # Initialize extensions
-    print("Initializing Flask extensions")
-    Session(app)
-    print("Session initialized")
-    csrf = CSRFProtect(app)
-    print("CSRF Protection initialized")
-    basic_auth = BasicAuth(app)
-    print("Basic Auth initialized")
-    jwt = JWTManager(app)
-    print("JWT Manager initialized")
-    limiter = Limiter(
+
+    app.session_interface = LazyRedisSessionInterface(
+        redis_connection,
+        key_prefix=app.config['SESSION_KEY_PREFIX'],
+        use_signer=app.config['SESSION_USE_SIGNER'],
+        permanent=app.config['SESSION_PERMANENT'],
+        # Static files and the health check never need the visitor's session
+        skip_paths=config.get('session_skip_paths', ['/static/', '/test_json'])
+    )
+    csrf.init_app(app)
+    basic_auth.init_app(app)
+    jwt.init_app(app)
+    Limiter(
         get_remote_address,
         app=app,
         storage_uri=os.getenv("REDIS_URL"),
-        storage_options={"socket_connect_timeout": 30},
+        # Share the app's pooled connections instead of opening a separate set
+        storage_options={"connection_pool": get_connection_pool()},
         strategy="fixed-window", # or "moving-window"
     )
-    print("Rate Limiter initialized")
+    app.register_blueprint(bp)
+
+    if config.get('startup_redis_check', True):
+        # Report an unreachable Redis in the logs without holding up worker boot
+        threading.Thread(target=check_connection, args=(redis_connection,), name='redis-check', daemon=True).start()
+    return app
+
+
+def ensure_session_id():
+    if 'sid' not in session:
+        session['sid'] = os.urandom(16).hex()
+    return session['sid']
+
+def log_request_info():
+    current_app.logger.debug('Headers: %s', request.headers)
+    current_app.logger.debug('Body: %s', request.get_data())
+    current_app.logger.debug('URL: %s', request.url)
+    current_app.logger.debug('Method: %s', request.method)
+
 
-    print("Checking Redis connection")
+@bp.after_app_request
+def add_csrf_token_to_response(response):
+    if request.endpoint in CSRF_BOOTSTRAP_ENDPOINTS and request.method != 'OPTIONS' and response.status_code == 200:
+        response.headers.set('X-CSRFToken', issue_csrf_token())
+    return response
+
+@bp.route('/')
+def home():
     try:
-        redis_connection.ping()
-        print("Successfully connected to Redis")
-    except redis_connection.ConnectionError as e:
-        print(f"Failed to connect to Redis. Error: {str(e)}")
-        print("Make sure Redis is running and the REDIS_URL in your .env file is correct.")
+        issue_csrf_token()
+        form = ChatForm()
+        session_id = ensure_str(ensure_session_id())
+        current_app.logger.debug("Home route: session_id: %s", session_id)
+        
+        # Identify the user (if you have the anonymous_id)
+        anonymous_id = request.args.get('anonymous_id')  # Get from query parameter
+        if anonymous_id:
+            analytics.identify(session_id, {
+                'anonymous_id': anonymous_id
+            })
+        
+        return render_template('index.html', form=form, session_id=session_id)
     except Exception as e:
-        print(f"An unexpected error occurred while connecting to Redis: {str(e)}")
+        current_app.logger.error(f"Error in home route: {str(e)}")
+        return "An error occurred. Please try again later.", 500
+
+@bp.route('/token', methods=['POST'])
+def generate_token():
+    current_app.logger.debug("Token route: session.sid type: %s", type(session.sid))
+    token = create_access_token(identity=str(session.sid))
+    return jsonify(access_token=token)
+
+@bp.route('/ask', methods=['POST'])
+@csrf.exempt
+def ask():
+    try:
+        question = request.form.get('question')
+        csrf_token = request.form.get('csrf_token')
 
-    class ChatForm(FlaskForm):
-        question = TextAreaField('Question', validators=[DataRequired()])
+        logger.debug("Received /ask: question=%r", question)
 
-    def ensure_session_id():
-        if 'sid' not in session:
-            session['sid'] = os.urandom(16).hex()
-        return session['sid']
-    
-    @app.before_request
-    def before_request():
-        app.logger.debug(f"Session before request: {session.items()}")
-        if 'sid' not in session:
-            session['sid'] = os.urandom(16).hex()
-        app.logger.debug(f"Session after potential sid assignment: {session.items()}")
-    def log_request_info():
-        app.logger.debug('Headers: %s', request.headers)
-        app.logger.debug('Body: %s', request.get_data())
-        app.logger.debug('URL: %s', request.url)
-        app.logger.debug('Method: %s', request.method)
-
-
-    @app.after_request
-    def add_csrf_token_to_response(response):
-        response.headers.set('X-CSRFToken', generate_csrf())
-        return response
+        if not question or not csrf_token:
+            logger.debug("Missing question or CSRF token")
+            return jsonify({"error": "Missing question or CSRF token"}), 400
 
-    @app.route('/')
-    def home():
         try:
-            form = ChatForm()
-            if 'sid' not in session:
-                session['sid'] = os.urandom(16).hex()
-            session_id = ensure_str(session['sid'])
-            app.logger.debug(f"Home route: session_id: {session_id}")
-            
-            # Identify the user (if you have the anonymous_id)
-            anonymous_id = request.args.get('anonymous_id')  # Get from query parameter
-            if anonymous_id:
-                analytics.identify(session_id, {
-                    'anonymous_id': anonymous_id
-                })
-            
-            return render_template('index.html', form=form, session_id=session_id)
+            validate_csrf(csrf_token)
         except Exception as e:
-            app.logger.error(f"Error in home route: {str(e)}")
-            return "An error occurred. Please try again later.", 500
-
-    @app.route('/token', methods=['POST'])
-    def generate_token():
-        app.logger.debug(f"Token route: session.sid type: {type(session.sid)}")
-        token = create_access_token(identity=str(session.sid))
-        return jsonify(access_token=token)
-
-    @app.route('/ask', methods=['POST'])
-    @csrf.exempt
-    def ask():
-        try:
-            logger.debug("Entered the /ask endpoint")
-            logger.debug(f"Received request: {request.method} {request.url}")
-            logger.debug(f"Form data: {request.form}")
-
-            question = request.form.get('question')
-            csrf_token = request.form.get('csrf_token')
+            logger.error(f"CSRF validation failed: {str(e)}")
+            return jsonify({"error": "Invalid CSRF token"}), 400
 
-            logger.debug(f"Extracted form fields - question: {question}, csrf_token: {csrf_token}")
+        # The token was checked above, so the form doesn't check it again
+        form = ChatForm(request.form, meta={'csrf': False})
+        if form.validate():
+            question = form.question.data
 
-            if not question or not csrf_token:
-                logger.debug("Missing question or CSRF token")
-                return jsonify({"error": "Missing question or CSRF token"}), 400
+            session_id = ensure_session_id()
+            logger.debug("Session ID in /ask route: %s", session_id)
 
-            try:
-                logger.debug("Validating CSRF token")
-                validate_csrf(csrf_token)
-                logger.debug("CSRF token validated")
-            except Exception as e:
-                logger.error(f"CSRF validation failed: {str(e)}")
-                return jsonify({"error": "Invalid CSRF token"}), 400
-
-            form = ChatForm(request.form)
-            logger.debug(f"Form validation status: {form.validate()}")
-            if form.validate():
-                question = form.question.data
-                logger.debug(f"Validated question: {question}")
-
-                session_id = session.get('sid')
-                if not session_id:
-                    session_id = os.urandom(16).hex()
-                    session['sid'] = session_id
-                logger.debug(f"Session ID in /ask route: {session_id}")
-
-                if 'chat_session_started' not in session:
-                    analytics.track(session_id, 'Chat Session Started', {
-                        'session_id': session_id
-                    })
-                    session['chat_session_started'] = True
-                
-                analytics.track(session_id, 'User Message Sent', {
-                    'question': question
+            if 'chat_session_started' not in session:
+                analytics.track(session_id, 'Chat Session Started', {
+                    'session_id': session_id
                 })
+                session['chat_session_started'] = True
+            
+            analytics.track(session_id, 'User Message Sent', {
+                'question': question
+            })
 
-                try:
+            try:
+                if streaming_available():
+                    thread_id, event_stream = create_or_get_thread(question, stream=True)
+                    logger.debug("Thread ID: %s, streaming run events", thread_id)
+                    body = stream_with_context(stream_responses(thread_id, event_stream))
+                else:
+                    # Fall back to polling the run status
                     thread_id, run = create_or_get_thread(question)
-                    logger.debug(f"Thread ID: {thread_id}, Run ID: {run.id}")
+                    logger.debug("Thread ID: %s, Run ID: %s", thread_id, run.id)
+                    body = stream_with_context(generate_responses(thread_id, run))
 
-                    return Response(stream_with_context(generate_responses(thread_id, run)), content_type='text/event-stream')
+                response = Response(body, content_type='text/event-stream')
+                # Keep proxies from buffering token deltas
+                response.headers['Cache-Control'] = 'no-cache'
+                response.headers['X-Accel-Buffering'] = 'no'
+                return response
 
-                except Exception as e:
-                    logger.error(f"Error in thread creation or run: {str(e)}")
-                    return jsonify({"error": f"An error occurred: {str(e)}"}), 500
+            except Exception as e:
+                logger.error(f"Error in thread creation or run: {str(e)}")
+                return jsonify({"error": f"An error occurred: {str(e)}"}), 500
 
-            else:
-                logger.debug(f"Form validation errors: {form.errors}")
-                return jsonify({"error": "Invalid form submission"}), 400
+        else:
+            logger.debug("Form validation errors: %s", form.errors)
+            return jsonify({"error": "Invalid form submission"}), 400
 
-        except Exception as e:
-            logger.error(f"An unexpected error occurred in /ask endpoint: {str(e)}")
-            return jsonify({"error": "An unexpected error occurred"}), 500
-
-    @app.route('/welcome', methods=['GET', 'OPTIONS'])
-    def get_welcome_message():
-        if request.method == 'OPTIONS':
-            response = make_response()
-            response.headers.add('Access-Control-Allow-Origin', 'https://www.eqbay.co')
-            response.headers.add('Access-Control-Allow-Headers', 'Content-Type')
-            response.headers.add('Access-Control-Allow-Methods', 'GET,OPTIONS')
-            response.headers.add('Access-Control-Allow-Credentials', 'true')
-            return response
-
-        welcome_message = config.get('welcome_message', '')
-        csrf_token = generate_csrf()
-        response = jsonify({
-            "response": welcome_message,
-            "csrf_token": csrf_token
-        })
+    except Exception as e:
+        logger.error(f"An unexpected error occurred in /ask endpoint: {str(e)}")
+        return jsonify({"error": "An unexpected error occurred"}), 500
+
+@bp.route('/welcome', methods=['GET', 'OPTIONS'])
+def get_welcome_message():
+    if request.method == 'OPTIONS':
+        response = make_response()
         response.headers.add('Access-Control-Allow-Origin', 'https://www.eqbay.co')
+        response.headers.add('Access-Control-Allow-Headers', 'Content-Type')
+        response.headers.add('Access-Control-Allow-Methods', 'GET,OPTIONS')
         response.headers.add('Access-Control-Allow-Credentials', 'true')
         return response
 
-    @app.route('/static/<path:filename>')
-    def serve_static(filename):
-        return send_from_directory(app.static_folder, filename)
+    welcome_message = config.get('welcome_message', '')
+    csrf_token = issue_csrf_token()
+    response = jsonify({
+        "response": welcome_message,
+        "csrf_token": csrf_token
+    })
+    response.headers.add('Access-Control-Allow-Origin', 'https://www.eqbay.co')
+    response.headers.add('Access-Control-Allow-Credentials', 'true')
+    return response
 
-    @app.route('/clear_session', methods=['POST'])
-    @basic_auth.required
-    def clear_session():
-        try:
-            redis_connection.flushall()
-            return "Session cache cleared", 200
-        except Exception as e:
-            app.logger.error(f"Error clearing session: {str(e)}")
-            return "Error clearing session", 500
-        
-    @app.route('/test_json', methods=['GET', 'POST'])
-    def test_json():
-        return jsonify({"status": "success", "message": "Test JSON response"})
-        
-    @app.route('/chat_widget')
-    def chat_widget():
-        form = ChatForm()
-        session_id = ensure_str(session.get('sid', os.urandom(16).hex()))
-        
-        # Get anonymous_id from query parameters
-        anonymous_id = request.args.get('anonymous_id')
-        
-        if anonymous_id:
-            analytics.track(anonymous_id, 'Epona Widget Opened', {
-                'session_id': session_id
-            })
-        
-        return render_template('chat_widget.html', form=form)
+@bp.route('/static/<path:filename>')
+def serve_static(filename):
+    return send_from_directory(current_app.static_folder, filename)
 
-    @app.route('/embed_chat.js')
-    def embed_chat():
-        session_id = ensure_str(session.get('sid', os.urandom(16).hex()))
-        
-        # Get session info from query parameters instead of JSON
-        anonymous_id = request.args.get('anonymous_id')
-        
-        if anonymous_id:
-            analytics.identify(session_id, {
-                'anonymous_id': anonymous_id
-            })
-        
-        return send_from_directory(app.static_folder, 'embed_chat.js')
+@bp.route('/clear_session', methods=['POST'])
+@basic_auth.required
+def clear_session():
+    try:
+        redis_connection.flushall()
+        return "Session cache cleared", 200
+    except Exception as e:
+        current_app.logger.error(f"Error clearing session: {str(e)}")
+        return "Error clearing session", 500
+    
+@bp.route('/product_cache/invalidate', methods=['POST'])
+@csrf.exempt
+@basic_auth.required
+def invalidate_product_cache():
+    payload = request.get_json(silent=True) or {}
+    product_ids = payload.get('product_ids')
+    if product_ids is not None and not isinstance(product_ids, list):
+        return jsonify({"status": "error", "message": "product_ids must be a list"}), 400
+
+    invalidated = product_cache.invalidate(product_ids)
+    return jsonify({"status": "success", "invalidated": invalidated})
+
+@bp.route('/product_cache/stats')
+@basic_auth.required
+def product_cache_stats():
+    return jsonify(product_cache.stats())
+
+@bp.route('/test_json', methods=['GET', 'POST'])
+def test_json():
+    return jsonify({"status": "success", "message": "Test JSON response"})
+    
+@bp.route('/chat_widget')
+def chat_widget():
+    issue_csrf_token()
+    form = ChatForm()
+    session_id = ensure_str(ensure_session_id())
     
-    @app.route('/end_chat', methods=['POST'])
-    def end_chat():
-        session_id = ensure_str(session.get('sid', os.urandom(16).hex()))
-        analytics.track(session_id, 'Chat Session Ended', {
+    # Get anonymous_id from query parameters
+    anonymous_id = request.args.get('anonymous_id')
+    
+    if anonymous_id:
+        analytics.track(anonymous_id, 'Epona Widget Opened', {
             'session_id': session_id
         })
-        session.pop('chat_session_started', None)
-        return jsonify({"status": "success"})
-        
-    @app.route('/update_session_info', methods=['POST', 'OPTIONS'])
-    @csrf.exempt
-    def update_session_info():
-        if request.method == 'OPTIONS':
-            response = make_response()
-            response.headers.add('Access-Control-Allow-Origin', request.headers.get('Origin'))
-            response.headers.add('Access-Control-Allow-Headers', 'Content-Type, X-CSRFToken')
-            response.headers.add('Access-Control-Allow-Methods', 'POST, OPTIONS')
-            response.headers.add('Access-Control-Allow-Credentials', 'true')
-            return response
+    
+    return render_template('chat_widget.html', form=form)
 
-        try:
-            origin = request.headers.get('Origin')
-            allowed_origins = ['https://www.eqbay.co', 'https://eqbay.co', 'https://epona.eqbay.co']
-            if not origin or not any(allowed_origin in origin for allowed_origin in allowed_origins):
-                return jsonify({"status": "error", "message": "Invalid or missing origin"}), 400
+@bp.route('/embed_chat.js')
+def embed_chat():
+    session_id = ensure_str(ensure_session_id())
+    
+    # Get session info from query parameters instead of JSON
+    anonymous_id = request.args.get('anonymous_id')
+    
+    if anonymous_id:
+        analytics.identify(session_id, {
+            'anonymous_id': anonymous_id
+        })
+    
+    return send_from_directory(current_app.static_folder, 'embed_chat.js')
 
-            session_info = request.json
-            app.logger.debug(f'Received session info: {session_info}')  # Additional logging here
+@bp.route('/end_chat', methods=['POST'])
+def end_chat():
+    session_id = ensure_str(ensure_session_id())
+    analytics.track(session_id, 'Chat Session Ended', {
+        'session_id': session_id
+    })
+    session.pop('chat_session_started', None)
+    return jsonify({"status": "success"})
+    
+@bp.route('/update_session_info', methods=['POST', 'OPTIONS'])
+@csrf.exempt
+def update_session_info():
+    if request.method == 'OPTIONS':
+        response = make_response()
+        response.headers.add('Access-Control-Allow-Origin', request.headers.get('Origin'))
+        response.headers.add('Access-Control-Allow-Headers', 'Content-Type, X-CSRFToken')
+        response.headers.add('Access-Control-Allow-Methods', 'POST, OPTIONS')
+        response.headers.add('Access-Control-Allow-Credentials', 'true')
+        return response
 
-            if not session_info:
-                return jsonify({"status": "error", "message": "No session info provided"}), 400
+    try:
+        origin = request.headers.get('Origin')
+        allowed_origins = ['https://www.eqbay.co', 'https://eqbay.co', 'https://epona.eqbay.co']
+        if not origin or not any(allowed_origin in origin for allowed_origin in allowed_origins):
+            return jsonify({"status": "error", "message": "Invalid or missing origin"}), 400
 
-            # Avoid overwriting the entire client_session_info
-            if 'client_session_info' in session:
-                current_info = session['client_session_info']
-                current_info.update(session_info)
-                session['client_session_info'] = current_info
-            else:
-                session['client_session_info'] = session_info
+        session_info = request.json
+        current_app.logger.debug("Received session info: %s", session_info)
 
-            app.logger.debug(f'Updated session info: {session["client_session_info"]}')
+        if not session_info:
+            return jsonify({"status": "error", "message": "No session info provided"}), 400
 
-            response = jsonify({"status": "success", "message": "Session info updated"})
-            response.headers.add('Access-Control-Allow-Origin', origin)
-            response.headers.add('Access-Control-Allow-Credentials', 'true')
-            return response
+        # Avoid overwriting the entire client_session_info
+        if 'client_session_info' in session:
+            current_info = session['client_session_info']
+            current_info.update(session_info)
+            session['client_session_info'] = current_info
+        else:
+            session['client_session_info'] = session_info
 
-        except Exception as e:
-            app.logger.error(f"Error in /update_session_info: {str(e)}")
-            response = jsonify({"status": "error", "message": str(e)})
-            response.headers["Access-Control-Allow-Origin"] = origin if origin else 'https://www.eqbay.co'
-            response.headers["Access-Control-Allow-Credentials"] = "true"
-            return response
+        current_app.logger.debug("Updated session info: %s", session['client_session_info'])
+
+        # The profile may have changed, fetch it again on the next tool call
+        if session.get('sid'):
+            invalidate_user_info(session['sid'])
+
+        response = jsonify({"status": "success", "message": "Session info updated"})
+        response.headers.add('Access-Control-Allow-Origin', origin)
+        response.headers.add('Access-Control-Allow-Credentials', 'true')
+        return response
+
+    except Exception as e:
+        current_app.logger.error(f"Error in /update_session_info: {str(e)}")
+        response = jsonify({"status": "error", "message": str(e)})
+        response.headers["Access-Control-Allow-Origin"] = origin if origin else 'https://www.eqbay.co'
+        response.headers["Access-Control-Allow-Credentials"] = "true"
+        return response
 
-except Exception as e:
-    print(f"An error occurred during initialization: {str(e)}")
-    import traceback
-    traceback.print_exc()
 
 if __name__ == '__main__':
-    print("Starting Flask development server...")
+    app = create_app()
     app.run(debug=True, ssl_context=('cert.pem', 'key.pem'))
-    print("Flask server stopped.")
\ No newline at end of file
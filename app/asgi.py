@@ -0,0 +1,410 @@
+"""Asyncio serving mode for the chat endpoints.
+
+``/ask`` and ``/welcome`` are served natively on the event loop with the async
+OpenAI client and async Redis, so a single process can hold hundreds of open
+SSE streams while runs are in progress. Every other route is handed to the
+regular Flask app through a WSGI adapter.
+
+Session and CSRF semantics match the Flask app: the same signed session
+cookie, the same Redis session records and the same Flask-WTF tokens.
+
+Run with:
+    gunicorn -k uvicorn.workers.UvicornWorker app.asgi:application
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+import uuid
+from fnmatch import fnmatch
+from http.cookies import SimpleCookie
+from io import BytesIO
+
+from asgiref.wsgi import WsgiToAsgi
+from flask_wtf.csrf import validate_csrf
+from itsdangerous import BadSignature, Signer
+from openai import BadRequestError, NotFoundError
+from werkzeug.formparser import parse_form_data
+from werkzeug.http import dump_cookie
+
+from .app import create_app, CORS_ORIGINS
+from .ask_helpers import ACTIVE_RUN_WAIT, RUN_FINAL_STATES, RunStreamState, active_run_conflict, collect_tool_outputs, error_event, final_events
+from .csrf_tokens import issue_csrf_token
+from .initialize import analytics, config
+from .openai_client import get_async_openai_client
+from .redis_config import get_async_redis
+from .session_manager import THREAD_ACTIVITY_KEY
+
+logger = logging.getLogger(__name__)
+
+MAX_BODY_SIZE = 64 * 1024
+
+flask_app = create_app()
+async_redis = get_async_redis()
+
+wsgi_application = WsgiToAsgi(flask_app)
+
+
+def _session_signer():
+    # Same signer Flask-Session uses for SESSION_USE_SIGNER
+    return Signer(flask_app.secret_key, salt='flask-session', key_derivation='hmac')
+
+
+def _serialize(data):
+    serializer = flask_app.session_interface.serializer
+    return serializer.encode(data) if hasattr(serializer, 'encode') else serializer.dumps(data)
+
+
+def _deserialize(raw):
+    serializer = flask_app.session_interface.serializer
+    return serializer.decode(raw) if hasattr(serializer, 'decode') else serializer.loads(raw)
+
+
+async def load_session(headers):
+    """Load the Flask session for this request from Redis.
+
+    Returns ``(sid, data)``; ``sid`` is None when the visitor has no valid
+    session cookie yet.
+    """
+    cookies = SimpleCookie(headers.get('cookie', ''))
+    morsel = cookies.get(flask_app.config['SESSION_COOKIE_NAME'])
+    if not morsel:
+        return None, {}
+
+    sid = morsel.value
+    if flask_app.config.get('SESSION_USE_SIGNER'):
+        try:
+            sid = _session_signer().unsign(sid).decode()
+        except BadSignature:
+            return None, {}
+
+    raw = await async_redis.get(flask_app.session_interface.key_prefix + sid)
+    if raw is None:
+        return sid, {}
+    try:
+        return sid, dict(_deserialize(raw))
+    except Exception as e:
+        logger.error(f"Error decoding session {sid}: {str(e)}")
+        return sid, {}
+
+
+async def save_session(sid, data):
+    """Persist the session and return ``(sid, set_cookie_header)``."""
+    if sid is None:
+        sid = str(uuid.uuid4())
+    lifetime = int(flask_app.permanent_session_lifetime.total_seconds())
+    await async_redis.setex(flask_app.session_interface.key_prefix + sid, lifetime, _serialize(data))
+
+    cookie_value = _session_signer().sign(sid).decode() if flask_app.config.get('SESSION_USE_SIGNER') else sid
+    return sid, dump_cookie(
+        flask_app.config['SESSION_COOKIE_NAME'],
+        cookie_value,
+        path=flask_app.config.get('SESSION_COOKIE_PATH') or '/',
+        domain=flask_app.config.get('SESSION_COOKIE_DOMAIN'),
+        secure=flask_app.config.get('SESSION_COOKIE_SECURE', False),
+        httponly=flask_app.config.get('SESSION_COOKIE_HTTPONLY', True),
+        samesite=flask_app.config.get('SESSION_COOKIE_SAMESITE')
+    )
+
+
+async def touch_thread(thread_id, session_id):
+    """Async counterpart of ``session_manager.touch_thread``."""
+    try:
+        pipe = async_redis.pipeline(transaction=False)
+        pipe.zadd(THREAD_ACTIVITY_KEY, {thread_id: time.time()})
+        pipe.set(f"thread_session:{thread_id}", session_id)
+        await pipe.execute()
+    except Exception as e:
+        logger.error(f"Error recording activity for thread {thread_id}: {str(e)}")
+
+
+def _in_flask_context(data, func, *args):
+    """Run a Flask-WTF helper against ``data`` as the request session."""
+    ctx = flask_app.test_request_context()
+    ctx.session = data
+    with ctx:
+        return func(*args)
+
+
+def _cors_headers(headers):
+    origin = headers.get('origin')
+    if origin and any(fnmatch(origin, allowed) for allowed in CORS_ORIGINS):
+        return [(b'access-control-allow-origin', origin.encode()), (b'access-control-allow-credentials', b'true')]
+    return []
+
+
+async def _read_body(receive):
+    body = b''
+    while True:
+        message = await receive()
+        body += message.get('body', b'')
+        if len(body) > MAX_BODY_SIZE:
+            raise ValueError("Request body too large")
+        if not message.get('more_body'):
+            return body
+
+
+def _parse_form(headers, body):
+    environ = {
+        'REQUEST_METHOD': 'POST',
+        'CONTENT_TYPE': headers.get('content-type', ''),
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.input': BytesIO(body),
+    }
+    _, form, _ = parse_form_data(environ)
+    return form
+
+
+async def _send_json(send, status, payload, extra_headers=()):
+    body = json.dumps(payload).encode()
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', b'application/json'), (b'content-length', str(len(body)).encode()), *extra_headers]
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def _replay(seen, events):
+    for event in seen:
+        yield event
+    async for event in events:
+        yield event
+
+
+async def split_thread_id(event_stream):
+    """Async counterpart of ``ask_helpers.split_thread_id``."""
+    events = event_stream.__aiter__()
+    seen = []
+    async for event in events:
+        seen.append(event)
+        if event.event == 'thread.created':
+            return event.data.id, _replay(seen, events)
+        if event.event == 'thread.run.created':
+            return event.data.thread_id, _replay(seen, events)
+    raise RuntimeError("Run stream ended before the thread was created")
+
+
+async def cancel_active_run(client, thread_id, run_id):
+    """Async counterpart of ``ask_helpers.cancel_active_run``."""
+    if not run_id:
+        runs = await client.beta.threads.runs.list(thread_id=thread_id, limit=1)
+        if not runs.data:
+            return
+        run_id = runs.data[0].id
+    try:
+        run = await client.beta.threads.runs.cancel(thread_id=thread_id, run_id=run_id)
+    except BadRequestError:
+        return
+    deadline = time.time() + ACTIVE_RUN_WAIT
+    while run.status not in RUN_FINAL_STATES and time.time() < deadline:
+        await asyncio.sleep(0.5)
+        run = await client.beta.threads.runs.retrieve(thread_id=thread_id, run_id=run_id)
+
+
+async def create_or_get_thread(data, question):
+    """Async counterpart of ``ask_helpers.create_or_get_thread`` for streamed runs."""
+    client = get_async_openai_client()
+    session_info = data.get('client_session_info', {})
+    pre_shared_key = config.get('pre_shared_key', '')
+    message_content = f"User question: {question}\n\nSession info: {json.dumps(session_info)}\n\nPre-shared key: {pre_shared_key}"
+
+    thread_id = data.get('thread_id')
+    if thread_id:
+        def append_and_run():
+            return client.beta.threads.runs.create(
+                thread_id=thread_id,
+                assistant_id=config['assistant_id'],
+                additional_messages=[{"role": "user", "content": message_content}],
+                stream=True
+            )
+
+        try:
+            return thread_id, await append_and_run()
+        except NotFoundError:
+            logger.warning(f"Thread {thread_id} not found. Creating a new thread.")
+        except BadRequestError as e:
+            active_run_id = active_run_conflict(e)
+            if active_run_id is None:
+                raise
+            logger.warning("Thread %s still has an active run; cancelling it", thread_id)
+            await cancel_active_run(client, thread_id, active_run_id)
+            return thread_id, await append_and_run()
+
+    event_stream = await client.beta.threads.create_and_run(
+        assistant_id=config['assistant_id'],
+        thread={"messages": [{"role": "user", "content": message_content}]},
+        stream=True
+    )
+    thread_id, event_stream = await split_thread_id(event_stream)
+    data['thread_id'] = thread_id
+    return thread_id, event_stream
+
+
+async def stream_responses(thread_id, event_stream, session_id, session_info):
+    state = RunStreamState()
+    stream = event_stream
+
+    try:
+        while stream is not None:
+            async for event in stream:
+                for chunk in state.handle(event):
+                    yield chunk
+                if state.error:
+                    break
+
+            stream = None
+            action = state.take_pending_action()
+            if state.error:
+                yield error_event(state.error)
+                return
+            if action is not None:
+                # Webhook lookups are blocking, keep them off the event loop
+                tool_outputs = await asyncio.to_thread(collect_tool_outputs, action, session_info, session_id)
+                if not tool_outputs:
+                    yield error_event('Unable to handle required action')
+                    return
+                stream = await get_async_openai_client().beta.threads.runs.submit_tool_outputs(
+                    thread_id=thread_id,
+                    run_id=action.id,
+                    tool_outputs=tool_outputs,
+                    stream=True
+                )
+
+    except Exception as e:
+        yield error_event(f'Error streaming run: {str(e)}')
+        return
+
+    for chunk in final_events(state.content, session_id, session_info):
+        yield chunk
+
+
+async def ask(scope, receive, send, headers):
+    cors = _cors_headers(headers)
+    try:
+        form = _parse_form(headers, await _read_body(receive))
+    except ValueError:
+        await _send_json(send, 413, {"error": "Request body too large"}, cors)
+        return
+
+    question = form.get('question')
+    csrf_token = form.get('csrf_token')
+    if not question or not question.strip() or not csrf_token:
+        await _send_json(send, 400, {"error": "Missing question or CSRF token"}, cors)
+        return
+
+    sid, data = await load_session(headers)
+    try:
+        _in_flask_context(data, validate_csrf, csrf_token)
+    except Exception as e:
+        logger.error(f"CSRF validation failed: {str(e)}")
+        await _send_json(send, 400, {"error": "Invalid CSRF token"}, cors)
+        return
+
+    if 'sid' not in data:
+        data['sid'] = os.urandom(16).hex()
+    session_id = data['sid']
+
+    if 'chat_session_started' not in data:
+        analytics.track(session_id, 'Chat Session Started', {
+            'session_id': session_id
+        })
+        data['chat_session_started'] = True
+
+    analytics.track(session_id, 'User Message Sent', {
+        'question': question
+    })
+
+    try:
+        thread_id, event_stream = await create_or_get_thread(data, question)
+    except Exception as e:
+        logger.error(f"Error in thread creation or run: {str(e)}")
+        await _send_json(send, 500, {"error": f"An error occurred: {str(e)}"}, cors)
+        return
+
+    # Save before streaming so the thread id survives a dropped connection
+    sid, cookie = await save_session(sid, data)
+    await touch_thread(thread_id, session_id)
+
+    await send({
+        'type': 'http.response.start',
+        'status': 200,
+        'headers': [
+            (b'content-type', b'text/event-stream'),
+            (b'cache-control', b'no-cache'),
+            (b'x-accel-buffering', b'no'),
+            (b'set-cookie', cookie.encode()),
+            *cors
+        ]
+    })
+    async for chunk in stream_responses(thread_id, event_stream, session_id, data.get('client_session_info', {})):
+        await send({'type': 'http.response.body', 'body': chunk.encode(), 'more_body': True})
+    await send({'type': 'http.response.body', 'body': b''})
+
+
+async def welcome(scope, receive, send, headers):
+    if scope['method'] == 'OPTIONS':
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [
+                (b'access-control-allow-origin', b'https://www.eqbay.co'),
+                (b'access-control-allow-headers', b'Content-Type'),
+                (b'access-control-allow-methods', b'GET,OPTIONS'),
+                (b'access-control-allow-credentials', b'true'),
+            ]
+        })
+        await send({'type': 'http.response.body', 'body': b''})
+        return
+
+    sid, data = await load_session(headers)
+    before = dict(data)
+    csrf_token = _in_flask_context(data, issue_csrf_token)
+
+    extra_headers = [
+        (b'access-control-allow-origin', b'https://www.eqbay.co'),
+        (b'access-control-allow-credentials', b'true'),
+    ]
+    if data != before or sid is None:
+        sid, cookie = await save_session(sid, data)
+        extra_headers.append((b'set-cookie', cookie.encode()))
+
+    await _send_json(send, 200, {
+        "response": config.get('welcome_message', ''),
+        "csrf_token": csrf_token
+    }, extra_headers)
+
+
+ROUTES = {
+    ('/ask', 'POST'): ask,
+    ('/welcome', 'GET'): welcome,
+    ('/welcome', 'OPTIONS'): welcome,
+}
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await get_async_openai_client().close()
+                # redis-py 5 renamed close() to aclose()
+                close = getattr(async_redis, 'aclose', async_redis.close)
+                await close()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    handler = ROUTES.get((scope.get('path'), scope.get('method'))) if scope['type'] == 'http' else None
+    if handler is None:
+        await wsgi_application(scope, receive, send)
+        return
+
+    headers = {name.decode('latin-1'): value.decode('latin-1') for name, value in scope['headers']}
+    try:
+        await handler(scope, receive, send, headers)
+    except Exception as e:
+        logger.error(f"An unexpected error occurred in {scope['path']}: {str(e)}")
+        await _send_json(send, 500, {"error": "An unexpected error occurred"})
@@ -1,29 +1,74 @@
 import json
+import itertools
+import re
 import time
+import inspect
 import logging
 import requests
-import os
+from concurrent.futures import ThreadPoolExecutor, wait
+from threading import Lock
+from urllib.parse import urlparse
+from requests.adapters import HTTPAdapter
 from flask import session
 from flask_wtf import FlaskForm
 from wtforms import TextAreaField
 from wtforms.validators import DataRequired
-from .initialize import client, analytics, config
-from openai import OpenAIError
+from .initialize import analytics, config
+from .openai_client import get_openai_client
+from .product_cache import product_cache
+from .session_manager import get_cached_user_info, cache_user_info, touch_thread
+from openai import BadRequestError, OpenAIError, NotFoundError
 
 logger = logging.getLogger(__name__)
 
+# Tool calls from one requires_action step run concurrently on this pool
+TOOL_CALL_WORKERS = int(config.get('tool_call_workers', 8))
+# Seconds allowed for a single webhook request
+TOOL_CALL_TIMEOUT = float(config.get('tool_call_timeout', 10))
+# Seconds allowed for all tool calls of one step before missing outputs are reported as timeouts
+TOOL_CALL_DEADLINE = float(config.get('tool_call_deadline', 15))
+
+# Seconds to wait for a cancelled run to release its thread before starting the next one
+ACTIVE_RUN_WAIT = float(config.get('active_run_wait', 10))
+ACTIVE_RUN_RE = re.compile(r"already has an active run (run_\w+)")
+RUN_FINAL_STATES = {'completed', 'cancelled', 'failed', 'expired', 'incomplete'}
+
+tool_executor = ThreadPoolExecutor(max_workers=TOOL_CALL_WORKERS, thread_name_prefix='tool-call')
+
+_http_sessions = {}
+_http_sessions_lock = Lock()
+
+def get_http_session(url):
+    """Return the keep-alive session shared by every request to ``url``'s host."""
+    host = urlparse(url).netloc
+    with _http_sessions_lock:
+        http = _http_sessions.get(host)
+        if http is None:
+            http = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=TOOL_CALL_WORKERS)
+            http.mount('https://', adapter)
+            http.mount('http://', adapter)
+            _http_sessions[host] = http
+    return http
+
 class ChatForm(FlaskForm):
     question = TextAreaField('Question', validators=[DataRequired()])
 
 def get_product_info(product_id, pre_shared_key, product_info_webhook_url):
+    return product_cache.get(
+        product_id,
+        lambda: fetch_product_info(product_id, pre_shared_key, product_info_webhook_url)
+    )
+
+def fetch_product_info(product_id, pre_shared_key, product_info_webhook_url):
     try:
         # Construct the URL with the correct scheme
         url = f"{product_info_webhook_url}/{product_id}?key={pre_shared_key}"
-        logger.debug(f"Sending request to URL: {url}")
+        logger.debug("Fetching product info for ID %s", product_id)
 
         # Change POST to GET
-        response = requests.get(url, timeout=10)
-        logger.debug(f"Received response from webhook: {response.status_code} - {response.content}")
+        response = get_http_session(url).get(url, timeout=TOOL_CALL_TIMEOUT)
+        logger.debug("Received response from webhook: %s (%d bytes)", response.status_code, len(response.content))
         response.raise_for_status()
         return response.json()
     except requests.RequestException as e:
@@ -41,18 +86,16 @@ def get_user_info(wp_username, pre_shared_key, user_info_webhook_url):
         
         # Construct the URL with the correct scheme
         url = f"{user_info_webhook_url}/{wp_username}?key={pre_shared_key}"
-        logger.debug(f"Sending request to URL: {url}")
+        logger.debug("Fetching user info for %s", wp_username)
 
         headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
             'Accept': 'application/json',
         }
 
-        response = requests.get(url, headers=headers, timeout=10)
+        response = get_http_session(url).get(url, headers=headers, timeout=TOOL_CALL_TIMEOUT)
         
-        logger.debug(f"Received response from webhook: {response.status_code}")
-        logger.debug(f"Response headers: {response.headers}")
-        logger.debug(f"Response content: {response.content}")
+        logger.debug("Received response from webhook: %s (%d bytes)", response.status_code, len(response.content))
 
         response.raise_for_status()
         return response.json()
@@ -63,8 +106,52 @@ def get_user_info(wp_username, pre_shared_key, user_info_webhook_url):
             logger.error(f"Response content: {e.response.content}")
         return {"error": str(e)}
     
-def create_or_get_thread(question):
-    session_id = session.get('sid')
+def split_thread_id(event_stream):
+    """Read run events until the thread id is known.
+
+    Returns the thread id and an iterator that replays the events already
+    consumed before continuing with the rest of the stream.
+    """
+    events = iter(event_stream)
+    seen = []
+    for event in events:
+        seen.append(event)
+        if event.event == 'thread.created':
+            return event.data.id, itertools.chain(seen, events)
+        if event.event == 'thread.run.created':
+            return event.data.thread_id, itertools.chain(seen, events)
+    raise RuntimeError("Run stream ended before the thread was created")
+
+def active_run_conflict(error):
+    """Id of the run that kept a new run off its thread, ``''`` if unnamed, or None for other errors."""
+    if not isinstance(error, BadRequestError) or 'active run' not in str(error):
+        return None
+    match = ACTIVE_RUN_RE.search(str(error))
+    return match.group(1) if match else ''
+
+def cancel_active_run(client, thread_id, run_id):
+    """Cancel the run still holding ``thread_id`` and wait for it to stop.
+
+    A run left behind by an abandoned stream would otherwise block every
+    later message on the thread until it expires.
+    """
+    if not run_id:
+        runs = client.beta.threads.runs.list(thread_id=thread_id, limit=1)
+        if not runs.data:
+            return
+        run_id = runs.data[0].id
+    try:
+        run = client.beta.threads.runs.cancel(thread_id=thread_id, run_id=run_id)
+    except BadRequestError:
+        # It finished between the conflict and the cancel
+        return
+    deadline = time.time() + ACTIVE_RUN_WAIT
+    while run.status not in RUN_FINAL_STATES and time.time() < deadline:
+        time.sleep(0.5)
+        run = client.beta.threads.runs.retrieve(thread_id=thread_id, run_id=run_id)
+
+def create_or_get_thread(question, stream=False):
+    client = get_openai_client()
     session_info = session.get('client_session_info', {})
     pre_shared_key = config.get('pre_shared_key', '')
 
@@ -73,84 +160,59 @@ def create_or_get_thread(question):
 
     message_content = f"User question: {question}\n\nSession info: {json.dumps(session_info)}\n\nPre-shared key: {pre_shared_key}"
 
-    def create_new_thread():
-        try:
-            thread = client.beta.threads.create()
-            new_thread_id = thread.id
-            session['thread_id'] = new_thread_id
-            logger.debug(f"Created new thread with ID: {new_thread_id}")
-            return new_thread_id
-        except Exception as e:
-            logger.error(f"Error creating new thread: {str(e)}")
-            raise
-
-    try:
-        if thread_id:
-            try:
-                # Try to add a message to the existing thread
-                client.beta.threads.messages.create(
-                    thread_id=thread_id,
-                    role="user",
-                    content=message_content
-                )
-                logger.debug(f"Added message to existing thread {thread_id}")
-            except OpenAIError as e:
-                if e.status_code == 404:
-                    logger.warning(f"Thread {thread_id} not found. Creating a new thread.")
-                    thread_id = create_new_thread()
-                else:
-                    raise
-        else:
-            thread_id = create_new_thread()
-
-        # Add the message to the thread (in case a new thread was created)
-        client.beta.threads.messages.create(
-            thread_id=thread_id,
-            role="user",
-            content=message_content
+    def create_thread_and_run():
+        # A single request creates the thread, adds the message and starts the run
+        run = client.beta.threads.create_and_run(
+            assistant_id=config['assistant_id'],
+            thread={"messages": [{"role": "user", "content": message_content}]},
+            stream=stream
         )
-        logger.debug(f"Added message to thread {thread_id}")
-
-        # Create a run for the thread
-        run = client.beta.threads.runs.create(
-            thread_id=thread_id,
-            assistant_id=config['assistant_id']
-        )
-        logger.debug(f"Created run {run.id} for thread {thread_id}")
-
-        return thread_id, run
-
-    except Exception as e:
-        logger.error(f"Error in create_or_get_thread: {str(e)}")
-        # If any error occurs, create a new thread as a fallback
-        thread_id = create_new_thread()
-        
-        # Add the message to the new thread
-        client.beta.threads.messages.create(
+        if stream:
+            new_thread_id, run = split_thread_id(run)
+        else:
+            new_thread_id = run.thread_id
+        session['thread_id'] = new_thread_id
+        touch_thread(new_thread_id, session.get('sid'))
+        logger.debug("Created thread %s and started run (stream=%s)", new_thread_id, stream)
+        return new_thread_id, run
+
+    if not thread_id:
+        return create_thread_and_run()
+
+    def append_and_run():
+        # A single request appends the message and starts the run
+        return client.beta.threads.runs.create(
             thread_id=thread_id,
-            role="user",
-            content=message_content
+            assistant_id=config['assistant_id'],
+            additional_messages=[{"role": "user", "content": message_content}],
+            stream=stream
         )
-        logger.debug(f"Added message to new fallback thread {thread_id}")
 
-        # Create a run for the new thread
-        run = client.beta.threads.runs.create(
-            thread_id=thread_id,
-            assistant_id=config['assistant_id']
-        )
-        logger.debug(f"Created run {run.id} for new fallback thread {thread_id}")
+    # Only a thread that no longer exists moves the user to a new one; other
+    # errors reach the caller so the conversation is never silently dropped
+    try:
+        run = append_and_run()
+    except NotFoundError:
+        logger.warning(f"Thread {thread_id} not found. Creating a new thread.")
+        return create_thread_and_run()
+    except BadRequestError as e:
+        active_run_id = active_run_conflict(e)
+        if active_run_id is None:
+            raise
+        logger.warning("Thread %s still has an active run; cancelling it", thread_id)
+        cancel_active_run(client, thread_id, active_run_id)
+        run = append_and_run()
+    logger.debug("Created run for thread %s (stream=%s)", thread_id, stream)
+    touch_thread(thread_id, session.get('sid'))
 
-        return thread_id, run
+    return thread_id, run
 
 def generate_responses(thread_id, run):
+    client = get_openai_client()
     session_id = session.get('sid', 'unknown')
     session_info = session.get('client_session_info', {})
-    logger.debug(f"Session ID in generate_responses: {session_id}")
-    logger.debug(f"Session Info in generate_responses: {session_info}")
-
-    # Make sure we log wp_username here
-    if session_info.get('wp_username') != 'a8d6e69f_admin':
-        logger.error(f"wp_username mismatch in session_info. Expected 'a8d6e69f_admin', found: {session_info.get('wp_username')}")
+    logger.debug("Session ID in generate_responses: %s", session_id)
+    logger.debug("Session Info in generate_responses: %s", session_info)
 
     start_time = time.time()
     timeout = 60
@@ -187,7 +249,7 @@ def generate_responses(thread_id, run):
 
             elif run_status.status == 'requires_action':
                 # Add logs before calling handle_required_action
-                logger.debug(f"Handling required action with session info: {session_info}")
+                logger.debug("Handling required action with session info: %s", session_info)
                 
                 if handle_required_action(run_status, thread_id):
                     time.sleep(2)
@@ -204,6 +266,200 @@ def generate_responses(thread_id, run):
     else:
         yield f"data: {json.dumps({'error': 'Maximum retries reached'})}\n\n"
 
+RUN_END_EVENTS = {
+    'thread.run.failed': 'failed',
+    'thread.run.cancelled': 'cancelled',
+    'thread.run.expired': 'expired',
+}
+
+_RESPONSE_FIELD = re.compile(r'"response"\s*:\s*"')
+_JSON_ESCAPES = {'n': '\n', 't': '\t', 'r': '\r', 'b': '\b', 'f': '\f'}
+
+
+def streaming_available():
+    """Return True when run streaming is enabled in config and supported by the SDK."""
+    if config.get('run_mode', 'stream') != 'stream':
+        return False
+    try:
+        return 'stream' in inspect.signature(get_openai_client().beta.threads.runs.create).parameters
+    except (TypeError, ValueError):
+        return False
+
+
+class ResponseDeltaDecoder:
+    """Incrementally pull the visible ``response`` text out of a streamed answer.
+
+    The assistant answers with a JSON document, so raw token deltas are not fit
+    for display. This decoder tracks how far into the ``response`` string value
+    it has read and only returns newly decoded characters. Plain-text answers
+    are passed through unchanged.
+    """
+
+    def __init__(self):
+        self.buffer = ''
+        self.pos = 0
+        self.mode = None
+        self.done = False
+
+    def feed(self, text):
+        self.buffer += text
+        if self.mode is None:
+            stripped = self.buffer.lstrip()
+            if not stripped:
+                return ''
+            self.mode = 'json' if stripped[0] in '{`' else 'text'
+
+        if self.mode == 'text':
+            delta = self.buffer[self.pos:]
+            self.pos = len(self.buffer)
+            return delta
+
+        if self.done:
+            return ''
+        if self.pos == 0:
+            match = _RESPONSE_FIELD.search(self.buffer)
+            if not match:
+                return ''
+            self.pos = match.end()
+
+        chars = []
+        while self.pos < len(self.buffer):
+            ch = self.buffer[self.pos]
+            if ch == '"':
+                self.done = True
+                break
+            if ch == '\\':
+                # Wait for the rest of the escape sequence to arrive
+                if self.pos + 1 >= len(self.buffer):
+                    break
+                escape = self.buffer[self.pos + 1]
+                if escape == 'u':
+                    if self.pos + 6 > len(self.buffer):
+                        break
+                    code = int(self.buffer[self.pos + 2:self.pos + 6], 16)
+                    if 0xD800 <= code < 0xDC00:
+                        # Surrogate pair: wait for the low half before decoding
+                        if self.pos + 12 > len(self.buffer):
+                            break
+                        if self.buffer[self.pos + 6:self.pos + 8] == '\\u':
+                            low = int(self.buffer[self.pos + 8:self.pos + 12], 16)
+                            chars.append(chr(0x10000 + ((code - 0xD800) << 10) + (low - 0xDC00)))
+                            self.pos += 12
+                            continue
+                    chars.append(chr(code))
+                    self.pos += 6
+                    continue
+                chars.append(_JSON_ESCAPES.get(escape, escape))
+                self.pos += 2
+                continue
+            chars.append(ch)
+            self.pos += 1
+        return ''.join(chars)
+
+
+class RunStreamState:
+    """Accumulates what a run event stream has produced so far.
+
+    Shared by the sync ``stream_responses`` generator and the async serving
+    path, which only differ in how they iterate the stream and submit tool
+    outputs.
+    """
+
+    def __init__(self):
+        self.decoder = ResponseDeltaDecoder()
+        self.content = None
+        self.pending_action = None
+        self.error = None
+
+    def handle(self, event):
+        """Apply one run event and return the SSE chunks it produces."""
+        if event.event == 'thread.message.delta':
+            chunks = []
+            for part in event.data.delta.content or []:
+                if part.type == 'text' and part.text and part.text.value:
+                    delta = self.decoder.feed(part.text.value)
+                    if delta:
+                        chunks.append(f"event: delta\ndata: {json.dumps({'delta': delta})}\n\n")
+            return chunks
+
+        if event.event == 'thread.message.completed':
+            if event.data.role == 'assistant' and event.data.content:
+                self.content = event.data.content[0].text.value
+        elif event.event == 'thread.run.requires_action':
+            self.pending_action = event.data
+        elif event.event in RUN_END_EVENTS:
+            self.error = f'Run {RUN_END_EVENTS[event.event]}'
+        elif event.event == 'error':
+            self.error = 'Run stream error'
+        return []
+
+    def take_pending_action(self):
+        action, self.pending_action = self.pending_action, None
+        if action is not None and not (action.required_action and action.required_action.type == "submit_tool_outputs"):
+            self.error = 'Unable to handle required action'
+            return None
+        return action
+
+
+def error_event(message):
+    return f"data: {json.dumps({'error': message})}\n\n"
+
+
+def final_events(content, session_id, session_info):
+    if content is None:
+        return [error_event('No response received')]
+
+    formatted_content = format_response(content)
+
+    # Track bot response
+    analytics.track(session_id, 'Bot Response Sent', {
+        'response': formatted_content,
+        'session_info': session_info
+    })
+
+    return [f"data: {formatted_content}\n\n", "event: DONE\ndata: [DONE]\n\n"]
+
+
+def stream_responses(thread_id, event_stream):
+    session_id = session.get('sid', 'unknown')
+    session_info = session.get('client_session_info', {})
+    logger.debug("Streaming run events for thread %s, session %s", thread_id, session_id)
+
+    state = RunStreamState()
+    stream = event_stream
+
+    try:
+        while stream is not None:
+            for event in stream:
+                yield from state.handle(event)
+                if state.error:
+                    break
+
+            stream = None
+            action = state.take_pending_action()
+            if state.error:
+                yield error_event(state.error)
+                return
+            if action is not None:
+                logger.debug("Handling required action with session info: %s", session_info)
+                tool_outputs = collect_tool_outputs(action, session_info, session.get('sid'))
+                if not tool_outputs:
+                    yield error_event('Unable to handle required action')
+                    return
+                # Submitting with stream=True continues the same run on a new event stream
+                stream = get_openai_client().beta.threads.runs.submit_tool_outputs(
+                    thread_id=thread_id,
+                    run_id=action.id,
+                    tool_outputs=tool_outputs,
+                    stream=True
+                )
+
+    except Exception as e:
+        yield error_event(f'Error streaming run: {str(e)}')
+        return
+
+    yield from final_events(state.content, session_id, session_info)
+
 def format_response(content):
     try:
         response_data = json.loads(content)
@@ -230,73 +486,105 @@ def format_response(content):
         })
 
 
+def run_tool_call(tool_call, session_info, pre_shared_key, session_id=None):
+    if tool_call.function.name == "get_product_info":
+        try:
+            arguments = json.loads(tool_call.function.arguments)
+            logger.debug("Handling required action for product ID %s", arguments['id'])
+            product_info = get_product_info(
+                arguments['id'],
+                pre_shared_key,  # Use the pre-shared key from config
+                arguments['product_info_webhook_url']
+            )
+            return {
+                "tool_call_id": tool_call.id,
+                "output": json.dumps(product_info)
+            }
+        except Exception as e:
+            logger.error(f"Error in get_product_info: {str(e)}")
+            return {
+                "tool_call_id": tool_call.id,
+                "output": json.dumps({"error": str(e)})
+            }
+
+    if tool_call.function.name == "get_user_info":
+        try:
+            arguments = json.loads(tool_call.function.arguments)
+            wp_username = arguments.get('wp_username', 'N/A')
+            session_wp_username = session_info.get('wp_username')
+            logger.debug("Extracted wp_username before get_user_info call: %s", wp_username)
+
+            # Verify if transformation happens
+            if wp_username != session_wp_username:
+                logger.warning(f"wp_username mismatch. Function arg: {wp_username}, Session: {session_wp_username}")
+                wp_username = session_wp_username
+
+            user_info = get_cached_user_info(session_id, wp_username) if session_id else None
+            if user_info is None:
+                # Calling the get_user_info method with extracted wp_username
+                user_info = get_user_info(
+                    wp_username,
+                    pre_shared_key,  # Use the pre-shared key from config
+                    arguments['user_info_webhook_url']
+                )
+                if session_id and 'error' not in user_info:
+                    cache_user_info(session_id, wp_username, user_info)
+            else:
+                logger.debug("Using cached user info for session %s", session_id)
+
+            return {
+                "tool_call_id": tool_call.id,
+                "output": json.dumps(user_info)
+            }
+        except Exception as e:
+            logger.error(f"Error in get_user_info: {str(e)}")
+            return {
+                "tool_call_id": tool_call.id,
+                "output": json.dumps({"error": str(e)})
+            }
+
+    return None
+
+
+def collect_tool_outputs(run, session_info, session_id=None):
+    pre_shared_key = config.get('pre_shared_key', '')  # Get the pre-shared key from config
+    tool_calls = run.required_action.submit_tool_outputs.tool_calls
+
+    # Dispatch every call of this step at once; the slowest lookup sets the pace
+    futures = [tool_executor.submit(run_tool_call, tool_call, session_info, pre_shared_key, session_id) for tool_call in tool_calls]
+    _, not_done = wait(futures, timeout=TOOL_CALL_DEADLINE)
+
+    tool_outputs = []
+    for tool_call, future in zip(tool_calls, futures):
+        if future in not_done:
+            future.cancel()
+            logger.error(f"Tool call {tool_call.function.name} ({tool_call.id}) exceeded the {TOOL_CALL_DEADLINE}s deadline")
+            tool_outputs.append({
+                "tool_call_id": tool_call.id,
+                "output": json.dumps({"error": "Timed out waiting for tool output"})
+            })
+            continue
+        output = future.result()
+        if output is not None:
+            tool_outputs.append(output)
+
+    logger.debug("Prepared %d tool outputs", len(tool_outputs))
+    return tool_outputs
+
+
 def handle_required_action(run, thread_id):
     if run.required_action and run.required_action.type == "submit_tool_outputs":
-        tool_outputs = []
-        pre_shared_key = config.get('pre_shared_key', '')  # Get the pre-shared key from config
-        
-        for tool_call in run.required_action.submit_tool_outputs.tool_calls:
-            if tool_call.function.name == "get_product_info":
-                try:
-                    arguments = json.loads(tool_call.function.arguments)
-                    logger.debug(f"Handling required action for product ID {arguments['id']}")
-                    product_info = get_product_info(
-                        arguments['id'],
-                        pre_shared_key,  # Use the pre-shared key from config
-                        arguments['product_info_webhook_url']
-                    )
-                    tool_outputs.append({
-                        "tool_call_id": tool_call.id,
-                        "output": json.dumps(product_info)
-                    })
-                except Exception as e:
-                    logger.error(f"Error in get_product_info: {str(e)}")
-                    tool_outputs.append({
-                        "tool_call_id": tool_call.id,
-                        "output": json.dumps({"error": str(e)})
-                    })
-
-            if tool_call.function.name == "get_user_info":
-                try:
-                    arguments = json.loads(tool_call.function.arguments)
-                    wp_username = arguments.get('wp_username', 'N/A')
-                    session_wp_username = session.get('client_session_info', {}).get('wp_username')
-                    logger.debug(f"Extracted wp_username before get_user_info call: {wp_username}")
-
-                    # Verify if transformation happens
-                    if wp_username != session_wp_username:
-                        logger.warning(f"wp_username mismatch. Function arg: {wp_username}, Session: {session_wp_username}")
-                        wp_username = session_wp_username
-
-                    # Calling the get_user_info method with extracted wp_username
-                    user_info = get_user_info(
-                        wp_username,
-                        pre_shared_key,  # Use the pre-shared key from config
-                        arguments['user_info_webhook_url']
-                    )
-
-                    tool_outputs.append({
-                        "tool_call_id": tool_call.id,
-                        "output": json.dumps(user_info)
-                    })
-                except Exception as e:
-                    logger.error(f"Error in get_user_info: {str(e)}")
-                    tool_outputs.append({
-                        "tool_call_id": tool_call.id,
-                        "output": json.dumps({"error": str(e)})
-                    })
-
-        logger.debug(f"Prepared tool outputs: {tool_outputs}")
+        tool_outputs = collect_tool_outputs(run, session.get('client_session_info', {}), session.get('sid'))
 
         # Only submit if tool outputs is not empty
         if tool_outputs:
-            logger.debug(f"Submitting tool outputs: {tool_outputs}")
+            logger.debug("Submitting tool outputs: %s", tool_outputs)
             try:
-                client.beta.threads.runs.submit_tool_outputs(thread_id=thread_id, run_id=run.id, tool_outputs=tool_outputs)
+                get_openai_client().beta.threads.runs.submit_tool_outputs(thread_id=thread_id, run_id=run.id, tool_outputs=tool_outputs)
             except OpenAIError as e:
                 logger.error(f"Error submitting tool outputs: {str(e)}")
         else:
             logger.debug("No tool outputs to submit.")
         return True
 
-    return False
\ No newline at end of file
+    return False
@@ -0,0 +1,71 @@
+"""Per-request cost of analytics calls, inline versus queued.
+
+Times the events one /ask turn emits (Chat Session Started, User Message
+Sent, Bot Response Sent) when they are sent straight to the Segment client,
+as the request path used to do, and when they go through the queued
+pipeline in each of its modes. Segment delivery is disabled so no network
+traffic is involved; only the time spent on the calling thread is measured.
+
+Usage:
+    python -m app.benchmarks.analytics_latency --turns 5000
+"""
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+
+import segment.analytics as segment_analytics
+
+from app.analytics_pipeline import AnalyticsPipeline
+
+RESPONSE = json.dumps({
+    "response": "Here are a few turnout sheets that hold up well in wet weather. " * 20,
+    "products": [{"title": f"Turnout Sheet {i}", "link": "https://eqbay.co/product/sheet", "price": "89.00"} for i in range(5)],
+    "includes_products": True
+})
+SESSION_INFO = {"wp_username": "rider42", "cart_items": [{"id": i, "qty": 1} for i in range(10)]}
+
+
+def emit_turn(analytics, session_id):
+    analytics.track(session_id, 'Chat Session Started', {'session_id': session_id})
+    analytics.track(session_id, 'User Message Sent', {'question': "Which turnout sheet should I buy?"})
+    analytics.track(session_id, 'Bot Response Sent', {'response': RESPONSE, 'session_info': SESSION_INFO})
+
+
+def time_turns(analytics, turns):
+    samples = []
+    for i in range(turns):
+        start = time.perf_counter()
+        emit_turn(analytics, f"session-{i}")
+        samples.append((time.perf_counter() - start) * 1e6)
+    samples.sort()
+    return statistics.mean(samples), samples[int(len(samples) * 0.99) - 1]
+
+
+def main(turns):
+    segment_analytics.write_key = 'benchmark'
+    segment_analytics.send = False
+
+    with tempfile.TemporaryDirectory() as tmp:
+        candidates = {
+            'inline segment': segment_analytics,
+            'queued segment': AnalyticsPipeline(mode='segment'),
+            'queued file': AnalyticsPipeline(mode='file', file_path=os.path.join(tmp, 'events.jsonl')),
+            'off': AnalyticsPipeline(mode='off'),
+        }
+        print(f"{'mode':<16}{'mean (us)':>12}{'p99 (us)':>12}")
+        for name, analytics in candidates.items():
+            mean, p99 = time_turns(analytics, turns)
+            print(f"{name:<16}{mean:>12.1f}{p99:>12.1f}")
+            if isinstance(analytics, AnalyticsPipeline):
+                analytics.shutdown()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Measure analytics overhead per /ask turn")
+    parser.add_argument('--turns', type=int, default=5000)
+    args = parser.parse_args()
+
+    main(args.turns)
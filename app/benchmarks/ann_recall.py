@@ -0,0 +1,79 @@
+"""Recall and latency of the IVF index against exact search.
+
+Builds a synthetic store whose embeddings are drawn around a few thousand
+topic centres (real product embeddings are clustered too; uniform noise
+would understate IVF recall), builds the index, then for each ``nprobe``
+reports recall@k against exact search and median query latency.
+
+Usage:
+    python -m app.benchmarks.ann_recall --products 200000 --nprobe 1,4,8,16,32
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+import numpy as np
+
+from app.ann_index import IVFIndex
+from app.embedding_store import EmbeddingStore, save_store
+from app.retrieval import ProductRetriever
+
+
+def synthetic_store(base, count, dimensions, topics, spread, seed=0):
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((topics, dimensions), dtype=np.float32)
+    embeddings = centres[rng.integers(0, topics, size=count)]
+    embeddings += spread * rng.standard_normal((count, dimensions), dtype=np.float32)
+    text_blocks = [{'text': f"ID: {i}", 'page_num': i + 1, 'product_id': str(i)} for i in range(count)]
+    save_store(base, text_blocks, embeddings)
+    queries = embeddings[rng.integers(0, count, size=200)] + spread * rng.standard_normal((200, dimensions), dtype=np.float32)
+    return queries
+
+
+def run_queries(retriever, queries, k):
+    results, samples = [], []
+    for query in queries:
+        start = time.perf_counter()
+        results.append({index for index, _ in retriever.search(query, k=k)})
+        samples.append((time.perf_counter() - start) * 1000)
+    return results, statistics.median(samples)
+
+
+def main(products, dimensions, topics, spread, nprobes, k, nlist):
+    with tempfile.TemporaryDirectory() as tmp:
+        base = os.path.join(tmp, 'catalog')
+        queries = synthetic_store(base, products, dimensions, topics, spread)
+        store = EmbeddingStore.open(base)
+
+        exact = ProductRetriever(store)
+        truth, exact_ms = run_queries(exact, queries, k)
+
+        start = time.perf_counter()
+        index = IVFIndex.build(store.matrix, store.meta['matrix_file'], nlist=nlist)
+        build_s = time.perf_counter() - start
+        index.save(base)
+        index = IVFIndex.load(base, store.meta['matrix_file'])
+
+        print(f"{products} products x {dimensions} dims, {index.nlist} lists, built in {build_s:.1f}s")
+        print(f"{'search':<12}{f'recall@{k}':>10}{'p50 (ms)':>10}")
+        print(f"{'exact':<12}{1.0:>10.3f}{exact_ms:>10.2f}")
+        for nprobe in nprobes:
+            approximate = ProductRetriever(store, index=index, nprobe=nprobe)
+            found, ms = run_queries(approximate, queries, k)
+            recall = sum(len(a & b) for a, b in zip(found, truth)) / (k * len(queries))
+            print(f"{f'nprobe={nprobe}':<12}{recall:>10.3f}{ms:>10.2f}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compare IVF and exact product search")
+    parser.add_argument('--products', type=int, default=100000)
+    parser.add_argument('--dimensions', type=int, default=1536)
+    parser.add_argument('--topics', type=int, default=2000)
+    parser.add_argument('--spread', type=float, default=1.5, help="noise around each topic centre")
+    parser.add_argument('--nprobe', default='1,4,8,16,32')
+    parser.add_argument('--nlist', type=int, default=None)
+    parser.add_argument('--k', type=int, default=10)
+    args = parser.parse_args()
+    main(args.products, args.dimensions, args.topics, args.spread, [int(n) for n in args.nprobe.split(',')], args.k, args.nlist)
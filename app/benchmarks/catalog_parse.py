@@ -0,0 +1,104 @@
+"""Peak memory and wall time of catalog XML parsing, whole-tree versus streaming.
+
+Writes a synthetic catalog feed with the same ``post`` layout as the Eqbay
+export, then parses it in a fresh subprocess per mode so each peak RSS
+figure is independent:
+
+* ``tree``   - read the whole body and ``ET.fromstring`` it (the old path)
+* ``stream`` - ``xml_to_pdf.iter_posts`` over the file object
+
+Usage:
+    python -m app.benchmarks.catalog_parse --products 100000
+"""
+import argparse
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import xml.etree.ElementTree as ET
+from xml.sax.saxutils import escape
+
+CATEGORIES = [
+    "Tack>Bridles>Snaffle Bridles",
+    "Apparel>Apparel Accessories>Purses Totes",
+    "Horse Care>Fly Control>Fly Masks",
+    "Blankets>Turnout Sheets",
+]
+BRANDS = ["Dover", "Weatherbeeta", "Horseware", "Tough-1", "Ovation"]
+
+
+def synthetic_post(product_id, rng):
+    fields = {
+        'ID': product_id,
+        'Sku': f"SKU-{product_id:07d}",
+        'ProductType': rng.choice(['simple', 'variable']),
+        'Title': f"Synthetic Product {product_id}",
+        'Permalink': f"https://eqbay.co/product/synthetic-{product_id}",
+        'ProductRidingStyle': rng.choice(['English', 'Western', 'None']),
+        'Productcategories': rng.choice(CATEGORIES),
+        'ProductTags': "durable, all-weather",
+        'Content': "<p>" + " ".join(rng.choice(["soft", "padded", "leather", "breathable", "adjustable"]) for _ in range(80)) + "</p>",
+        'ImageURL': f"https://eqbay.co/wp-content/uploads/{product_id}.jpg",
+        'Brands': rng.choice(BRANDS),
+        'StockStatus': rng.choice(['instock', 'outofstock']),
+        'Price': f"{rng.uniform(10, 500):.2f}",
+    }
+    return "<post>" + "".join(f"<{tag}>{escape(str(value))}</{tag}>" for tag, value in fields.items()) + "</post>\n"
+
+
+def write_synthetic_catalog(path, count, seed=0):
+    rng = random.Random(seed)
+    with open(path, 'w') as f:
+        f.write("<?xml version=\"1.0\" encoding=\"UTF-8\"?>\n<data>\n")
+        for product_id in range(1, count + 1):
+            f.write(synthetic_post(product_id, rng))
+        f.write("</data>\n")
+
+
+def parse(mode, path):
+    start = time.perf_counter()
+    count = 0
+    if mode == 'tree':
+        with open(path, 'rb') as f:
+            root = ET.fromstring(f.read())
+        for post in root.findall('.//post'):
+            count += len(post)
+    else:
+        from app.xml_to_pdf import iter_posts
+        with open(path, 'rb') as f:
+            for post in iter_posts(f):
+                count += len(post)
+    elapsed = time.perf_counter() - start
+    # ru_maxrss is KiB on Linux
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"{mode} {elapsed:.3f} {peak_mb:.1f} {count}")
+
+
+def main(products):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'catalog.xml')
+        write_synthetic_catalog(path, products)
+        size_mb = os.path.getsize(path) / 1024 / 1024
+        print(f"{products} products, {size_mb:.1f} MB of XML")
+        print(f"{'mode':<8}{'wall (s)':>10}{'peak RSS (MB)':>16}")
+        for mode in ('tree', 'stream'):
+            output = subprocess.run(
+                [sys.executable, '-m', 'app.benchmarks.catalog_parse', '--parse', mode, path],
+                check=True, capture_output=True, text=True
+            ).stdout.split()
+            print(f"{mode:<8}{float(output[1]):>10.2f}{float(output[2]):>16.1f}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compare whole-tree and streaming catalog parsing")
+    parser.add_argument('--products', type=int, default=100000)
+    parser.add_argument('--parse', nargs=2, metavar=('MODE', 'PATH'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.parse:
+        parse(*args.parse)
+    else:
+        main(args.products)
@@ -0,0 +1,72 @@
+"""Load test: how many concurrent /ask streams a server can hold open.
+
+Each simulated visitor fetches a CSRF token from /welcome, then posts a
+question to /ask and reads the SSE stream to the end. Run it once against the
+sync gunicorn app and once against the asyncio app, with the same worker
+count, to compare capacity. Point the servers at a mock OpenAI endpoint
+(``OPENAI_BASE_URL``) so the run does not hit the real API.
+
+Usage:
+    gunicorn -w 2 app:app -b :8001
+    gunicorn -w 2 -k uvicorn.workers.UvicornWorker app.asgi:application -b :8002
+    python -m app.benchmarks.concurrent_streams http://localhost:8001 http://localhost:8002 --concurrency 10 50 200
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+
+async def one_conversation(base_url, question, timeout):
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout) as http:
+        welcome = await http.get('/welcome')
+        welcome.raise_for_status()
+        csrf_token = welcome.json()['csrf_token']
+        # The session cookie is Secure-only, so carry it by hand over plain HTTP
+        cookie = welcome.headers.get('set-cookie', '').split(';', 1)[0]
+
+        start = time.perf_counter()
+        first_byte = None
+        async with http.stream('POST', '/ask', data={'question': question, 'csrf_token': csrf_token}, headers={'Cookie': cookie}) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if first_byte is None and line.startswith('data: '):
+                    first_byte = time.perf_counter() - start
+                if line == 'data: [DONE]':
+                    break
+        return first_byte, time.perf_counter() - start
+
+
+async def run_level(base_url, concurrency, question, timeout):
+    started = time.perf_counter()
+    results = await asyncio.gather(
+        *(one_conversation(base_url, question, timeout) for _ in range(concurrency)),
+        return_exceptions=True
+    )
+    wall = time.perf_counter() - started
+    ok = [result for result in results if not isinstance(result, BaseException) and result[0] is not None]
+    ttfb = sorted(result[0] for result in ok)
+    p95 = ttfb[int(len(ttfb) * 0.95) - 1] if ttfb else float('nan')
+    median = statistics.median(ttfb) if ttfb else float('nan')
+    return len(ok), median, p95, wall
+
+
+async def main(base_urls, levels, question, timeout):
+    print(f"{'server':<28}{'streams':>8}{'ok':>6}{'ttfb p50':>10}{'ttfb p95':>10}{'wall (s)':>10}")
+    for base_url in base_urls:
+        for concurrency in levels:
+            ok, median, p95, wall = await run_level(base_url, concurrency, question, timeout)
+            print(f"{base_url:<28}{concurrency:>8}{ok:>6}{median:>10.2f}{p95:>10.2f}{wall:>10.2f}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compare concurrent /ask stream capacity between servers")
+    parser.add_argument('base_urls', nargs='+')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[10, 50, 100, 200])
+    parser.add_argument('--question', default="What bridle would you recommend for a young horse?")
+    parser.add_argument('--timeout', type=float, default=120.0)
+    args = parser.parse_args()
+
+    asyncio.run(main(args.base_urls, args.concurrency, args.question, args.timeout))
@@ -0,0 +1,111 @@
+"""Per-request CSRF overhead on /ask, /welcome and static routes.
+
+Times a small Flask app that wires CSRF the old way and the new way, on the
+lazy Redis session layer over an in-memory store:
+
+* "eager": ``generate_csrf()`` in ``after_request`` on every response, and
+  /ask validates the token, then builds a CSRF-checked form and validates it
+  twice
+* "lazy": a cached token from ``issue_csrf_token`` on bootstrap responses only,
+  and a single validation in /ask
+
+Usage:
+    python -m app.benchmarks.csrf_overhead --requests 2000
+"""
+import argparse
+import statistics
+import time
+
+from flask import Flask, Response, jsonify, request
+from flask_wtf import FlaskForm
+from flask_wtf.csrf import CSRFProtect, generate_csrf, validate_csrf
+from wtforms import TextAreaField
+from wtforms.validators import DataRequired
+
+from app.benchmarks.session_redis_commands import SKIP_PATHS, CountingRedis
+from app.csrf_tokens import issue_csrf_token
+from app.redis_session import LazyRedisSessionInterface
+
+
+class ChatForm(FlaskForm):
+    question = TextAreaField('Question', validators=[DataRequired()])
+
+
+def create_app(lazy):
+    flask_app = Flask(__name__, static_folder=None)
+    flask_app.config.update(SECRET_KEY='benchmark', WTF_CSRF_SSL_STRICT=False)
+    redis = CountingRedis()
+    flask_app.session_interface = LazyRedisSessionInterface(redis, skip_paths=SKIP_PATHS)
+    csrf = CSRFProtect(flask_app)
+
+    @flask_app.after_request
+    def add_csrf_token_to_response(response):
+        if not lazy:
+            response.headers.set('X-CSRFToken', generate_csrf())
+        elif request.endpoint == 'welcome':
+            response.headers.set('X-CSRFToken', issue_csrf_token())
+        return response
+
+    @flask_app.route('/static/<path:filename>')
+    def static_file(filename):
+        return Response('console.log(1)', mimetype='application/javascript')
+
+    @flask_app.route('/welcome')
+    def welcome():
+        return jsonify({"csrf_token": issue_csrf_token() if lazy else generate_csrf()})
+
+    @flask_app.route('/ask', methods=['POST'])
+    @csrf.exempt
+    def ask():
+        try:
+            validate_csrf(request.form.get('csrf_token'))
+        except Exception:
+            return jsonify({"error": "Invalid CSRF token"}), 400
+        if lazy:
+            form = ChatForm(request.form, meta={'csrf': False})
+        else:
+            form = ChatForm(request.form)
+            form.validate()
+        if not form.validate():
+            return jsonify({"error": "Invalid form submission"}), 400
+        return Response('data: {"delta": "hi"}\n\n', content_type='text/event-stream')
+
+    return flask_app, redis
+
+
+def time_route(client, call, requests):
+    samples = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        response = call(client)
+        samples.append((time.perf_counter() - start) * 1e6)
+        assert response.status_code == 200, response.get_data(as_text=True)
+    return statistics.median(samples)
+
+
+def main(requests):
+    routes = {
+        '/static/app.js': lambda client, token: client.get('/static/app.js'),
+        '/welcome': lambda client, token: client.get('/welcome'),
+        '/ask': lambda client, token: client.post('/ask', data={'question': 'Fly masks?', 'csrf_token': token}),
+    }
+    print(f"{'route':<16}{'eager (us)':>12}{'lazy (us)':>12}{'eager redis':>13}{'lazy redis':>12}")
+    for path, call in routes.items():
+        results = {}
+        for name, lazy in (('eager', False), ('lazy', True)):
+            flask_app, redis = create_app(lazy)
+            with flask_app.test_client() as client:
+                token = client.get('/welcome').get_json()['csrf_token']
+                redis.commands.clear()
+                median = time_route(client, lambda c: call(c, token), requests)
+                results[name] = (median, sum(redis.commands.values()) / requests)
+        (eager_us, eager_redis), (lazy_us, lazy_redis) = results['eager'], results['lazy']
+        print(f"{path:<16}{eager_us:>12.1f}{lazy_us:>12.1f}{eager_redis:>13.2f}{lazy_redis:>12.2f}")
+    print("(median microseconds per request; Redis commands per request)")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Time per-request CSRF overhead")
+    parser.add_argument('--requests', type=int, default=2000)
+    args = parser.parse_args()
+    main(args.requests)
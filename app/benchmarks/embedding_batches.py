@@ -0,0 +1,116 @@
+"""Embedding throughput, one request per block versus batched requests.
+
+Starts a local stub of the OpenAI embeddings endpoint that charges a fixed
+latency per request plus a little per input, and answers 429 with a short
+Retry-After when more than ``--max-in-flight`` requests arrive at once. The
+same synthetic catalog blocks are then embedded with the old per-block loop
+and with ``embeddings.get_embeddings``, and blocks per second are reported.
+
+Usage:
+    python -m app.benchmarks.embedding_batches --blocks 2000
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from openai import OpenAI
+
+from app.embeddings import get_embedding, get_embeddings
+
+DIMENSIONS = 1536
+
+
+class StubEmbeddingHandler(BaseHTTPRequestHandler):
+    request_latency = 0.05
+    input_latency = 0.0002
+    max_in_flight = 8
+    in_flight = 0
+    counters = {'requests': 0, 'rate_limited': 0}
+    lock = threading.Lock()
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        inputs = body['input'] if isinstance(body['input'], list) else [body['input']]
+
+        cls = type(self)
+        with cls.lock:
+            cls.counters['requests'] += 1
+            limited = cls.in_flight >= cls.max_in_flight
+            if limited:
+                cls.counters['rate_limited'] += 1
+            else:
+                cls.in_flight += 1
+
+        if limited:
+            self._send(429, {'error': {'message': 'Rate limit reached', 'type': 'requests'}}, {'retry-after': '0.05'})
+            return
+
+        try:
+            time.sleep(self.request_latency + self.input_latency * len(inputs))
+            vector = [0.001] * DIMENSIONS
+            tokens = sum(len(text) // 4 for text in inputs)
+            self._send(200, {
+                'object': 'list',
+                'data': [{'object': 'embedding', 'index': i, 'embedding': vector} for i in range(len(inputs))],
+                'model': body['model'],
+                'usage': {'prompt_tokens': tokens, 'total_tokens': tokens}
+            })
+        finally:
+            with cls.lock:
+                cls.in_flight -= 1
+
+    def _send(self, status, payload, headers=None):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def synthetic_blocks(count):
+    return [
+        f"ID: {i}\nTitle: Synthetic Product {i}\nProductcategories: Tack>Bridles\n"
+        f"Content: {'Soft padded leather with adjustable fit. ' * 20}"
+        for i in range(count)
+    ]
+
+
+def run(name, embed, texts):
+    StubEmbeddingHandler.counters.update(requests=0, rate_limited=0)
+    start = time.perf_counter()
+    embeddings = embed(texts)
+    elapsed = time.perf_counter() - start
+    missing = sum(1 for embedding in embeddings if embedding is None)
+    counters = StubEmbeddingHandler.counters
+    print(f"{name:<12}{len(texts) / elapsed:>12.1f}{counters['requests']:>10}{counters['rate_limited']:>8}{missing:>9}")
+
+
+def main(blocks, max_in_flight):
+    StubEmbeddingHandler.max_in_flight = max_in_flight
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubEmbeddingHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    stub_client = OpenAI(api_key='stub', base_url=f"http://127.0.0.1:{server.server_port}/v1")
+
+    texts = synthetic_blocks(blocks)
+    print(f"{'mode':<12}{'blocks/s':>12}{'requests':>10}{'429s':>8}{'missing':>9}")
+    try:
+        run('per-block', lambda texts: [get_embedding(text, stub_client) for text in texts], texts)
+        run('batched', lambda texts: get_embeddings(texts, openai_client=stub_client), texts)
+    finally:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compare per-block and batched embedding throughput")
+    parser.add_argument('--blocks', type=int, default=2000)
+    parser.add_argument('--max-in-flight', type=int, default=2)
+    args = parser.parse_args()
+    main(args.blocks, args.max_in_flight)
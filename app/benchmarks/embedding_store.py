@@ -0,0 +1,127 @@
+"""Load time and memory of the catalog embedding store, JSON blob versus mmap.
+
+Writes the same synthetic catalog in the old single-JSON format and in the
+columnar store (float32 and float16), then starts ``--workers`` fresh
+processes per format, as gunicorn would. Each one loads the catalog, touches
+every embedding and text, and reports load time, RSS and PSS while all of
+them are alive at once. PSS splits shared pages between the processes
+mapping them, so its total is what the workers really cost together.
+
+Usage:
+    python -m app.benchmarks.embedding_store --blocks 50000 --workers 4
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from app.embedding_store import EmbeddingStore, save_store
+
+DIMENSIONS = 1536
+
+
+def synthetic_catalog(count, seed=0):
+    rng = np.random.default_rng(seed)
+    text_blocks = [
+        {
+            'text': f"ID: {i}\nTitle: Synthetic Product {i}\nContent: {'Soft padded leather with adjustable fit. ' * 10}",
+            'page_num': i + 1,
+            'product_id': str(i)
+        }
+        for i in range(count)
+    ]
+    embeddings = rng.standard_normal((count, DIMENSIONS), dtype=np.float32)
+    return text_blocks, embeddings
+
+
+def memory_mb():
+    # Linux only; values are in kB
+    rss = pss = 0
+    with open('/proc/self/smaps_rollup') as f:
+        for line in f:
+            if line.startswith('Rss:'):
+                rss = int(line.split()[1])
+            elif line.startswith('Pss:'):
+                pss = int(line.split()[1])
+    return rss / 1024, pss / 1024
+
+
+def load(mode, path):
+    if mode == 'json':
+        with open(path, 'r') as f:
+            data = json.load(f)
+        matrix = np.asarray(data['embeddings'], dtype=np.float32)
+        texts = [block['text'] for block in data['text_blocks']]
+    else:
+        store = EmbeddingStore.open(path)
+        matrix = store.matrix
+        texts = store.text_blocks
+    # Touch everything a query path would
+    checksum = float(np.asarray(matrix, dtype=np.float32).sum(dtype=np.float64))
+    checksum += sum(len(texts[i]) for i in range(0, len(texts), 97))
+    return matrix, texts, checksum
+
+
+def worker(mode, path, barrier, results):
+    start = time.perf_counter()
+    keep = load(mode, path)
+    elapsed = time.perf_counter() - start
+    barrier.wait()
+    rss, pss = memory_mb()
+    results.put((elapsed, rss, pss))
+    barrier.wait()
+    del keep
+
+
+def measure(mode, path, workers):
+    context = multiprocessing.get_context('spawn')
+    barrier = context.Barrier(workers)
+    results = context.Queue()
+    processes = [context.Process(target=worker, args=(mode, path, barrier, results)) for _ in range(workers)]
+    for process in processes:
+        process.start()
+    samples = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    load_time = max(sample[0] for sample in samples)
+    rss = sum(sample[1] for sample in samples)
+    pss = sum(sample[2] for sample in samples)
+    return load_time, rss, pss
+
+
+def main(blocks, workers):
+    text_blocks, embeddings = synthetic_catalog(blocks)
+    with tempfile.TemporaryDirectory() as tmp:
+        json_path = os.path.join(tmp, 'embeddings.json')
+        with open(json_path, 'w') as f:
+            json.dump({'text_blocks': text_blocks, 'embeddings': embeddings.tolist()}, f)
+        store32 = os.path.join(tmp, 'store32')
+        store16 = os.path.join(tmp, 'store16')
+        save_store(store32, text_blocks, embeddings, dtype='float32')
+        save_store(store16, text_blocks, embeddings, dtype='float16')
+        del text_blocks, embeddings
+
+        def disk_mb(base):
+            return sum(os.path.getsize(os.path.join(tmp, name)) for name in os.listdir(tmp) if name.startswith(os.path.basename(base) + '.')) / 1024 / 1024
+
+        print(f"{blocks} blocks x {DIMENSIONS} dims, {workers} workers")
+        print(f"{'format':<10}{'disk (MB)':>11}{'load (s)':>10}{'RSS sum (MB)':>14}{'PSS sum (MB)':>14}")
+        for name, mode, path, size in (
+            ('json', 'json', json_path, os.path.getsize(json_path) / 1024 / 1024),
+            ('float32', 'store', store32, disk_mb(store32)),
+            ('float16', 'store', store16, disk_mb(store16)),
+        ):
+            load_time, rss, pss = measure(mode, path, workers)
+            print(f"{name:<10}{size:>11.1f}{load_time:>10.2f}{rss:>14.1f}{pss:>14.1f}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compare JSON and memory-mapped embedding store loading")
+    parser.add_argument('--blocks', type=int, default=50000)
+    parser.add_argument('--workers', type=int, default=4)
+    args = parser.parse_args()
+    main(args.blocks, args.workers)
@@ -0,0 +1,118 @@
+"""Speed of ``extract_products`` against the previous 17-pass parser.
+
+Random products are rendered as ``Field: value`` lines (random field order
+after a leading ``ID``, optional fields dropped, prose and markdown bullets
+mixed in) and both parsers are timed on responses of increasing size.
+Grouping correctness is covered by app/test_product_parser.py.
+
+Usage:
+    python -m app.benchmarks.extract_products --sizes 5,50,500,5000
+"""
+import argparse
+import random
+import re
+import string
+import time
+
+from app.product_parser import FIELDS, extract_products
+
+PROSE = [
+    "Here are a few options that should suit you and your horse.",
+    "These are all popular with riders who trail ride often.",
+    "Let me know if you'd like something in a different colour!",
+    "",
+]
+
+
+def legacy_extract_products(text):
+    product_mentions = []
+    patterns = {
+        'id': r'ID: (\d+)',
+        'title': r'Title: (.+?)(?=\n|$)',
+        'sku': r'Sku: (.+?)(?=\n|$)',
+        'product_type': r'ProductType: (.+?)(?=\n|$)',
+        'permalink': r'Permalink: (.+?)(?=\n|$)',
+        'riding_style': r'ProductRidingStyle: (.+?)(?=\n|$)',
+        'categories': r'Productcategories: (.+?)(?=\n|$)',
+        'tags': r'ProductTags: (.+?)(?=\n|$)',
+        'content': r'Content: (.+?)(?=\n|$)',
+        'image_url': r'ImageURL: (.+?)(?=\n|$)',
+        'brands': r'Brands: (.+?)(?=\n|$)',
+        'WcRatingCount': r'WcRatingCount: (\d+)',
+        'WcReviewCount': r'WcReviewCount: (.+?)(?=\n|$)',
+        'WcReviewAverage': r'WcReviewAverage: (.+?)(?=\n|$)',
+        'StockStatus': r'StockStatus: (.+?)(?=\n|$)',
+        'Price': r'Price: (.+?)(?=\n|$)',
+        'SalePrice': r'SalePrice: (.+?)(?=\n|$)'
+    }
+
+    current_product = {}
+    for field, pattern in patterns.items():
+        matches = re.findall(pattern, text)
+        for match in matches:
+            current_product[field] = match.strip()
+            if field == 'id':
+                if current_product:
+                    product_mentions.append(current_product.copy())
+                current_product = {}
+
+    if current_product:
+        product_mentions.append(current_product)
+
+    return product_mentions
+
+
+def random_value(rng, key):
+    if key in ('id', 'WcRatingCount'):
+        return str(rng.randrange(1, 10 ** 6))
+    if key in ('Price', 'SalePrice', 'WcReviewAverage'):
+        return f"{rng.uniform(1, 500):.2f}"
+    if key in ('permalink', 'image_url'):
+        return f"https://eqbay.co/{''.join(rng.choices(string.ascii_lowercase, k=12))}"
+    words = rng.choices(['padded', 'leather', 'Fly', 'Mask', 'ID:', 'Price', 'bridle', '>', 'Western', '5"'], k=rng.randint(1, 12))
+    return ' '.join(words)
+
+
+def random_product(rng):
+    keys = [key for key in FIELDS.values() if key != 'id' and rng.random() < 0.6]
+    rng.shuffle(keys)
+    keys = ['id'] + keys
+    return {key: random_value(rng, key) for key in keys}
+
+
+def render(rng, products):
+    labels = {key: label for label, key in FIELDS.items()}
+    lines = [rng.choice(PROSE)]
+    for product in products:
+        for key, value in product.items():
+            label = labels[key]
+            style = rng.random()
+            if style < 0.2:
+                lines.append(f"- **{label}:** {value}")
+            elif style < 0.3:
+                lines.append(f"  {label}: {value}")
+            else:
+                lines.append(f"{label}: {value}")
+        lines.append(rng.choice(PROSE))
+    return '\n'.join(lines)
+
+
+def timing(sizes, repeats=20, seed=1):
+    rng = random.Random(seed)
+    print(f"{'products':>9}{'chars':>10}{'legacy (ms)':>13}{'single-pass (ms)':>18}")
+    for size in sizes:
+        text = render(rng, [random_product(rng) for _ in range(size)])
+        results = []
+        for parse in (legacy_extract_products, extract_products):
+            start = time.perf_counter()
+            for _ in range(repeats):
+                parse(text)
+            results.append((time.perf_counter() - start) / repeats * 1000)
+        print(f"{size:>9}{len(text):>10}{results[0]:>13.3f}{results[1]:>18.3f}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Time extract_products against the legacy parser")
+    parser.add_argument('--sizes', default='5,50,500,5000')
+    args = parser.parse_args()
+    timing([int(size) for size in args.sizes.split(',')])
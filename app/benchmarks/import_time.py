@@ -0,0 +1,89 @@
+"""Import time of the web and Celery entry points, from ``python -X importtime``.
+
+Each target is imported in a fresh interpreter the way its process boots:
+
+* web: ``app:app``, what ``gunicorn app:app`` loads
+* asgi: ``app.asgi:application``
+* celery: ``app.celery_config.celery`` plus the task module, what
+  ``celery -A app.celery_config.celery worker`` loads
+
+and the wall time and the heaviest modules by cumulative import time are
+reported. With ``--ref`` the same targets are also imported from a checkout
+of that git revision, for a before/after comparison.
+
+Usage:
+    python -m app.benchmarks.import_time --ref HEAD~1 --top 10
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+import tarfile
+import tempfile
+import time
+
+TARGETS = {
+    'web': "import app; app.app",
+    'asgi': "from app.asgi import application",
+    'celery': "from app.celery_config import celery; import app.celery_worker",
+}
+IMPORTTIME_RE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def import_profile(root, statement, runs):
+    env = dict(os.environ, PYTHONPATH=root, OPENAI_API_KEY=os.getenv('OPENAI_API_KEY', 'sk-local-benchmark'))
+    walls, stderr = [], ''
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = subprocess.run([sys.executable, '-X', 'importtime', '-c', statement],
+                                cwd=root, env=env, capture_output=True, text=True)
+        walls.append(time.perf_counter() - start)
+        if result.returncode != 0:
+            tail = result.stderr.strip().splitlines()[-1:]
+            return None, [], tail[0] if tail else 'failed'
+        stderr = result.stderr
+    modules = {}
+    for match in IMPORTTIME_RE.finditer(stderr):
+        modules[match.group(4)] = int(match.group(2))
+    # Top-level packages only, so a package and its submodules aren't counted twice
+    top = sorted(((us, name) for name, us in modules.items() if '.' not in name), reverse=True)
+    return min(walls), top, None
+
+
+def checkout(ref, directory):
+    archive = os.path.join(directory, 'tree.tar')
+    with open(archive, 'wb') as f:
+        subprocess.run(['git', 'archive', ref], check=True, stdout=f)
+    with tarfile.open(archive) as tar:
+        tar.extractall(directory)
+    os.remove(archive)
+    return directory
+
+
+def report(label, wall, top, error, count):
+    if error:
+        print(f"  {label}: failed ({error})")
+        return
+    heaviest = ', '.join(f"{name} {us / 1000:.0f}ms" for us, name in top[:count])
+    print(f"  {label}: {wall * 1000:.0f} ms wall; heaviest: {heaviest}")
+
+
+def main(ref, runs, count):
+    roots = {'current': os.getcwd()}
+    with tempfile.TemporaryDirectory() as tmp:
+        if ref:
+            roots[ref] = checkout(ref, tmp)
+        for target, statement in TARGETS.items():
+            print(target)
+            for label, root in roots.items():
+                report(label, *import_profile(root, statement, runs), count)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Measure import time of the web and Celery entry points")
+    parser.add_argument('--ref', default=None, help="git revision to compare against")
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--top', type=int, default=8)
+    args = parser.parse_args()
+    main(args.ref, args.runs, args.top)
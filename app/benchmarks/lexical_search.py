@@ -0,0 +1,97 @@
+"""Build time and query latency of the BM25 index and hybrid product search.
+
+Generates a synthetic catalog of ``--products`` blocks with the feed's field
+layout, builds the lexical index and an embedding store over it, and times:
+
+* index build
+* exact ID/SKU lookups (the fast path that skips the embeddings call)
+* BM25 queries by brand, category and free text
+* hybrid search (vector + BM25 fused), with a random query embedding
+
+Usage:
+    python -m app.benchmarks.lexical_search --products 100000
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+import numpy as np
+
+from app.embedding_store import EmbeddingStore, save_store
+from app.lexical_index import LexicalIndex
+from app.retrieval import ProductRetriever
+
+BRANDS = ['Dover', 'Weatherbeeta', 'Horseware', 'Tough-1', 'Ovation', 'Kerrits', 'Roma', 'Shires']
+CATEGORIES = ['Tack>Bridles>Snaffle Bridles', 'Horse Care>Fly Control>Fly Masks', 'Blankets>Turnout Sheets',
+              'Apparel>Apparel Accessories>Purses Totes', 'Saddle Pads>Western Pads', 'Grooming>Brushes']
+WORDS = ['soft', 'padded', 'leather', 'breathable', 'adjustable', 'waterproof', 'durable', 'lightweight',
+         'mesh', 'wool', 'fleece', 'nylon', 'reflective', 'contoured', 'quilted', 'stainless']
+
+
+def synthetic_texts(count, seed=0):
+    rng = random.Random(seed)
+    texts = []
+    for i in range(count):
+        brand = rng.choice(BRANDS)
+        category = rng.choice(CATEGORIES)
+        description = ' '.join(rng.choice(WORDS) for _ in range(60))
+        texts.append(
+            f"ID: {100000 + i}\nSku: {brand[:2].upper()}-{i:06d}\nTitle: {brand} {category.split('>')[-1]} {i}\n"
+            f"Brands: {brand}\nProductcategories: {category}\nStockStatus: instock\nContent: {description}"
+        )
+    return texts
+
+
+def time_calls(call, arguments):
+    samples = []
+    for argument in arguments:
+        start = time.perf_counter()
+        call(argument)
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return statistics.median(samples), samples[max(int(len(samples) * 0.99) - 1, 0)]
+
+
+def main(products, dimensions, queries):
+    rng = random.Random(1)
+    texts = synthetic_texts(products)
+
+    start = time.perf_counter()
+    lexical = LexicalIndex.build(texts, 'benchmark')
+    build_s = time.perf_counter() - start
+    print(f"{products} products, {len(lexical.terms)} terms, {len(lexical.postings)} postings, built in {build_s:.2f}s")
+
+    exact_queries = [f"do you still have {BRANDS[0][:2].upper()}-{rng.randrange(products):06d}?" for _ in range(queries)]
+    bm25_queries = [f"{rng.choice(BRANDS)} {rng.choice(CATEGORIES).split('>')[-1]} {rng.choice(WORDS)}" for _ in range(queries)]
+
+    print(f"{'query':<14}{'p50 (ms)':>10}{'p99 (ms)':>10}")
+    for name, call, arguments in (
+        ('exact sku', lexical.exact_matches, exact_queries),
+        ('bm25', lambda query: lexical.search(query, k=20), bm25_queries),
+    ):
+        p50, p99 = time_calls(call, arguments)
+        print(f"{name:<14}{p50:>10.2f}{p99:>10.2f}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        base = os.path.join(tmp, 'catalog')
+        embeddings = np.random.default_rng(0).standard_normal((products, dimensions), dtype=np.float32)
+        save_store(base, [{'text': text, 'page_num': i + 1, 'product_id': str(100000 + i)} for i, text in enumerate(texts)], embeddings)
+        del embeddings
+        retriever = ProductRetriever(EmbeddingStore.open(base), lexical=lexical)
+        query_embeddings = np.random.default_rng(2).standard_normal((queries, dimensions), dtype=np.float32)
+        p50, p99 = time_calls(lambda i: retriever.hybrid_search(bm25_queries[i], query_embeddings[i], k=5), range(queries))
+        print(f"{'hybrid':<14}{p50:>10.2f}{p99:>10.2f}")
+        p50, p99 = time_calls(lambda i: retriever.search(query_embeddings[i], k=5), range(queries))
+        print(f"{'vector only':<14}{p50:>10.2f}{p99:>10.2f}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Time BM25, exact-match and hybrid product search")
+    parser.add_argument('--products', type=int, default=100000)
+    parser.add_argument('--dimensions', type=int, default=1536)
+    parser.add_argument('--queries', type=int, default=200)
+    args = parser.parse_args()
+    main(args.products, args.dimensions, args.queries)
@@ -0,0 +1,127 @@
+"""Throughput of the /ask logging path with the old and new logging setups.
+
+Replays the log calls one /ask turn makes (request, form fields, webhook
+fetches with their bodies, tool outputs, and one failed lookup whose error
+carries the webhook URL), with payloads the size of real product lookups,
+and reports turns per second for:
+
+* "old": ``basicConfig(level=DEBUG)`` to a stream and f-string messages that
+  include full form data, webhook bodies and tool outputs
+* "production": ``configure_logging`` with the JSON queue profile at INFO and
+  the current lazy %-style calls
+* "production, DEBUG sampled": the same with ``LOG_LEVEL=DEBUG`` and the
+  configured DEBUG sample rate
+
+Output goes to a temporary file so terminal speed doesn't skew the result.
+The run fails if the pre-shared key shows up in the output of either new
+profile.
+
+Usage:
+    python -m app.benchmarks.logging_overhead --turns 5000
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+
+from app.logging_config import configure_logging, stop_logging
+
+PRE_SHARED_KEY = 'psk-benchmark-0123456789abcdef'
+logger = logging.getLogger('app.ask_helpers')
+
+PRODUCT = {
+    'id': 12345, 'title': 'Padded Leather Halter', 'price': '39.99', 'stock_status': 'instock',
+    'description': 'Soft padded leather halter with a brass hardware. ' * 40,
+    'variations': [{'id': 12345 + i, 'size': size, 'color': 'Havana'} for i, size in enumerate(['Pony', 'Cob', 'Horse', 'Oversize'])],
+}
+BODY = json.dumps(PRODUCT).encode()
+FORM = {'question': 'Do you have a padded halter for a cob?', 'csrf_token': 'ImY0ZDk2Yz' * 8}
+SESSION_INFO = {'wp_username': 'rider@example.com', 'page': 'https://www.eqbay.co/product/halter', 'cart': list(range(20))}
+HEADERS = {f'X-Header-{i}': 'v' * 40 for i in range(25)}
+
+
+def lookup_error():
+    # requests puts the full URL, key included, in its exception messages
+    return f"404 Client Error: Not Found for url: https://www.eqbay.co/wp-json/custom/v1/product-info/12348?key={PRE_SHARED_KEY}"
+
+
+def old_turn():
+    logger.debug("Entered the /ask endpoint")
+    logger.debug(f"Received request: POST https://epona.eqbay.co/ask headers={HEADERS}")
+    logger.debug(f"Form data: {FORM}")
+    logger.debug(f"Extracted form fields - question: {FORM['question']}, csrf_token: {FORM['csrf_token']}")
+    logger.debug(f"Session Info in generate_responses: {SESSION_INFO}")
+    tool_outputs = []
+    for product_id in (12345, 12346, 12347):
+        url = f"https://www.eqbay.co/wp-json/custom/v1/product-info/{product_id}?key={PRE_SHARED_KEY}"
+        logger.debug(f"Sending request to URL: {url}")
+        logger.debug(f"Received response from webhook: 200 - {BODY}")
+        tool_outputs.append({'tool_call_id': f'call_{product_id}', 'output': BODY.decode()})
+    logger.error(f"Error fetching product info for ID 12348: {lookup_error()}")
+    logger.debug(f"Prepared tool outputs: {tool_outputs}")
+    logger.debug(f"Submitting tool outputs: {tool_outputs}")
+    logger.info("Run completed for thread thread_abc")
+
+
+def new_turn():
+    logger.debug("Received /ask: question=%r", FORM['question'])
+    logger.debug("Session Info in generate_responses: %s", SESSION_INFO)
+    tool_outputs = []
+    for product_id in (12345, 12346, 12347):
+        logger.debug("Fetching product info for ID %s", product_id)
+        logger.debug("Received response from webhook: %s (%d bytes)", 200, len(BODY))
+        tool_outputs.append({'tool_call_id': f'call_{product_id}', 'output': BODY.decode()})
+    logger.error(f"Error fetching product info for ID 12348: {lookup_error()}")
+    logger.debug("Prepared %d tool outputs", len(tool_outputs))
+    logger.debug("Submitting tool outputs: %s", tool_outputs)
+    logger.info("Run completed for thread %s", 'thread_abc')
+
+
+def run(turn, turns):
+    start = time.perf_counter()
+    for _ in range(turns):
+        turn()
+    return turns / (time.perf_counter() - start)
+
+
+def main(turns):
+    config = {'pre_shared_key': PRE_SHARED_KEY, 'logging': {'format': 'json', 'debug_sample_rate': 0.1}}
+    os.environ.pop('LOG_FORMAT', None)
+    print(f"{'logging':<30}{'turns/s':>10}{'log MB':>10}")
+    leaked = False
+    for name, turn, level in (
+        ('old', old_turn, None),
+        ('production', new_turn, 'INFO'),
+        ('production, DEBUG sampled', new_turn, 'DEBUG'),
+    ):
+        with tempfile.NamedTemporaryFile('w+', suffix='.log') as output:
+            if level is None:
+                stop_logging()
+                logging.basicConfig(level=logging.DEBUG, stream=output, force=True)
+            else:
+                os.environ['LOG_LEVEL'] = level
+                configure_logging(config, stream=output, force=True)
+            rate = run(turn, turns)
+            stop_logging()
+            for handler in logging.getLogger().handlers:
+                handler.flush()
+            output.seek(0)
+            text = output.read()
+            if level is not None:
+                leaked = leaked or PRE_SHARED_KEY in text
+            print(f"{name:<30}{rate:>10.0f}{len(text) / 1e6:>10.1f}")
+    logging.basicConfig(stream=sys.stderr, force=True)
+    if leaked:
+        print("pre-shared key found in production log output")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compare /ask throughput under the old and new logging setups")
+    parser.add_argument('--turns', type=int, default=5000)
+    args = parser.parse_args()
+    sys.exit(main(args.turns))
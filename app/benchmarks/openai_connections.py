@@ -0,0 +1,135 @@
+"""Connection reuse and latency of the shared OpenAI client.
+
+Starts a local mock of the OpenAI API that speaks HTTP/1.1 keep-alive,
+counts the TCP connections it accepts, and charges ``--handshake-ms`` on
+each new connection to stand in for the TCP and TLS setup of a real one.
+Worker threads then make a mix of calls the way the app's modules do, under
+two layouts:
+
+* "per-module": a separate default ``OpenAI()`` client for each module that
+  used to build its own (initialize, rag, session_manager, process_document)
+* "shared": every call through ``get_openai_client()``
+
+and the connections opened and per-call latency are reported.
+
+Usage:
+    python -m app.benchmarks.openai_connections --threads 16 --calls 50
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+os.environ.setdefault('OPENAI_API_KEY', 'sk-local-benchmark')
+
+from openai import OpenAI
+
+MODULES = ['initialize', 'rag', 'session_manager', 'process_document']
+
+
+class MockOpenAIHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    handshake = 0.03
+    latency = 0.005
+    connections = 0
+    lock = threading.Lock()
+
+    def setup(self):
+        super().setup()
+        cls = type(self)
+        with cls.lock:
+            cls.connections += 1
+        time.sleep(cls.handshake)
+
+    def do_GET(self):
+        time.sleep(self.latency)
+        model = self.path.rsplit('/', 1)[-1]
+        self._send({'id': model, 'object': 'model', 'created': 0, 'owned_by': 'benchmark'})
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        time.sleep(self.latency)
+        self._send({
+            'object': 'list',
+            'data': [{'object': 'embedding', 'index': 0, 'embedding': [0.001] * 8}],
+            'model': body['model'],
+            'usage': {'prompt_tokens': 1, 'total_tokens': 1}
+        })
+
+    def _send(self, payload):
+        data = json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def call(client, rng):
+    if rng.random() < 0.5:
+        client.embeddings.create(model='text-embedding-3-small', input='fly mask')
+    else:
+        client.models.retrieve('gpt-4o-mini')
+
+
+def run(clients, threads, calls, seed=0):
+    latencies = []
+    lock = threading.Lock()
+
+    def worker(index):
+        rng = random.Random(seed + index)
+        samples = []
+        for _ in range(calls):
+            client = clients[rng.choice(MODULES)]
+            start = time.perf_counter()
+            call(client, rng)
+            samples.append((time.perf_counter() - start) * 1000)
+        with lock:
+            latencies.extend(samples)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(worker, range(threads)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return elapsed, statistics.median(latencies), latencies[int(len(latencies) * 0.99) - 1]
+
+
+def main(threads, calls, handshake_ms):
+    MockOpenAIHandler.handshake = handshake_ms / 1000
+    server = ThreadingHTTPServer(('127.0.0.1', 0), MockOpenAIHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    os.environ['OPENAI_BASE_URL'] = f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+    from app.openai_client import get_openai_client, http2_available
+
+    layouts = {
+        'per-module': lambda: {module: OpenAI() for module in MODULES},
+        'shared': lambda: {module: get_openai_client() for module in MODULES},
+    }
+    print(f"{threads} threads x {calls} calls, {handshake_ms:.0f}ms per new connection, http2={http2_available()}")
+    print(f"{'layout':<12}{'connections':>12}{'p50 (ms)':>10}{'p99 (ms)':>10}{'total (s)':>11}")
+    for name, build in layouts.items():
+        clients = build()
+        MockOpenAIHandler.connections = 0
+        elapsed, p50, p99 = run(clients, threads, calls)
+        print(f"{name:<12}{MockOpenAIHandler.connections:>12}{p50:>10.1f}{p99:>10.1f}{elapsed:>11.2f}")
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Measure OpenAI connection reuse against a local mock server")
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--calls', type=int, default=50)
+    parser.add_argument('--handshake-ms', type=float, default=30)
+    args = parser.parse_args()
+    main(args.threads, args.calls, args.handshake_ms)
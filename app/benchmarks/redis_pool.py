@@ -0,0 +1,73 @@
+"""Redis connection count and latency under concurrent /ask-style load.
+
+Each worker thread repeats the Redis traffic of one /ask turn (session read
+and write, cached user info and product info lookups) for a fixed duration.
+The "pooled" mode shares the app's pooled client. The "per-client" mode
+gives every thread its own ``Redis.from_url`` client, the way the admin
+scripts, the rate limiter and the web app each used to open their own
+connections. Reports the server-side connection count and latency
+percentiles.
+
+Usage:
+    python -m app.benchmarks.redis_pool --threads 64 --seconds 10
+"""
+import argparse
+import threading
+import time
+
+from redis import Redis
+
+from app.redis_config import REDIS_URL, get_redis
+
+
+def ask_turn(client, session_key):
+    client.get(session_key)
+    client.get(f"user_info:{session_key}")
+    client.get("product_info:12345")
+    client.setex(session_key, 3600, b"x" * 512)
+
+
+def worker(client_factory, seconds, latencies, index):
+    client = client_factory()
+    session_key = f"session:bench-{index}"
+    deadline = time.time() + seconds
+    while time.time() < deadline:
+        start = time.perf_counter()
+        ask_turn(client, session_key)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+
+def run_mode(name, client_factory, threads, seconds, admin):
+    latencies = []
+    baseline = len(admin.client_list())
+    workers = [threading.Thread(target=worker, args=(client_factory, seconds, latencies, i)) for i in range(threads)]
+    for thread in workers:
+        thread.start()
+    time.sleep(seconds / 2)
+    peak = len(admin.client_list()) - baseline
+    for thread in workers:
+        thread.join()
+
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2]
+    p99 = latencies[int(len(latencies) * 0.99) - 1]
+    print(f"{name:<12}{peak:>14}{len(latencies) / seconds:>12.0f}{p50:>10.2f}{p99:>10.2f}")
+
+
+def main(threads, seconds):
+    admin = Redis.from_url(REDIS_URL)
+    print(f"{'mode':<12}{'connections':>14}{'turns/s':>12}{'p50 ms':>10}{'p99 ms':>10}")
+    run_mode('pooled', get_redis, threads, seconds, admin)
+    run_mode('per-client', lambda: Redis.from_url(REDIS_URL), threads, seconds, admin)
+
+    for key in admin.scan_iter(match="session:bench-*"):
+        admin.delete(key)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compare pooled and per-client Redis usage")
+    parser.add_argument('--threads', type=int, default=64)
+    parser.add_argument('--seconds', type=float, default=10)
+    args = parser.parse_args()
+
+    main(args.threads, args.seconds)
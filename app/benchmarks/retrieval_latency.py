@@ -0,0 +1,84 @@
+"""Query latency of the in-process product retriever.
+
+Builds a synthetic embedding store per catalog size and times
+``ProductRetriever.search`` with no filters, with a selective filter
+(riding style + in stock) and with a category filter. Query embeddings are
+random, so the numbers reflect scoring cost only, not the embeddings call.
+
+Usage:
+    python -m app.benchmarks.retrieval_latency --sizes 10000,100000,500000 --dtype float16
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+import numpy as np
+
+from app.embedding_store import EmbeddingStore, save_store
+from app.retrieval import ProductRetriever
+
+STYLES = ['English', 'Western', 'None']
+CATEGORIES = ['Tack>Bridles>Snaffle Bridles', 'Horse Care>Fly Control>Fly Masks', 'Blankets>Turnout Sheets', 'Apparel>Apparel Accessories>Purses Totes']
+BRANDS = ['Dover', 'Weatherbeeta', 'Horseware', 'Tough-1', 'Ovation']
+
+QUERIES = {
+    'unfiltered': {},
+    'style+stock': {'riding_style': 'Western', 'in_stock': True},
+    'category': {'category': 'Fly Masks'},
+}
+
+
+def synthetic_store(base, count, dimensions, dtype, seed=0):
+    rng = np.random.default_rng(seed)
+    text_blocks = [
+        {
+            'text': (f"ID: {i}\nTitle: Synthetic Product {i}\nProductRidingStyle: {STYLES[i % 3]}\n"
+                     f"Productcategories: {CATEGORIES[i % 4]}\nBrands: {BRANDS[i % 5]}\n"
+                     f"StockStatus: {'outofstock' if i % 7 == 0 else 'instock'}"),
+            'page_num': i + 1,
+            'product_id': str(i)
+        }
+        for i in range(count)
+    ]
+    embeddings = rng.standard_normal((count, dimensions), dtype=np.float32)
+    save_store(base, text_blocks, embeddings, dtype=dtype)
+
+
+def time_queries(retriever, dimensions, filters, queries, k):
+    rng = np.random.default_rng(1)
+    samples = []
+    for _ in range(queries):
+        query = rng.standard_normal(dimensions, dtype=np.float32)
+        start = time.perf_counter()
+        retriever.search(query, k=k, **filters)
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return statistics.median(samples), samples[max(int(len(samples) * 0.99) - 1, 0)]
+
+
+def main(sizes, dimensions, dtype, queries, k):
+    print(f"{dimensions} dims, {dtype}, top {k}, {queries} queries per row")
+    print(f"{'products':>10}  {'query':<13}{'p50 (ms)':>10}{'p99 (ms)':>10}")
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            base = os.path.join(tmp, 'catalog')
+            synthetic_store(base, size, dimensions, dtype)
+            start = time.perf_counter()
+            retriever = ProductRetriever(EmbeddingStore.open(base))
+            print(f"{size:>10}  {'index build':<13}{(time.perf_counter() - start) * 1000:>10.0f}")
+            for name, filters in QUERIES.items():
+                p50, p99 = time_queries(retriever, dimensions, filters, queries, k)
+                print(f"{size:>10}  {name:<13}{p50:>10.2f}{p99:>10.2f}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Time in-process product retrieval")
+    parser.add_argument('--sizes', default='10000,100000', help="comma-separated catalog sizes")
+    parser.add_argument('--dimensions', type=int, default=1536)
+    parser.add_argument('--dtype', choices=['float32', 'float16'], default='float32')
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--k', type=int, default=5)
+    args = parser.parse_args()
+    main([int(size) for size in args.sizes.split(',')], args.dimensions, args.dtype, args.queries, args.k)
@@ -0,0 +1,130 @@
+"""Compare time-to-first-byte of the streaming and polling /ask paths.
+
+Runs entirely offline: the OpenAI client used by ``ask_helpers`` is replaced
+with a fake that replays a canned assistant answer token by token, so the
+numbers only reflect how quickly each path relays what the run produces.
+
+Usage:
+    python -m app.benchmarks.run_stream --token-delay 0.02 --think-time 0.5
+"""
+import argparse
+import json
+import os
+import time
+from types import SimpleNamespace
+
+os.environ.setdefault('OPENAI_API_KEY', 'sk-local-benchmark')
+
+from flask import Flask
+
+from app import ask_helpers
+
+ANSWER = json.dumps({
+    "response": (
+        "Hi there! For a young horse just starting under saddle, a soft, "
+        "well-padded snaffle bridle is a great choice. Here are a couple of "
+        "options that riders at your level love."
+    ),
+    "products": []
+})
+
+
+def fake_event(name, data):
+    return SimpleNamespace(event=name, data=data)
+
+
+def text_delta(value):
+    part = SimpleNamespace(type='text', text=SimpleNamespace(value=value))
+    return SimpleNamespace(delta=SimpleNamespace(content=[part]))
+
+
+def assistant_message(value):
+    return SimpleNamespace(role='assistant', content=[SimpleNamespace(text=SimpleNamespace(value=value))])
+
+
+class FakeRuns:
+    def __init__(self, answer, token_delay, think_time, token_size=4):
+        self.tokens = [answer[i:i + token_size] for i in range(0, len(answer), token_size)]
+        self.answer = answer
+        self.token_delay = token_delay
+        self.think_time = think_time
+        self.generation_time = think_time + token_delay * len(self.tokens)
+        self.started = None
+
+    def _event_stream(self):
+        yield fake_event('thread.run.created', SimpleNamespace(id='run_fake'))
+        time.sleep(self.think_time)
+        for token in self.tokens:
+            time.sleep(self.token_delay)
+            yield fake_event('thread.message.delta', text_delta(token))
+        yield fake_event('thread.message.completed', assistant_message(self.answer))
+        yield fake_event('thread.run.completed', SimpleNamespace(id='run_fake', status='completed'))
+
+    def create(self, thread_id, assistant_id, stream=False):
+        self.started = time.time()
+        if stream:
+            return self._event_stream()
+        return SimpleNamespace(id='run_fake')
+
+    def retrieve(self, thread_id, run_id):
+        done = time.time() - self.started >= self.generation_time
+        return SimpleNamespace(status='completed' if done else 'in_progress', required_action=None)
+
+
+class FakeMessages:
+    def __init__(self, answer):
+        self.answer = answer
+
+    def list(self, thread_id, limit=None):
+        return SimpleNamespace(data=[assistant_message(self.answer)])
+
+
+def fake_client(answer, token_delay, think_time):
+    threads = SimpleNamespace(
+        runs=FakeRuns(answer, token_delay, think_time),
+        messages=FakeMessages(answer)
+    )
+    return SimpleNamespace(beta=SimpleNamespace(threads=threads))
+
+
+def measure(chunks):
+    start = time.perf_counter()
+    first = None
+    for _ in chunks:
+        if first is None:
+            first = time.perf_counter() - start
+    return first, time.perf_counter() - start
+
+
+def run_benchmark(runs, token_delay, think_time):
+    flask_app = Flask(__name__)
+    flask_app.secret_key = 'benchmark'
+    ask_helpers.analytics = SimpleNamespace(track=lambda *args, **kwargs: None)
+
+    results = {'stream': [], 'poll': []}
+    with flask_app.test_request_context():
+        for _ in range(runs):
+            client = fake_client(ANSWER, token_delay, think_time)
+            ask_helpers.get_openai_client = lambda: client
+            event_stream = client.beta.threads.runs.create('thread_fake', 'asst_fake', stream=True)
+            results['stream'].append(measure(ask_helpers.stream_responses('thread_fake', event_stream)))
+
+            client = fake_client(ANSWER, token_delay, think_time)
+            run = client.beta.threads.runs.create('thread_fake', 'asst_fake')
+            results['poll'].append(measure(ask_helpers.generate_responses('thread_fake', run)))
+
+    print(f"{'mode':<8}{'ttfb (s)':>12}{'total (s)':>12}")
+    for mode, samples in results.items():
+        ttfb = sum(sample[0] for sample in samples) / len(samples)
+        total = sum(sample[1] for sample in samples) / len(samples)
+        print(f"{mode:<8}{ttfb:>12.3f}{total:>12.3f}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Measure /ask time-to-first-byte without the network")
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--token-delay', type=float, default=0.02, help="Seconds between streamed tokens")
+    parser.add_argument('--think-time', type=float, default=0.5, help="Seconds before the first token")
+    args = parser.parse_args()
+
+    run_benchmark(args.runs, args.token_delay, args.think_time)
@@ -0,0 +1,87 @@
+"""Per-product content hashes for incremental catalog refreshes.
+
+The manifest maps each product ID to the hash of its text block. A refresh
+diffs the freshly built blocks against it so only added or changed products
+are re-embedded; products that disappeared from the feed are kept as
+tombstones (``removed_at``) rather than silently dropped, so a product that
+comes back is recognised as re-added.
+"""
+import hashlib
+import json
+import logging
+import os
+import time
+
+from .settings import config
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_PATH = config.get('catalog_manifest_path', './app/training/catalog_manifest.json')
+
+
+def block_key(block):
+    # Posts without an ID fall back to their page so they still diff deterministically
+    return block.get('product_id') or f"page:{block['page_num']}"
+
+
+def block_hash(block):
+    return hashlib.sha256(block['text'].encode('utf-8')).hexdigest()
+
+
+def load_manifest(path=None):
+    path = path or MANIFEST_PATH
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except ValueError as e:
+        # A corrupt manifest only costs a full re-embed
+        logger.error(f"Ignoring unreadable catalog manifest {path}: {str(e)}")
+        return {}
+
+
+def save_manifest(manifest, path=None):
+    path = path or MANIFEST_PATH
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, path)
+
+
+def diff_catalog(text_blocks, manifest):
+    """Split ``text_blocks`` against ``manifest``.
+
+    Returns ``(added, changed, unchanged, removed)``: the first three are lists
+    of blocks, ``removed`` is the list of product keys no longer in the feed.
+    """
+    added, changed, unchanged = [], [], []
+    seen = set()
+    for block in text_blocks:
+        key = block_key(block)
+        seen.add(key)
+        entry = manifest.get(key)
+        if entry is None or entry.get('removed_at'):
+            added.append(block)
+        elif entry.get('hash') != block_hash(block):
+            changed.append(block)
+        else:
+            unchanged.append(block)
+
+    removed = [key for key, entry in manifest.items() if key not in seen and not entry.get('removed_at')]
+    return added, changed, unchanged, removed
+
+
+def update_manifest(manifest, text_blocks, removed, now=None):
+    """Record the current hash of every block and tombstone ``removed`` keys."""
+    now = now or time.time()
+    for block in text_blocks:
+        key = block_key(block)
+        digest = block_hash(block)
+        entry = manifest.get(key)
+        if entry is None or entry.get('removed_at') or entry.get('hash') != digest:
+            manifest[key] = {'hash': digest, 'updated_at': now}
+    for key in removed:
+        manifest[key] = {**manifest[key], 'removed_at': now}
+    return manifest
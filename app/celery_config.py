@@ -1,9 +1,15 @@
 from celery import Celery
+from celery.signals import setup_logging
 from flask import Flask
-from dotenv import load_dotenv
 import os
+from .redis_config import REDIS_MAX_CONNECTIONS, REDIS_HEALTH_CHECK_INTERVAL, REDIS_SOCKET_TIMEOUT
+from .settings import config
+from .logging_config import configure_logging
 
-load_dotenv()  # This will load the environment variables from .env
+@setup_logging.connect
+def configure_worker_logging(**kwargs):
+    # Workers and beat log through the app's profile instead of Celery's own
+    configure_logging(config)
 
 def create_flask_app():
     app = Flask(__name__)
@@ -30,6 +36,29 @@ def create_celery_app(app=None):
             with app.app_context():
                 return self.run(*args, **kwargs)
 
+    # Match the pool limits and health checks of the web app's Redis client
+    celery.conf.update(
+        broker_pool_limit=int(os.getenv('CELERY_BROKER_POOL_LIMIT', 10)),
+        broker_transport_options={
+            'max_connections': REDIS_MAX_CONNECTIONS,
+            'health_check_interval': REDIS_HEALTH_CHECK_INTERVAL,
+            'socket_keepalive': True,
+            'socket_timeout': REDIS_SOCKET_TIMEOUT,
+        },
+        redis_max_connections=REDIS_MAX_CONNECTIONS,
+        redis_backend_health_check_interval=REDIS_HEALTH_CHECK_INTERVAL,
+        redis_socket_keepalive=True,
+        redis_socket_timeout=REDIS_SOCKET_TIMEOUT,
+    )
+
+    # Run with `celery -A app.celery_config.celery beat` next to the workers
+    celery.conf.beat_schedule = {
+        'expire-idle-threads': {
+            'task': 'app.celery_worker.expire_idle_threads_task',
+            'schedule': float(config.get('thread_sweep_interval', 900)),
+        },
+    }
+
     celery.Task = ContextTask
     celery.flask_app = app
     return celery
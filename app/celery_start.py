@@ -1,3 +1,4 @@
-from .app import app
+from .app import create_app
 
-app.app_context().push()
\ No newline at end of file
+app = create_app()
+app.app_context().push()
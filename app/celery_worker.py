@@ -2,13 +2,19 @@ from .celery_config import celery, create_celery_app
 from celery import chord
 from celery.exceptions import Ignore
 from flask import current_app
+import json
 import logging
+import shutil
 import time
 import os
-from dotenv import load_dotenv
-import json
 
-load_dotenv()
+
+# Minimum seconds between progress updates written to the result backend
+PROGRESS_INTERVAL = 2
+
+# Progress of the latest catalog rebuild across its shards and the callback
+CATALOG_PROGRESS_KEY = 'catalog:progress'
+CATALOG_PROGRESS_TTL = 86400
 
 def get_flask_app():
     """Ensure Flask app context is available."""
@@ -25,26 +31,108 @@ def process_embeddings_task(self, text_blocks):
     app = get_flask_app()
 
     with app.app_context():
-        from .process_document import get_embedding
+        from .embeddings import get_embeddings
 
         total_blocks = len(text_blocks)
-        for i, block in enumerate(text_blocks):
-            if 'embedding' not in block:
-                try:
-                    block['embedding'] = get_embedding(block['text'])
-                    progress = (i + 1) / total_blocks * 100
-                    self.update_state(state='PROGRESS', meta={
-                        'current': i + 1,
-                        'total': total_blocks,
-                        'progress': progress,
-                        'stage': 'embeddings'
-                    })
-                    logger.debug(f"Processed block {i + 1}/{total_blocks}")
-                except Exception as e:
-                    logger.error(f"Error generating embedding for block {i}: {str(e)}")
-
-        logger.info("Embedding process complete")
-        return {'current': total_blocks, 'total': total_blocks, 'progress': 100}
+        last_update = 0
+
+        def report_progress(done, total):
+            # One Redis write every PROGRESS_INTERVAL seconds, not one per batch
+            nonlocal last_update
+            if done < total and time.time() - last_update < PROGRESS_INTERVAL:
+                return
+            last_update = time.time()
+            self.update_state(state='PROGRESS', meta={
+                'current': done,
+                'total': total,
+                'progress': done / total * 100,
+                'stage': 'embeddings'
+            })
+
+        start = time.time()
+        embeddings = get_embeddings([block['text'] for block in text_blocks], on_progress=report_progress)
+        elapsed = time.time() - start
+        failed = sum(1 for embedding in embeddings if embedding is None)
+        rate = total_blocks / elapsed if elapsed else 0.0
+        logger.info(f"Embedding process complete: {total_blocks} blocks in {elapsed:.1f}s ({rate:.1f} blocks/s), {failed} failed")
+        return {
+            'current': total_blocks,
+            'total': total_blocks,
+            'progress': 100,
+            'embeddings': embeddings
+        }
+
+def catalog_staging_dir(run_id):
+    """Shared directory next to the embedding store for one rebuild's shard inputs and outputs.
+
+    Shards and the chord callback exchange their blocks and vectors through
+    files here, so broker and result backend messages stay a few bytes each.
+    """
+    from .settings import config
+    return f"{config.get('embeddings_path', './app/training/embeddings')}.staging/{run_id}"
+
+def write_json(path, data):
+    with open(path, 'w') as f:
+        json.dump(data, f)
+
+def read_json(path):
+    with open(path, 'r') as f:
+        return json.load(f)
+
+def update_catalog_progress(increments=None, **fields):
+    from .redis_config import redis_connection
+    pipe = redis_connection.pipeline(transaction=False)
+    if fields:
+        pipe.hset(CATALOG_PROGRESS_KEY, mapping={key: str(value) for key, value in fields.items()})
+    for key, amount in (increments or {}).items():
+        pipe.hincrby(CATALOG_PROGRESS_KEY, key, amount)
+    pipe.expire(CATALOG_PROGRESS_KEY, CATALOG_PROGRESS_TTL)
+    try:
+        pipe.execute()
+    except Exception as e:
+        logging.getLogger(__name__).warning(f"Could not update catalog progress: {str(e)}")
+
+@celery.task(bind=True)
+def embed_catalog_shard_task(self, run_dir, shard):
+    """Embed one shard of a catalog rebuild and write its vectors next to the store.
+
+    Rows of ``shard-<n>.npy`` follow the shard's block order; a NaN row marks
+    a block whose embedding failed.
+    """
+    logger = logging.getLogger(__name__)
+    import numpy as np
+
+    app = get_flask_app()
+
+    with app.app_context():
+        from .embeddings import get_embeddings
+
+        texts = read_json(os.path.join(run_dir, f"shard-{shard}.json"))
+        start = time.time()
+        embeddings = get_embeddings(texts)
+        dimensions = next((len(embedding) for embedding in embeddings if embedding is not None), 0)
+        vectors = np.full((len(texts), dimensions), np.nan, dtype=np.float32)
+        for row, embedding in enumerate(embeddings):
+            if embedding is not None:
+                vectors[row] = embedding
+        tmp_path = os.path.join(run_dir, f"shard-{shard}.tmp.npy")
+        np.save(tmp_path, vectors)
+        os.replace(tmp_path, os.path.join(run_dir, f"shard-{shard}.npy"))
+
+        failed = sum(1 for embedding in embeddings if embedding is None)
+        update_catalog_progress(increments={'shards_done': 1, 'blocks_done': len(texts)})
+        logger.info(f"Embedded shard {shard}: {len(texts)} blocks in {time.time() - start:.1f}s, {failed} failed")
+        return {'shard': shard, 'blocks': len(texts), 'failed': failed}
+
+@celery.task(bind=True)
+def expire_idle_threads_task(self):
+    """Evict idle OpenAI threads; scheduled by Celery beat (see celery_config)."""
+    logger = logging.getLogger(__name__)
+    from .delete_all_threads import sweep_idle_threads
+
+    deleted = sweep_idle_threads()
+    logger.info(f"Expired {deleted} idle threads")
+    return {'deleted': deleted}
 
 @celery.task(bind=True)
 def generate_catalog_task(self):
@@ -54,59 +142,137 @@ def generate_catalog_task(self):
     app = get_flask_app()
 
     with app.app_context():
-        from .xml_to_pdf import generate_pdf
-        from .process_document import process_document, save_embeddings
-        from .rag import initialize_rag
-
-        def load_config():
-            with open('config.json', 'r') as f:
-                return json.load(f)
+        from .xml_to_pdf import xml_to_text_blocks, generate_pdf
+        from .catalog_manifest import block_key, diff_catalog, load_manifest
+        from .settings import config
 
-        config = load_config()
         app.config.update(config)
 
         if 'catalog_xml_url' not in app.config:
             self.update_state(state='FAILURE', meta={'status': 'error', 'message': 'catalog_xml_url missing in config'})
             raise Ignore()
 
-        self.update_state(state='PROGRESS', meta={'status': 'Generating PDF from XML...'})
-        pdf_content = generate_pdf(app.config['catalog_xml_url'])
-        if pdf_content is None:
-            self.update_state(state='FAILURE', meta={'status': 'error', 'message': 'Failed to generate PDF'})
-            raise Ignore()
-        
-        self.update_state(state='PROGRESS', meta={'status': 'PDF generated successfully'})
-
-        self.update_state(state='PROGRESS', meta={'status': 'Processing document...'})
-        _, _, text_blocks, pdf_mod_date = process_document()
-        self.update_state(state='PROGRESS', meta={'status': f'Document processed. {len(text_blocks)} text blocks extracted'})
-
-        self.update_state(state='PROGRESS', meta={'status': 'Starting embedding generation...'})
-        embedding_task = process_embeddings_task.delay(text_blocks)
-        
-        while not embedding_task.ready():
-            time.sleep(2)
-            task_result = embedding_task.result
-            if isinstance(task_result, dict) and 'progress' in task_result:
-                self.update_state(state='PROGRESS', meta={'status': 'Generating embeddings', 'progress': task_result['progress']})
-
-        embeddings_result = embedding_task.result
-        if isinstance(embeddings_result, dict) and 'embeddings' in embeddings_result:
-            embeddings = embeddings_result['embeddings']
-            save_embeddings({'text_blocks': text_blocks, 'embeddings': embeddings, 'pdf_mod_date': pdf_mod_date})
-            self.update_state(state='PROGRESS', meta={'status': 'Embeddings generation complete and saved'})
-        else:
-            self.update_state(state='FAILURE', meta={'status': 'error', 'message': 'Failed to generate embeddings'})
+        self.update_state(state='PROGRESS', meta={'status': 'Building text blocks from XML...'})
+        text_blocks = xml_to_text_blocks(app.config['catalog_xml_url'])
+        if not text_blocks:
+            self.update_state(state='FAILURE', meta={'status': 'error', 'message': 'Failed to build text blocks from XML'})
             raise Ignore()
+        self.update_state(state='PROGRESS', meta={'status': f'{len(text_blocks)} text blocks built from XML'})
+
+        # The PDF is no longer on the embedding path; render it only when asked to
+        if app.config.get('catalog_pdf_artifact', False):
+            self.update_state(state='PROGRESS', meta={'status': 'Generating PDF artifact...'})
+            pdf_content = generate_pdf(app.config['catalog_xml_url'])
+            if pdf_content is None:
+                logger.warning("Failed to generate catalog PDF artifact")
+            else:
+                os.makedirs(os.path.dirname(app.config['document_path']), exist_ok=True)
+                with open(app.config['document_path'], 'wb') as f:
+                    f.write(pdf_content)
+
+        # Only products whose text changed since the last refresh are re-embedded
+        added, changed, unchanged, removed = diff_catalog(text_blocks, load_manifest())
+        previous_embeddings = load_previous_embeddings()
+        reembed = {id(block) for block in added + changed}
+        to_embed = [
+            index for index, block in enumerate(text_blocks)
+            if id(block) in reembed or block_key(block) not in previous_embeddings
+        ]
+        logger.info(f"Catalog diff: {len(added)} added, {len(changed)} changed, {len(removed)} removed, "
+                    f"{len(unchanged)} unchanged; {len(to_embed)} blocks to embed")
+
+        if not to_embed and not removed:
+            self.update_state(state='SUCCESS', meta={'status': 'Catalog unchanged'})
+            return {'status': 'unchanged'}
+
+        # The catalog and each shard's texts go to shared storage; tasks only carry the path
+        shard_size = int(app.config.get('embedding_shard_size', 500))
+        shards = [to_embed[i:i + shard_size] for i in range(0, len(to_embed), shard_size)]
+        run_dir = catalog_staging_dir(self.request.id or str(int(time.time())))
+        os.makedirs(run_dir, exist_ok=True)
+        write_json(os.path.join(run_dir, 'catalog.json'), {'text_blocks': text_blocks, 'shards': shards, 'removed': removed})
+        for number, shard in enumerate(shards):
+            write_json(os.path.join(run_dir, f"shard-{number}.json"), [text_blocks[index]['text'] for index in shard])
+        update_catalog_progress(
+            run_id=self.request.id, status='embedding', shards_total=len(shards), shards_done=0,
+            blocks_total=len(to_embed), blocks_done=0, started_at=time.time()
+        )
+
+        if not shards:
+            result = save_catalog_embeddings_task.delay([], run_dir)
+            return {'status': 'saving', 'shards': 0, 'blocks': 0, 'callback_id': result.id,
+                    'progress_key': CATALOG_PROGRESS_KEY}
+
+        # Shards run in parallel on whichever workers are free; the callback merges and saves
+        result = chord(
+            embed_catalog_shard_task.s(run_dir, number) for number in range(len(shards))
+        )(save_catalog_embeddings_task.s(run_dir))
+        update_catalog_progress(group_id=result.parent.id, callback_id=result.id)
+
+        logger.info(f"Dispatched {len(to_embed)} blocks to embed in {len(shards)} shards")
+        return {'status': 'embedding', 'shards': len(shards), 'blocks': len(to_embed), 'group_id': result.parent.id,
+                'callback_id': result.id, 'progress_key': CATALOG_PROGRESS_KEY}
+
+def load_previous_embeddings():
+    from .process_document import load_embeddings
+    from .catalog_manifest import block_key
+
+    previous = load_embeddings()
+    return {
+        block_key(block): embedding
+        for block, embedding in zip(previous.get('text_blocks', []), previous.get('embeddings', []))
+        if embedding is not None
+    }
+
+@celery.task(bind=True)
+def save_catalog_embeddings_task(self, shard_results, run_dir):
+    """Chord callback: merge shard embeddings with the unchanged ones and persist them."""
+    logger = logging.getLogger(__name__)
+    import numpy as np
+
+    app = get_flask_app()
+
+    with app.app_context():
+        from .process_document import save_embeddings, build_search_index, build_lexical_index
+        from .catalog_manifest import block_key, load_manifest, save_manifest, update_manifest
+        from .rag import initialize_rag
+
+        update_catalog_progress(status='saving')
+        catalog = read_json(os.path.join(run_dir, 'catalog.json'))
+        text_blocks, removed = catalog['text_blocks'], catalog['removed']
+
+        previous_embeddings = load_previous_embeddings()
+        embeddings = [previous_embeddings.get(block_key(block)) for block in text_blocks]
+        for number, shard in enumerate(catalog['shards']):
+            vectors = np.load(os.path.join(run_dir, f"shard-{number}.npy"))
+            for index, vector in zip(shard, vectors):
+                embeddings[index] = None if not len(vector) or np.isnan(vector[0]) else vector
+
+        save_embeddings({'text_blocks': text_blocks, 'embeddings': embeddings, 'generated_at': time.time()})
+        shutil.rmtree(run_dir, ignore_errors=True)
+        # Blocks whose embedding failed stay out of the manifest so the next refresh retries them
+        embedded = [block for block, embedding in zip(text_blocks, embeddings) if embedding is not None]
+        save_manifest(update_manifest(load_manifest(), embedded, removed))
+        logger.info(f"Saved {len(embedded)}/{len(text_blocks)} catalog embeddings")
+
+        # Without these indexes RAG falls back to exact, vector-only search
+        try:
+            build_lexical_index()
+        except Exception as e:
+            logger.error(f"Error building BM25 index: {str(e)}")
+        try:
+            build_search_index()
+        except Exception as e:
+            logger.error(f"Error building approximate search index: {str(e)}")
 
         self.update_state(state='PROGRESS', meta={'status': 'Reinitializing RAG system...'})
         try:
             initialize_rag()
-            self.update_state(state='PROGRESS', meta={'status': 'RAG system reinitialized successfully'})
         except Exception as e:
             logger.error(f"Error reinitializing RAG system: {str(e)}")
+            update_catalog_progress(status='error', finished_at=time.time())
             self.update_state(state='FAILURE', meta={'status': 'error', 'message': f'Error reinitializing RAG system: {str(e)}'})
             raise Ignore()
 
-        self.update_state(state='SUCCESS', meta={'status': 'Catalog generation complete'})
-        return {'status': 'complete'}
\ No newline at end of file
+        update_catalog_progress(status='complete', finished_at=time.time(), embedded=len(embedded))
+        return {'status': 'complete', 'embedded': len(embedded), 'total': len(text_blocks)}
@@ -0,0 +1,38 @@
+"""Signed CSRF tokens cached in the session until they are due to rotate.
+
+Flask-WTF signs a fresh, timestamped copy of the session's raw token the
+first time ``generate_csrf()`` runs in each request. ``issue_csrf_token``
+keeps the signed token in the session with its issue time and hands the same
+one out again until it is ``CSRF_ROTATE_AFTER`` seconds old. Rotation never
+waits longer than half of ``WTF_CSRF_TIME_LIMIT``, so a visitor always has at
+least that long to submit a token before it expires.
+"""
+import time
+
+from flask import current_app, g, session
+from flask_wtf.csrf import generate_csrf
+
+SIGNED_TOKEN_KEY = 'csrf_signed_token'
+
+
+def rotate_after():
+    seconds = current_app.config.get('CSRF_ROTATE_AFTER', 1800)
+    time_limit = current_app.config.get('WTF_CSRF_TIME_LIMIT', 3600)
+    return min(seconds, time_limit / 2) if time_limit else seconds
+
+
+def issue_csrf_token():
+    """Return this session's signed CSRF token, signing a new one only when due."""
+    field_name = current_app.config.get('WTF_CSRF_FIELD_NAME', 'csrf_token')
+    if field_name in g:
+        return g.get(field_name)
+
+    cached = session.get(SIGNED_TOKEN_KEY)
+    if cached and field_name in session and time.time() - cached[1] < rotate_after():
+        # Flask-WTF's per-request cache, so forms and templates reuse it too
+        setattr(g, field_name, cached[0])
+        return cached[0]
+
+    token = generate_csrf()
+    session[SIGNED_TOKEN_KEY] = (token, time.time())
+    return token
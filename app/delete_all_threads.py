@@ -1,87 +1,194 @@
+"""Delete idle assistant threads from OpenAI and Redis.
+
+Run as a module from the repository root so the package imports resolve:
+    python -m app.delete_all_threads
+"""
 from alive_progress import alive_bar
-from openai import OpenAIError
+from concurrent.futures import ThreadPoolExecutor
+from openai import OpenAIError, NotFoundError
 import logging
 import time
 import random
-import json
-from redis import Redis
 import os
-from dotenv import load_dotenv
-from initialize import client
+from .initialize import config
+from .openai_client import get_openai_client
+from .redis_config import redis_connection
+from .session_manager import ensure_str, scan_batches, unregister_thread, THREAD_ACTIVITY_KEY, THREAD_IDLE_TTL
 
-logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
-# Load environment variables
-load_dotenv()
 
+# OpenAI deletions run concurrently; each one backs off on its own when rate limited
+DELETE_WORKERS = int(os.getenv('THREAD_DELETE_WORKERS', 8))
+
+SWEEP_BATCH_SIZE = int(config.get('thread_sweep_batch_size', 200))
+SWEEP_MAX_BATCHES = int(config.get('thread_sweep_max_batches', 10))
+# Seconds before a thread that failed to delete is retried
+SWEEP_RETRY_DELAY = 3600
+
+# Removes the given threads from the activity set only if they are still idle,
+# so a thread touched mid-sweep is not deleted and two sweepers never share work.
+claim_idle_threads = redis_connection.register_script("""
+local cutoff = tonumber(ARGV[1])
+local claimed = {}
+for i = 2, #ARGV do
+    local score = redis.call('ZSCORE', KEYS[1], ARGV[i])
+    if score and tonumber(score) <= cutoff then
+        redis.call('ZREM', KEYS[1], ARGV[i])
+        table.insert(claimed, ARGV[i])
+    end
+end
+return claimed
+""")
+
+def activity_batches(batch_size=500):
+    """Yield lists of thread ids from the activity set without blocking Redis."""
+    batch = []
+    for thread_id, _ in redis_connection.zscan_iter(THREAD_ACTIVITY_KEY, count=batch_size):
+        batch.append(ensure_str(thread_id))
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def iter_stored_threads(batch_size=500):
+    """Yield batches of ``(thread_id, session_id)`` pairs, each thread once.
+
+    Threads started by /ask are only recorded in the activity set and the
+    ``thread_session:*`` reverse index; older sessions also hold a
+    ``thread:<session_id>`` key. ``session_id`` is None when no session is
+    recorded for the thread.
+    """
+    seen = set()
 
-# Initialize Redis connection
-redis_url = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
-redis_connection = Redis.from_url(redis_url)
+    def with_sessions(thread_ids):
+        thread_ids = [thread_id for thread_id in dict.fromkeys(thread_ids) if thread_id not in seen]
+        seen.update(thread_ids)
+        if not thread_ids:
+            return []
+        session_ids = redis_connection.mget([f"thread_session:{thread_id}" for thread_id in thread_ids])
+        return [(thread_id, ensure_str(session_id) if session_id else None) for thread_id, session_id in zip(thread_ids, session_ids)]
+
+    for thread_ids in activity_batches(batch_size):
+        yield with_sessions(thread_ids)
+    for keys in scan_batches('thread_session:*', batch_size):
+        yield with_sessions([ensure_str(key).split(':', 1)[1] for key in keys])
+    for keys in scan_batches('thread:*', batch_size):
+        values = redis_connection.mget(keys)
+        pairs = [(ensure_str(value), ensure_str(key).split(':', 1)[1]) for key, value in zip(keys, values) if value]
+        pairs = [(thread_id, session_id) for thread_id, session_id in pairs if thread_id not in seen]
+        seen.update(thread_id for thread_id, _ in pairs)
+        yield pairs
 
 def get_stored_thread_ids():
-    keys = redis_connection.keys('thread:*')
-    thread_ids = [redis_connection.get(key).decode('utf-8') for key in keys]
-    return thread_ids
+    return [thread_id for batch in iter_stored_threads() for thread_id, _ in batch]
+
+def thread_keys(thread_id, session_id=None):
+    """Redis keys that belong to a thread and, when known, its chat session."""
+    keys = [f"thread_session:{thread_id}"]
+    if session_id:
+        keys += [f"thread:{session_id}", f"memory:{session_id}", f"products:{session_id}", f"user_info:{session_id}"]
+    return keys
 
 def delete_thread(thread_id):
     logger.debug(f"Attempting to delete thread {thread_id}")
+    if not delete_thread_with_backoff(thread_id):
+        raise RuntimeError(f"Could not delete thread {thread_id} from OpenAI")
+
+    if unregister_thread(thread_id):
+        logger.debug(f"Deleted thread {thread_id} from Redis")
+
+def retry_after(error):
+    # Honour the server's Retry-After hint on 429s when it sends one
+    response = getattr(error, 'response', None)
     try:
-        client.beta.threads.delete(thread_id, timeout=10)  # 10 seconds timeout
-    except OpenAIError as e:
-        logger.error(f"OpenAI API error: {str(e)}")
-    except Exception as e:
-        logger.error(f"Unexpected error: {str(e)}")
-    except Exception as e:
-        logger.error(f"Error deleting thread {thread_id} from OpenAI: {str(e)}")
-        raise
-
-    # Remove the thread_id from Redis
-    for key in redis_connection.keys('thread:*'):
-        if redis_connection.get(key).decode('utf-8') == thread_id:
-            redis_connection.delete(key)
-            logger.debug(f"Deleted thread {thread_id} from Redis")
-            break
+        return float(response.headers.get('retry-after'))
+    except (AttributeError, TypeError, ValueError):
+        return None
 
 def delete_thread_with_backoff(thread_id, max_retries=5):
     for attempt in range(max_retries):
         try:
-            client.beta.threads.delete(thread_id, timeout=10)
+            get_openai_client().beta.threads.delete(thread_id, timeout=10)
             logger.debug(f"Successfully deleted thread {thread_id}")
-            return
+            return True
+        except NotFoundError:
+            logger.debug(f"Thread {thread_id} already deleted from OpenAI")
+            return True
         except OpenAIError as e:
-            wait_time = (2 ** attempt) + random.random()
+            wait_time = retry_after(e) or (2 ** attempt) + random.random()
             logger.warning(f"Attempt {attempt + 1} failed: {str(e)}. Retrying in {wait_time:.2f} seconds.")
             time.sleep(wait_time)
     logger.error(f"Failed to delete thread {thread_id} after {max_retries} attempts")
+    return False
 
-def delete_all_threads():
+def delete_all_threads(workers=DELETE_WORKERS):
     total_deleted = 0
-    
-    while True:
+    total_failed = 0
+    start = time.time()
+
+    with ThreadPoolExecutor(max_workers=workers) as executor, alive_bar(force_tty=True) as bar:
         try:
-            thread_ids = get_stored_thread_ids()
-            
-            if not thread_ids:
-                print(f"No more threads. Total deleted: {total_deleted}")
-                break
-            
-            with alive_bar(len(thread_ids), force_tty=True) as bar:
-                for thread_id in thread_ids:
-                    try:
-                        delete_thread(thread_id)
+            for batch in iter_stored_threads():
+                if not batch:
+                    continue
+                results = list(executor.map(delete_thread_with_backoff, [thread_id for thread_id, _ in batch]))
+
+                # Drop the Redis side of every deleted thread in one round-trip
+                pipe = redis_connection.pipeline(transaction=False)
+                for (thread_id, session_id), deleted in zip(batch, results):
+                    if deleted:
+                        pipe.delete(*thread_keys(thread_id, session_id))
+                        pipe.zrem(THREAD_ACTIVITY_KEY, thread_id)
                         total_deleted += 1
-                        print(f"Deleted thread {thread_id}. Total deleted: {total_deleted}")
-                    except Exception as e:
-                        print(f"Error deleting thread {thread_id}: {str(e)}")
-                    finally:
-                        bar()
-                    time.sleep(0.5)  # Adjust rate limiting as needed
-                    
+                    else:
+                        total_failed += 1
+                pipe.execute()
+                bar(len(batch))
+
         except Exception as e:
             print(f"Error fetching threads: {str(e)}")
+
+    elapsed = time.time() - start
+    rate = total_deleted / elapsed if elapsed else 0.0
+    print(f"Deleted {total_deleted} threads in {elapsed:.1f}s ({rate:.1f} threads/s). Failed: {total_failed}")
+    return total_deleted
+
+def sweep_idle_threads(idle_ttl=THREAD_IDLE_TTL, batch_size=SWEEP_BATCH_SIZE, max_batches=SWEEP_MAX_BATCHES):
+    """Delete threads idle for longer than ``idle_ttl`` seconds from OpenAI and Redis.
+
+    Works through at most ``max_batches`` batches per call so a backlog is
+    cleared over several scheduled runs instead of in one long task.
+    """
+    cutoff = time.time() - idle_ttl
+    total_deleted = 0
+
+    for _ in range(max_batches):
+        candidates = redis_connection.zrangebyscore(THREAD_ACTIVITY_KEY, '-inf', cutoff, start=0, num=batch_size)
+        if not candidates:
             break
+        thread_ids = [ensure_str(thread_id) for thread_id in claim_idle_threads(keys=[THREAD_ACTIVITY_KEY], args=[cutoff, *candidates])]
+        if not thread_ids:
+            continue
+
+        with ThreadPoolExecutor(max_workers=DELETE_WORKERS) as executor:
+            results = list(executor.map(delete_thread_with_backoff, thread_ids))
+        session_ids = redis_connection.mget([f"thread_session:{thread_id}" for thread_id in thread_ids])
+
+        pipe = redis_connection.pipeline(transaction=False)
+        for thread_id, session_id, deleted in zip(thread_ids, session_ids, results):
+            if not deleted:
+                pipe.zadd(THREAD_ACTIVITY_KEY, {thread_id: time.time() - idle_ttl + SWEEP_RETRY_DELAY})
+                continue
+            pipe.delete(*thread_keys(thread_id, ensure_str(session_id) if session_id else None))
+            total_deleted += 1
+        pipe.execute()
+
+    logger.info(f"Idle thread sweep deleted {total_deleted} threads")
+    return total_deleted
 
 if __name__ == "__main__":
-    delete_all_threads()
\ No newline at end of file
+    from .logging_config import configure_logging
+    configure_logging(config)
+    delete_all_threads()
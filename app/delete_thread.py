@@ -1,38 +1,33 @@
-import argparse
-from redis import Redis
-import os
-from dotenv import load_dotenv
-from initialize import client
+"""Delete one assistant thread from OpenAI and Redis.
 
-# Load environment variables
-load_dotenv()
+Run as a module from the repository root so the package imports resolve:
+    python -m app.delete_thread <thread_id>
+"""
+import argparse
+from .openai_client import get_openai_client
+from .session_manager import unregister_thread
 
-# Initialize Redis connection
-redis_url = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
-redis_connection = Redis.from_url(redis_url)
 
 def delete_thread(thread_id):
     try:
         # Delete the thread from OpenAI
-        client.beta.threads.delete(thread_id)
+        get_openai_client().beta.threads.delete(thread_id)
         print(f"Deleted thread {thread_id} from OpenAI.")
 
         # Remove the thread_id from Redis
-        deleted = False
-        for key in redis_connection.keys('thread:*'):
-            if redis_connection.get(key).decode('utf-8') == thread_id:
-                redis_connection.delete(key)
-                deleted = True
-                print(f"Deleted thread {thread_id} from Redis.")
-                break
-        
-        if not deleted:
+        if unregister_thread(thread_id):
+            print(f"Deleted thread {thread_id} from Redis.")
+        else:
             print(f"Thread {thread_id} was not found in Redis.")
 
     except Exception as e:
         print(f"Error deleting thread {thread_id}: {str(e)}")
 
 if __name__ == "__main__":
+    from .logging_config import configure_logging
+    from .settings import config
+    configure_logging(config)
+
     parser = argparse.ArgumentParser(description="Delete a specific thread by ID")
     parser.add_argument("thread_id", help="The ID of the thread to delete")
     args = parser.parse_args()
@@ -0,0 +1,207 @@
+"""Columnar on-disk store for catalog text blocks and their embeddings.
+
+A store is a small JSON manifest at ``<base>.meta.json`` that names one
+generation of data files next to it:
+
+* ``<base>.<generation>.npy``   - float32 or float16 matrix, one row per embedded block
+* ``<base>.<generation>.texts`` - UTF-8 block texts, back to back
+* ``<base>.<generation>.<column>.npy`` - one array per block column: text
+  ``offset`` and ``length``, matrix ``row`` (``-1`` when the block has no
+  embedding), ``page_num`` (``-1`` when unknown) and ``product_id``
+
+Readers map every file with ``mmap``, so every gunicorn worker and Celery
+process shares the same page cache instead of each parsing its own copy;
+the manifest itself only holds the generation and file names. Writers build
+a new generation and swap the manifest in last, so readers always see a
+consistent set of files.
+"""
+import json
+import logging
+import mmap
+import os
+import time
+import uuid
+from collections.abc import Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DTYPES = ('float32', 'float16')
+COLUMNS = ('offset', 'length', 'row', 'page_num', 'product_id')
+
+
+def meta_path(base):
+    return f"{base}.meta.json"
+
+
+def save_store(base, text_blocks, embeddings, dtype='float32', generated_at=None):
+    if dtype not in DTYPES:
+        raise ValueError(f"Unsupported embedding dtype: {dtype}")
+    directory = os.path.dirname(base) or '.'
+    os.makedirs(directory, exist_ok=True)
+    generation = uuid.uuid4().hex[:12]
+    prefix = f"{os.path.basename(base)}.{generation}"
+    matrix_file = f"{prefix}.npy"
+    texts_file = f"{prefix}.texts"
+    column_files = {column: f"{prefix}.{column}.npy" for column in COLUMNS}
+
+    rows = []
+    vectors = []
+    for embedding in embeddings:
+        if embedding is None or len(embedding) == 0:
+            rows.append(-1)
+        else:
+            rows.append(len(vectors))
+            vectors.append(embedding)
+    dimensions = len(vectors[0]) if vectors else 0
+    matrix = np.zeros((len(vectors), dimensions), dtype=dtype)
+    for row, embedding in enumerate(vectors):
+        matrix[row] = embedding
+    np.save(os.path.join(directory, matrix_file), matrix)
+
+    lengths, page_nums, product_ids = [], [], []
+    with open(os.path.join(directory, texts_file), 'wb') as f:
+        for block, _ in zip(text_blocks, rows):
+            encoded = block['text'].encode('utf-8')
+            f.write(encoded)
+            lengths.append(len(encoded))
+            page_num = block.get('page_num')
+            page_nums.append(-1 if page_num is None else page_num)
+            product_ids.append(str(block.get('product_id') or ''))
+    lengths = np.array(lengths, dtype=np.int64)
+    columns = {
+        'offset': np.concatenate(([0], np.cumsum(lengths)[:-1])).astype(np.int64) if len(lengths) else lengths,
+        'length': lengths,
+        'row': np.array(rows[:len(lengths)], dtype=np.int64),
+        'page_num': np.array(page_nums, dtype=np.int64),
+        # Fixed-width unicode so the column maps like the others
+        'product_id': np.array(product_ids, dtype=f"U{max(map(len, product_ids), default=1) or 1}"),
+    }
+    for column, values in columns.items():
+        np.save(os.path.join(directory, column_files[column]), values)
+
+    previous = read_meta(base)
+    meta = {
+        'generation': generation,
+        'matrix_file': matrix_file,
+        'texts_file': texts_file,
+        'column_files': column_files,
+        'count': len(lengths),
+        'dtype': dtype,
+        'dimensions': dimensions,
+        'generated_at': generated_at or time.time()
+    }
+    tmp_path = f"{meta_path(base)}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(meta, f)
+    os.replace(tmp_path, meta_path(base))
+
+    # Processes that still map the old generation keep it alive until they reopen
+    if previous:
+        for name in (previous['matrix_file'], previous['texts_file'], *previous.get('column_files', {}).values()):
+            try:
+                os.remove(os.path.join(directory, name))
+            except FileNotFoundError:
+                pass
+    logger.info(f"Saved {len(lengths)} blocks ({len(vectors)} embeddings, {dtype}) to {base}")
+
+
+def read_meta(base):
+    try:
+        with open(meta_path(base), 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def legacy_columns(blocks):
+    """Columns for a manifest written before the per-column files, which listed every block."""
+    product_ids = [str(block.get('product_id') or '') for block in blocks]
+    return {
+        'offset': np.array([block['offset'] for block in blocks], dtype=np.int64),
+        'length': np.array([block['length'] for block in blocks], dtype=np.int64),
+        'row': np.array([block['row'] for block in blocks], dtype=np.int64),
+        'page_num': np.array([-1 if block.get('page_num') is None else block['page_num'] for block in blocks], dtype=np.int64),
+        'product_id': np.array(product_ids, dtype=f"U{max(map(len, product_ids), default=1) or 1}"),
+    }
+
+
+class EmbeddingStore:
+    def __init__(self, base, meta):
+        self.base = base
+        self.meta = meta
+        directory = os.path.dirname(base) or '.'
+        # mmap_mode='r' maps the file read-only; pages are shared between processes
+        self.matrix = np.load(os.path.join(directory, meta['matrix_file']), mmap_mode='r')
+        if 'column_files' in meta:
+            columns = {column: np.load(os.path.join(directory, name), mmap_mode='r')
+                       for column, name in meta['column_files'].items()}
+        else:
+            columns = legacy_columns(meta['blocks'])
+        self.offsets = columns['offset']
+        self.lengths = columns['length']
+        self.rows = columns['row']
+        self.page_nums = columns['page_num']
+        self.product_ids = columns['product_id']
+        self._texts = None
+        texts_path = os.path.join(directory, meta['texts_file'])
+        if os.path.getsize(texts_path):
+            with open(texts_path, 'rb') as f:
+                self._texts = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    @classmethod
+    def open(cls, base):
+        meta = read_meta(base)
+        return cls(base, meta) if meta else None
+
+    @property
+    def generated_at(self):
+        return self.meta.get('generated_at')
+
+    def __len__(self):
+        return len(self.rows)
+
+    def text(self, index):
+        offset = int(self.offsets[index])
+        return self._texts[offset:offset + int(self.lengths[index])].decode('utf-8')
+
+    def block(self, index):
+        page_num = int(self.page_nums[index])
+        return {
+            'text': self.text(index),
+            'page_num': None if page_num < 0 else page_num,
+            'product_id': str(self.product_ids[index]) or None
+        }
+
+    def embedding(self, index):
+        row = int(self.rows[index])
+        return None if row < 0 else self.matrix[row]
+
+    @property
+    def text_blocks(self):
+        return _LazyColumn(self, self.block)
+
+    @property
+    def embeddings(self):
+        return _LazyColumn(self, self.embedding)
+
+
+class _LazyColumn(Sequence):
+    """Read-only per-block view that decodes entries on access."""
+
+    def __init__(self, store, getter):
+        self._store = store
+        self._getter = getter
+
+    def __len__(self):
+        return len(self._store)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._getter(i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        return self._getter(index)
@@ -0,0 +1,103 @@
+"""Batched calls to the OpenAI embeddings endpoint.
+
+Texts are packed into requests by estimated token count, batches run on a
+small thread pool, and rate-limited batches back off and retry on their own
+without holding up the others. Results come back in input order; a batch
+that still fails after its retries leaves ``None`` in its slots.
+"""
+import logging
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from openai import RateLimitError
+
+from .openai_client import get_openai_client
+from .settings import config
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_MODEL = config['embedding_model_name']
+# The endpoint accepts up to 2048 inputs and 300k tokens per request
+EMBEDDING_BATCH_TOKENS = int(config.get('embedding_batch_tokens', 100000))
+EMBEDDING_BATCH_SIZE = int(config.get('embedding_batch_size', 512))
+EMBEDDING_WORKERS = int(config.get('embedding_workers', 4))
+EMBEDDING_MAX_RETRIES = int(config.get('embedding_max_retries', 6))
+
+_encoding = None
+
+
+def estimate_tokens(text):
+    """Token count for ``text``, using tiktoken when it is installed."""
+    global _encoding
+    if _encoding is None:
+        try:
+            import tiktoken
+            _encoding = tiktoken.encoding_for_model(EMBEDDING_MODEL)
+        except (ImportError, KeyError):
+            _encoding = False
+    if _encoding:
+        return len(_encoding.encode(text, disallowed_special=()))
+    # Roughly four characters per token for English product copy
+    return len(text) // 4 + 1
+
+
+def batch_indices(texts, max_tokens=EMBEDDING_BATCH_TOKENS, max_size=EMBEDDING_BATCH_SIZE):
+    """Yield lists of indices into ``texts`` that fit in one request."""
+    batch, batch_tokens = [], 0
+    for index, text in enumerate(texts):
+        tokens = estimate_tokens(text)
+        if batch and (batch_tokens + tokens > max_tokens or len(batch) >= max_size):
+            yield batch
+            batch, batch_tokens = [], 0
+        batch.append(index)
+        batch_tokens += tokens
+    if batch:
+        yield batch
+
+
+def embed_batch(texts, openai_client=None, max_retries=EMBEDDING_MAX_RETRIES):
+    # Retries are handled here so a 429 backs off this batch only
+    openai_client = (openai_client or get_openai_client()).with_options(max_retries=0)
+    for attempt in range(max_retries):
+        try:
+            response = openai_client.embeddings.create(model=EMBEDDING_MODEL, input=texts)
+            return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+        except RateLimitError as e:
+            if attempt == max_retries - 1:
+                raise
+            try:
+                wait_time = float(e.response.headers.get('retry-after'))
+            except (AttributeError, TypeError, ValueError):
+                wait_time = (2 ** attempt) + random.random()
+            logger.warning(f"Embedding batch of {len(texts)} rate limited; retrying in {wait_time:.2f} seconds")
+            time.sleep(wait_time)
+
+
+def get_embeddings(texts, openai_client=None, workers=EMBEDDING_WORKERS, on_progress=None):
+    """Embed ``texts`` in token-bounded batches, ``workers`` requests at a time.
+
+    ``on_progress(done, total)`` is called from this thread as batches finish.
+    """
+    embeddings = [None] * len(texts)
+    done = 0
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(embed_batch, [texts[index] for index in batch], openai_client): batch
+            for batch in batch_indices(texts)
+        }
+        for future in as_completed(futures):
+            batch = futures[future]
+            try:
+                for index, embedding in zip(batch, future.result()):
+                    embeddings[index] = embedding
+            except Exception as e:
+                logger.error(f"Error generating embeddings for {len(batch)} blocks: {str(e)}")
+            done += len(batch)
+            if on_progress:
+                on_progress(done, len(texts))
+    return embeddings
+
+
+def get_embedding(text, openai_client=None):
+    return embed_batch([text], openai_client)[0]
@@ -1,26 +1,12 @@
-import json
-import os
 import logging
-from dotenv import load_dotenv
-from openai import OpenAI
+from .settings import config
 
-# Load environment variables
-load_dotenv()
-
-# Logging setup
-logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
-# Add this function to load the config
-def load_config():
-    with open('config.json', 'r') as f:
-        return json.load(f)
-
-config = load_config()
-
-# Initialize OpenAI client
-client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
-
 # Configure Segment analytics
-import segment.analytics as analytics
-analytics.write_key = config['segment_write_key']
\ No newline at end of file
+import segment.analytics as segment_analytics
+segment_analytics.write_key = config['segment_write_key']
+
+# Events are queued and delivered off the request path
+from .analytics_pipeline import AnalyticsPipeline
+analytics = AnalyticsPipeline.from_config(config)
@@ -0,0 +1,198 @@
+"""BM25 inverted index over catalog text blocks, with exact ID/SKU lookup.
+
+Postings are kept in CSR form (one offsets array, one block-id array and one
+weighted term-frequency array), so a query is a handful of slices and a
+``bincount`` rather than a Python loop over documents. Title, SKU, brand and
+category lines count more than the description, and URL fields are left out.
+Like the IVF index, the file records which store generation it was built
+from and is ignored once the catalog moves on.
+"""
+import logging
+import os
+import re
+import time
+from collections import Counter
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Weight applied to a term's frequency by the field it came from
+FIELD_WEIGHTS = {
+    'ID': 3.0,
+    'Sku': 3.0,
+    'Title': 3.0,
+    'Brands': 2.0,
+    'Productcategories': 2.0,
+    'ProductTags': 1.5,
+    'ProductRidingStyle': 1.5,
+    'Content': 1.0,
+}
+K1 = 1.2
+B = 0.75
+MIN_ID_DIGITS = 4
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+# SKUs and model numbers keep their separators as one extra token, e.g. "hw-1234"
+COMPOUND_RE = re.compile(r"[a-z0-9]+(?:[-_./][a-z0-9]+)+")
+
+
+def index_path(base):
+    return f"{base}.bm25.npz"
+
+
+def tokenize(text):
+    text = text.lower()
+    return TOKEN_RE.findall(text) + COMPOUND_RE.findall(text)
+
+
+def weighted_terms(text):
+    terms = Counter()
+    for line in text.split('\n'):
+        name, sep, value = line.partition(': ')
+        weight = FIELD_WEIGHTS.get(name) if sep else None
+        if weight:
+            for token in tokenize(value):
+                terms[token] += weight
+    return terms
+
+
+def exact_keys(text):
+    """The ``(id, sku)`` of a block, lower-cased, either possibly empty."""
+    product_id = sku = ''
+    for line in text.split('\n'):
+        if line.startswith('ID: '):
+            product_id = line[4:].strip().lower()
+        elif line.startswith('Sku: '):
+            sku = line[5:].strip().lower()
+    return product_id, sku
+
+
+class LexicalIndex:
+    def __init__(self, terms, offsets, postings, weights, idf, doc_lengths, exact_keys, exact_blocks, matrix_file):
+        self.terms = terms
+        self.term_ids = {term: i for i, term in enumerate(terms)}
+        self.offsets = offsets
+        self.postings = postings
+        self.weights = weights
+        self.idf = idf
+        self.doc_lengths = doc_lengths
+        self.average_length = float(doc_lengths.mean()) if len(doc_lengths) else 1.0
+        self.exact = {}
+        for key, block in zip(exact_keys, exact_blocks):
+            self.exact.setdefault(key, []).append(int(block))
+        self.matrix_file = matrix_file
+
+    @classmethod
+    def build(cls, texts, matrix_file):
+        start = time.time()
+        term_ids = {}
+        term_column, block_column, weight_column = [], [], []
+        doc_lengths = np.zeros(len(texts), dtype=np.float32)
+        keys, key_blocks = [], []
+
+        for block, text in enumerate(texts):
+            terms = weighted_terms(text)
+            doc_lengths[block] = sum(terms.values())
+            for term, weight in terms.items():
+                term_column.append(term_ids.setdefault(term, len(term_ids)))
+                block_column.append(block)
+                weight_column.append(weight)
+            for key in exact_keys(text):
+                if key:
+                    keys.append(key)
+                    key_blocks.append(block)
+
+        # A stable sort by term keeps each posting list in block order
+        term_column = np.array(term_column, dtype=np.int64)
+        order = np.argsort(term_column, kind='stable')
+        postings = np.array(block_column, dtype=np.int32)[order]
+        weights = np.array(weight_column, dtype=np.float32)[order]
+        offsets = np.zeros(len(term_ids) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum(np.bincount(term_column, minlength=len(term_ids)))
+
+        document_frequency = np.diff(offsets).astype(np.float32)
+        idf = np.log(1 + (len(texts) - document_frequency + 0.5) / (document_frequency + 0.5)).astype(np.float32)
+        terms = [None] * len(term_ids)
+        for term, term_id in term_ids.items():
+            terms[term_id] = term
+
+        logger.info(f"Built BM25 index over {len(texts)} blocks and {len(terms)} terms in {time.time() - start:.1f}s")
+        return cls(terms, offsets, postings, weights, idf, doc_lengths, keys, np.array(key_blocks, dtype=np.int64), matrix_file)
+
+    def save(self, base):
+        path = index_path(base)
+        tmp_path = f"{path}.tmp.npz"
+        exact = [(key, block) for key, blocks in self.exact.items() for block in blocks]
+        np.savez(
+            tmp_path,
+            terms=np.array(self.terms, dtype=str),
+            offsets=self.offsets,
+            postings=self.postings,
+            weights=self.weights,
+            idf=self.idf,
+            doc_lengths=self.doc_lengths,
+            exact_keys=np.array([key for key, _ in exact], dtype=str),
+            exact_blocks=np.array([block for _, block in exact], dtype=np.int64),
+            matrix_file=np.array(self.matrix_file)
+        )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, base, matrix_file=None):
+        """Load the index for ``base``; ``None`` if missing or built from another generation."""
+        try:
+            with np.load(index_path(base)) as data:
+                index = cls(
+                    data['terms'].tolist(), data['offsets'], data['postings'], data['weights'], data['idf'],
+                    data['doc_lengths'], data['exact_keys'].tolist(), data['exact_blocks'], str(data['matrix_file'])
+                )
+        except FileNotFoundError:
+            return None
+        if matrix_file is not None and index.matrix_file != matrix_file:
+            logger.warning(f"Ignoring stale BM25 index built for {index.matrix_file}")
+            return None
+        return index
+
+    def exact_matches(self, query):
+        """Blocks whose product ID or SKU appears verbatim in ``query``."""
+        matches = []
+        for token in query.lower().split():
+            token = token.strip('.,;:!?()[]"\'#')
+            # Short numbers are quantities and sizes far more often than product IDs
+            if token.isdigit() and len(token) < MIN_ID_DIGITS:
+                continue
+            for block in self.exact.get(token, ()):
+                if block not in matches:
+                    matches.append(block)
+        return matches
+
+    def search(self, query, k=10, allowed=None):
+        """Return up to ``k`` ``(block_index, score)`` pairs by BM25, best first.
+
+        ``allowed`` is an optional boolean mask over blocks that hits must pass.
+        """
+        term_ids = {self.term_ids[token] for token in tokenize(query) if token in self.term_ids}
+        if not term_ids:
+            return []
+
+        blocks, contributions = [], []
+        for term_id in term_ids:
+            start, stop = self.offsets[term_id], self.offsets[term_id + 1]
+            docs = self.postings[start:stop]
+            tf = self.weights[start:stop]
+            norm = K1 * (1 - B + B * self.doc_lengths[docs] / self.average_length)
+            blocks.append(docs)
+            contributions.append(self.idf[term_id] * tf * (K1 + 1) / (tf + norm))
+
+        blocks = np.concatenate(blocks)
+        scores = np.bincount(blocks, weights=np.concatenate(contributions), minlength=len(self.doc_lengths))
+        if allowed is not None:
+            scores[~allowed] = 0
+        hits = np.flatnonzero(scores)
+        if not len(hits):
+            return []
+        k = min(k, len(hits))
+        top = hits[np.argpartition(-scores[hits], k - 1)[:k]]
+        top = top[np.argsort(-scores[top])]
+        return [(int(block), float(scores[block])) for block in top]
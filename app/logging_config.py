@@ -0,0 +1,161 @@
+"""Process-wide logging setup with a production and a development profile.
+
+Production (the default) logs at INFO as one JSON object per line. Records
+are handed to a bounded queue and formatted and written by a listener
+thread, so a slow stdout or log shipper never stalls a request; when the
+queue is full records are dropped and counted rather than blocking.
+DEBUG records are sampled at ``debug_sample_rate``, so DEBUG can be
+switched on in production without logging every line of every request.
+Development (``LOG_FORMAT=text``) keeps plain console output and every DEBUG
+record.
+
+In both profiles, webhook ``key=`` parameters and the pre-shared key are
+redacted from every message before it leaves the process.
+
+``LOG_LEVEL``, ``LOG_FORMAT`` and ``LOG_DEBUG_SAMPLE_RATE`` in the environment
+override the ``logging`` block of config.json.
+"""
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import re
+import sys
+import time
+from logging.handlers import QueueHandler, QueueListener
+
+REDACTED = '[REDACTED]'
+REDACT_RE = re.compile(r"((?:[?&]key=)|(?:pre[-_ ]shared[-_ ]key['\"]?\s*[:=]\s*['\"]?))[^&\s'\",}]+", re.IGNORECASE)
+
+_listener = None
+
+
+class RedactFilter(logging.Filter):
+    """Render the message once and strip secrets from it."""
+
+    def __init__(self, secrets=()):
+        super().__init__()
+        self.secrets = [secret for secret in secrets if secret]
+
+    def filter(self, record):
+        message = record.getMessage()
+        message = REDACT_RE.sub(rf"\1{REDACTED}", message)
+        for secret in self.secrets:
+            message = message.replace(secret, REDACTED)
+        record.msg = message
+        record.args = None
+        return True
+
+
+class DebugSampleFilter(logging.Filter):
+    """Pass every record above DEBUG and a random ``rate`` of DEBUG records."""
+
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        return record.levelno > logging.DEBUG or self.rate >= 1 or random.random() < self.rate
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'ts': time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exc_info'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class DroppingQueueHandler(QueueHandler):
+    """Queue handler that drops records instead of blocking when the queue is full."""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def prepare(self, record):
+        # The listener is in this process, so nothing needs pickling, and
+        # RedactFilter has already rendered the message
+        return record
+
+
+def settings_from(config):
+    settings = dict(config.get('logging', {}))
+    settings['level'] = os.getenv('LOG_LEVEL', settings.get('level', 'INFO')).upper()
+    settings['format'] = os.getenv('LOG_FORMAT', settings.get('format', 'json')).lower()
+    sample_rate = settings.get('debug_sample_rate', 1.0) if settings['format'] == 'json' else 1.0
+    settings['debug_sample_rate'] = float(os.getenv('LOG_DEBUG_SAMPLE_RATE', sample_rate))
+    settings['queue_size'] = int(settings.get('queue_size', 10000))
+    return settings
+
+
+def configure_logging(config, stream=None, force=False):
+    """Install the logging profile for this process; later calls are no-ops unless ``force``."""
+    global _listener
+    root = logging.getLogger()
+    if getattr(root, '_shopping_bot_configured', False) and not force:
+        return
+    stop_logging()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+
+    settings = settings_from(config)
+    stream = stream or sys.stderr
+    filters = [
+        DebugSampleFilter(settings['debug_sample_rate']),
+        RedactFilter([config.get('pre_shared_key')]),
+    ]
+
+    if settings['format'] == 'json':
+        output = logging.StreamHandler(stream)
+        output.setFormatter(JsonFormatter())
+        handler = DroppingQueueHandler(queue.Queue(settings['queue_size']))
+        _listener = QueueListener(handler.queue, output)
+        _listener.start()
+    else:
+        handler = logging.StreamHandler(stream)
+        handler.setFormatter(logging.Formatter('%(levelname)s:%(name)s:%(message)s'))
+    # Filters run in the calling thread, so sampled-out records are never formatted
+    for log_filter in filters:
+        handler.addFilter(log_filter)
+
+    root.addHandler(handler)
+    root.setLevel(settings['level'])
+    root._shopping_bot_configured = True
+
+
+def stop_logging():
+    """Flush queued records and stop the listener thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def _restart_in_child():
+    # gunicorn --preload and Celery's prefork pool fork after logging is set
+    # up; the child needs its own listener thread to drain the queue
+    global _listener
+    if _listener is not None:
+        _listener = QueueListener(_listener.queue, *_listener.handlers)
+        _listener.start()
+
+
+atexit.register(stop_logging)
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_restart_in_child)
@@ -0,0 +1,102 @@
+"""One OpenAI client per process, on a tuned HTTP connection pool.
+
+The web app, the ASGI app, the agent and the Celery tasks all take their
+client from here, so every call in a process shares one pool of keep-alive
+connections and the same timeouts and retry budget, all set in the
+``openai_client`` block of config.json. HTTP/2 comes from the ``h2``
+package that ``httpx[http2]`` installs; without it the pool falls back to
+HTTP/1.1 keep-alive.
+
+Per-call settings derive a copy with ``with_options`` that still shares the
+pool, e.g. ``get_openai_client(timeout=10, max_retries=0)``.
+
+Clients are cached per process id. A gunicorn or Celery child that forks
+from a parent that already built a client gets its own, rather than
+sharing the parent's sockets, as long as callers ask for the client where
+they use it instead of binding it to a module-level name at import.
+"""
+import logging
+import os
+from threading import RLock
+
+import httpx
+from openai import AsyncOpenAI, OpenAI
+
+from .settings import config
+
+logger = logging.getLogger(__name__)
+
+SETTINGS = config.get('openai_client', {})
+MAX_CONNECTIONS = int(SETTINGS.get('max_connections', 100))
+MAX_KEEPALIVE_CONNECTIONS = int(SETTINGS.get('max_keepalive_connections', 20))
+KEEPALIVE_EXPIRY = float(SETTINGS.get('keepalive_expiry', 30))
+CONNECT_TIMEOUT = float(SETTINGS.get('connect_timeout', 5))
+READ_TIMEOUT = float(SETTINGS.get('read_timeout', 60))
+WRITE_TIMEOUT = float(SETTINGS.get('write_timeout', 30))
+POOL_TIMEOUT = float(SETTINGS.get('pool_timeout', 10))
+MAX_RETRIES = int(SETTINGS.get('max_retries', 2))
+
+_clients = {}
+_clients_lock = RLock()
+
+
+def http2_available():
+    if not SETTINGS.get('http2', True):
+        return False
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def timeout():
+    return httpx.Timeout(READ_TIMEOUT, connect=CONNECT_TIMEOUT, write=WRITE_TIMEOUT, pool=POOL_TIMEOUT)
+
+
+def limits():
+    return httpx.Limits(
+        max_connections=MAX_CONNECTIONS,
+        max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=KEEPALIVE_EXPIRY
+    )
+
+
+def _cached(kind, factory):
+    key = (kind, os.getpid())
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = factory()
+            _clients[key] = client
+    return client
+
+
+def _build_http_client():
+    http2 = http2_available()
+    logger.info(f"OpenAI connection pool: {MAX_CONNECTIONS} connections, {MAX_KEEPALIVE_CONNECTIONS} kept alive, http2={http2}")
+    return httpx.Client(limits=limits(), timeout=timeout(), http2=http2, follow_redirects=True)
+
+
+def _build_async_client():
+    http_client = httpx.AsyncClient(limits=limits(), timeout=timeout(), http2=http2_available(), follow_redirects=True)
+    return AsyncOpenAI(api_key=os.getenv('OPENAI_API_KEY'), timeout=timeout(), max_retries=MAX_RETRIES, http_client=http_client)
+
+
+def get_http_client():
+    """The pooled ``httpx.Client`` behind the shared client, e.g. for LangChain's ChatOpenAI."""
+    return _cached('http', _build_http_client)
+
+
+def get_openai_client(**options):
+    """Return this process's OpenAI client; ``options`` go to ``with_options``."""
+    client = _cached('sync', lambda: OpenAI(
+        api_key=os.getenv('OPENAI_API_KEY'), timeout=timeout(), max_retries=MAX_RETRIES, http_client=get_http_client()
+    ))
+    return client.with_options(**options) if options else client
+
+
+def get_async_openai_client(**options):
+    """Async counterpart of ``get_openai_client`` for the ASGI app's event loop."""
+    client = _cached('async', _build_async_client)
+    return client.with_options(**options) if options else client
@@ -0,0 +1,262 @@
+"""Two-tier cache in front of the WordPress product-info webhook.
+
+Lookups check an in-process LRU first, then the shared Redis tier, and only
+then call the webhook. An entry's freshness window is the shortest TTL of the
+fields it carries (price and stock data expire sooner than the rest). Once
+fresh time is up, the entry is still served for ``stale_ttl`` seconds while a
+single background refresh runs across all workers.
+"""
+import json
+import logging
+import time
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+
+import redis
+
+from .settings import config
+from .redis_config import redis_connection
+
+logger = logging.getLogger(__name__)
+
+CACHE_CONFIG = config.get('product_cache', {})
+MAX_ENTRIES = int(CACHE_CONFIG.get('max_entries', 2048))
+DEFAULT_TTL = float(CACHE_CONFIG.get('default_ttl', 3600))
+PRICE_TTL = float(CACHE_CONFIG.get('price_ttl', 300))
+STOCK_TTL = float(CACHE_CONFIG.get('stock_ttl', 120))
+STALE_TTL = float(CACHE_CONFIG.get('stale_ttl', 900))
+STATS_FLUSH_INTERVAL = 10
+INVALIDATE_BATCH_SIZE = 500
+
+PRICE_FIELDS = {'price', 'regular_price', 'sale_price'}
+STOCK_FIELDS = {'stock_status', 'stock_quantity', 'in_stock'}
+
+KEY_PREFIX = 'product_info:'
+STATS_KEY = 'product_info_stats'
+REFRESH_LOCK_PREFIX = 'product_info_refresh:'
+INVALIDATE_CHANNEL = 'product_info_invalidate'
+
+
+def field_names(value):
+    """Yield every key in ``value``, including those of nested variations."""
+    if isinstance(value, dict):
+        for key, item in value.items():
+            yield str(key).lower()
+            yield from field_names(item)
+    elif isinstance(value, list):
+        for item in value:
+            yield from field_names(item)
+
+
+def entry_ttl(product_info):
+    keys = set(field_names(product_info))
+    ttl = DEFAULT_TTL
+    if keys & PRICE_FIELDS:
+        ttl = min(ttl, PRICE_TTL)
+    if keys & STOCK_FIELDS:
+        ttl = min(ttl, STOCK_TTL)
+    return ttl
+
+
+class ProductInfoCache:
+    def __init__(self, max_entries=MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = Lock()
+        self._refreshing = set()
+        self._refresh_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='product-refresh')
+        self._counters = Counter()
+        self._pending_counters = Counter()
+        self._last_flush = time.time()
+        self._subscriber = None
+
+    def get(self, product_id, loader):
+        """Return product info for ``product_id``, calling ``loader()`` on a miss."""
+        self._ensure_subscribed()
+        key = str(product_id)
+        now = time.time()
+
+        entry = self._local_get(key)
+        tier = 'local'
+        if entry is None or now - entry['fetched_at'] >= entry['ttl']:
+            # Another worker may already have refreshed it
+            shared = self._redis_get(key)
+            if shared is not None and (entry is None or shared['fetched_at'] > entry['fetched_at']):
+                entry = shared
+                tier = 'redis'
+                self._local_set(key, entry)
+
+        if entry is not None:
+            age = now - entry['fetched_at']
+            if age < entry['ttl']:
+                self._count(f'{tier}_hits')
+                return entry['data']
+            if age < entry['ttl'] + STALE_TTL:
+                self._count('stale_hits')
+                self._revalidate(key, loader)
+                return entry['data']
+
+        self._count('misses')
+        return self._load(key, loader)
+
+    def invalidate(self, product_ids=None):
+        """Drop the given products (or everything) from both tiers and all workers."""
+        try:
+            if product_ids is None:
+                deleted = 0
+                batch = []
+                # UNLINK each SCAN page as it arrives rather than one huge blocking DEL
+                for key in redis_connection.scan_iter(match=f'{KEY_PREFIX}*', count=INVALIDATE_BATCH_SIZE):
+                    batch.append(key)
+                    if len(batch) >= INVALIDATE_BATCH_SIZE:
+                        deleted += redis_connection.unlink(*batch)
+                        batch = []
+                if batch:
+                    deleted += redis_connection.unlink(*batch)
+            else:
+                keys = [f'{KEY_PREFIX}{product_id}' for product_id in product_ids]
+                deleted = redis_connection.unlink(*keys) if keys else 0
+            redis_connection.publish(INVALIDATE_CHANNEL, json.dumps(
+                None if product_ids is None else [str(product_id) for product_id in product_ids]
+            ))
+        except redis.RedisError as e:
+            logger.error(f"Error invalidating product cache in Redis: {str(e)}")
+            deleted = 0
+
+        self._drop_local(product_ids)
+        self._count('invalidations', deleted)
+        return deleted
+
+    def stats(self):
+        self._flush_counters(force=True)
+        shared = {}
+        try:
+            shared = {key.decode(): int(value) for key, value in redis_connection.hgetall(STATS_KEY).items()}
+        except redis.RedisError as e:
+            logger.error(f"Error reading product cache stats: {str(e)}")
+        with self._lock:
+            worker = dict(self._counters)
+            size = len(self._entries)
+        return {'worker': worker, 'shared': shared, 'local_entries': size}
+
+    def _load(self, key, loader):
+        data = loader()
+        # Never cache webhook failures
+        if isinstance(data, dict) and 'error' not in data:
+            entry = {'data': data, 'fetched_at': time.time(), 'ttl': entry_ttl(data)}
+            self._local_set(key, entry)
+            self._redis_set(key, entry)
+        return data
+
+    def _revalidate(self, key, loader):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        try:
+            # Only one worker refreshes a given product at a time
+            acquired = redis_connection.set(f'{REFRESH_LOCK_PREFIX}{key}', 1, nx=True, ex=30)
+        except redis.RedisError as e:
+            # Without the lock every worker would refresh at once; keep serving stale
+            logger.warning(f"Product refresh lock unavailable for ID {key}: {str(e)}")
+            acquired = False
+        if not acquired:
+            with self._lock:
+                self._refreshing.discard(key)
+            return
+
+        def refresh():
+            try:
+                self._load(key, loader)
+                self._count('refreshes')
+            except Exception as e:
+                logger.error(f"Error refreshing product info for ID {key}: {str(e)}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        self._refresh_executor.submit(refresh)
+
+    def _local_get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def _local_set(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _drop_local(self, product_ids):
+        with self._lock:
+            if product_ids is None:
+                self._entries.clear()
+            else:
+                for product_id in product_ids:
+                    self._entries.pop(str(product_id), None)
+
+    def _redis_get(self, key):
+        try:
+            raw = redis_connection.get(f'{KEY_PREFIX}{key}')
+            return json.loads(raw) if raw else None
+        except (redis.RedisError, ValueError) as e:
+            logger.error(f"Error reading product info {key} from Redis: {str(e)}")
+            return None
+
+    def _redis_set(self, key, entry):
+        try:
+            redis_connection.set(f'{KEY_PREFIX}{key}', json.dumps(entry), ex=int(entry['ttl'] + STALE_TTL))
+        except redis.RedisError as e:
+            logger.error(f"Error writing product info {key} to Redis: {str(e)}")
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self._counters[name] += amount
+            self._pending_counters[name] += amount
+        self._flush_counters()
+
+    def _flush_counters(self, force=False):
+        with self._lock:
+            if not force and time.time() - self._last_flush < STATS_FLUSH_INTERVAL:
+                return
+            pending, self._pending_counters = self._pending_counters, Counter()
+            self._last_flush = time.time()
+        if not pending:
+            return
+        try:
+            pipe = redis_connection.pipeline(transaction=False)
+            for name, amount in pending.items():
+                pipe.hincrby(STATS_KEY, name, amount)
+            pipe.execute()
+        except redis.RedisError as e:
+            logger.error(f"Error flushing product cache stats: {str(e)}")
+
+    def _ensure_subscribed(self):
+        # Invalidations made by other workers arrive over pub/sub
+        if self._subscriber is not None:
+            return
+        with self._lock:
+            if self._subscriber is not None:
+                return
+            try:
+                pubsub = redis_connection.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(**{INVALIDATE_CHANNEL: self._on_invalidate})
+                self._subscriber = pubsub.run_in_thread(sleep_time=1, daemon=True)
+            except redis.RedisError as e:
+                logger.warning(f"Product cache invalidation listener unavailable: {str(e)}")
+                self._subscriber = False
+
+    def _on_invalidate(self, message):
+        try:
+            self._drop_local(json.loads(message['data']))
+        except ValueError:
+            self._drop_local(None)
+
+
+product_cache = ProductInfoCache()
@@ -0,0 +1,75 @@
+"""Single-pass parser for the ``Field: value`` product lines in model output.
+
+One precompiled pattern covering every known field is scanned over the
+text once; it only matches a label at the start of a line, so prose that
+mentions "ID:" or "Price:" mid-sentence is not read as a field.
+
+A product record is a run of distinct fields, wherever ``ID`` falls in it
+and however many blank lines or prose lines sit between them. The next
+product starts when a field that is already set in the current record
+appears again, or at a product heading: a markdown heading or numbered list
+item that is not itself a field, e.g. "### 2. Fly Mask".
+"""
+import re
+
+# Label in the response -> key in the parsed record
+FIELDS = {
+    'ID': 'id',
+    'Title': 'title',
+    'Sku': 'sku',
+    'ProductType': 'product_type',
+    'Permalink': 'permalink',
+    'ProductRidingStyle': 'riding_style',
+    'Productcategories': 'categories',
+    'ProductTags': 'tags',
+    'Content': 'content',
+    'ImageURL': 'image_url',
+    'Brands': 'brands',
+    'WcRatingCount': 'WcRatingCount',
+    'WcReviewCount': 'WcReviewCount',
+    'WcReviewAverage': 'WcReviewAverage',
+    'StockStatus': 'StockStatus',
+    'Price': 'Price',
+    'SalePrice': 'SalePrice',
+}
+NUMERIC_FIELDS = {'id', 'WcRatingCount'}
+
+# Longest labels first so "SalePrice" is never read as "Price"
+_labels = '|'.join(sorted(FIELDS, key=len, reverse=True))
+# Labels start a line, after optional indentation, bullets, headings or list
+# numbers, and may be wrapped in markdown bold, e.g. "- **Title:** Fly Mask".
+# Any other heading or numbered item line is a product heading.
+LINE_RE = re.compile(
+    rf"^(?:[ \t>*\-\u2022\d.)#]*(?P<label>{_labels})\**:(?P<value>[^\n]*)"
+    rf"|[ \t]*(?:#{{1,6}}|\d+[.)])[ \t]+(?P<heading>[^\n]*))",
+    re.MULTILINE
+)
+NUMBER_RE = re.compile(r"\d+")
+
+
+def extract_products(text):
+    products = []
+    current = {}
+    for match in LINE_RE.finditer(text):
+        label, value, heading = match.groups()
+        if heading is not None:
+            if current:
+                products.append(current)
+                current = {}
+            continue
+        key = FIELDS[label]
+        value = value.strip(' \t\r*')
+        if key in NUMERIC_FIELDS and not value.isdigit():
+            number = NUMBER_RE.match(value)
+            if number is None:
+                continue
+            value = number.group()
+        if not value:
+            continue
+        if key in current:
+            products.append(current)
+            current = {}
+        current[key] = value
+    if current:
+        products.append(current)
+    return products
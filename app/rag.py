@@ -1,30 +1,41 @@
 import logging
-from .process_document import extract_products, setup_conversational_agent, get_product_info
-import json
+from .process_document import extract_products, setup_conversational_agent, get_product_info, load_embeddings, load_search_index, load_lexical_index, ann_settings, hybrid_settings
+from .retrieval import ProductRetriever
 from langchain_core.messages import HumanMessage
 import time
-from openai import OpenAI
-from dotenv import load_dotenv
-import os
+from .settings import config
+from .openai_client import get_openai_client
 
-# Load config
-with open('config.json', 'r') as f:
-    config = json.load(f)
-
-# Load environment variables
-load_dotenv()
 
 PRE_SHARED_KEY = config['pre_shared_key']
-WEBHOOK_URL = config['webhook_url']
-
-# Initialize OpenAI client
-client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+WEBHOOK_URL = config.get('webhook_url', config.get('product_info_webhook_url'))
 
 # Initialize these as None
 agent = None
 safe_retrieval_chain = None
 is_initialized = False
 
+def initialize_rag():
+    """(Re)build the agent and retrieval chain from the saved catalog blocks."""
+    global agent, safe_retrieval_chain, is_initialized
+    data = load_embeddings()
+    text_blocks = data.get('text_blocks', [])
+    # Catalogs still in the legacy JSON format have no store to search
+    retriever = None
+    if data.get('store') is not None:
+        store = data['store']
+        retriever = ProductRetriever(
+            store,
+            index=load_search_index(store),
+            nprobe=int(ann_settings.get('nprobe', 8)),
+            lexical=load_lexical_index(store),
+            lexical_weight=float(hybrid_settings.get('lexical_weight', 0.5)),
+            rrf_k=int(hybrid_settings.get('rrf_k', 60))
+        )
+    agent, safe_retrieval_chain = setup_conversational_agent(text_blocks, retriever)
+    is_initialized = bool(text_blocks)
+    logging.info(f"RAG initialized with {len(text_blocks)} text blocks")
+
 def format_product_response(product):
     return {
         "title": product.get("title", ""),
@@ -97,6 +108,7 @@ def handle_query(question, session_memory, session_id, session_products):
         }
     
 def chat_with_bot(question, session_id):
+    client = get_openai_client()
     thread = client.beta.threads.create()
     client.beta.threads.messages.create(
         thread_id=thread.id,
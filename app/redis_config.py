@@ -1,34 +1,93 @@
+import logging
 import redis
+import redis.asyncio as aioredis
+from threading import Lock
 from urllib.parse import urlparse
 import os
-from dotenv import load_dotenv
-
-# Load environment variables
-load_dotenv()
-
-redis_url = urlparse(os.environ.get("REDIS_URL"))
-
-# Determine if we're running locally
-is_local = redis_url.hostname in ['localhost', '127.0.0.1']
-
-redis_connection = redis.Redis(
-    host=redis_url.hostname,
-    port=redis_url.port,
-    username=redis_url.username,
-    password=redis_url.password,
-    ssl=not is_local,  # Use SSL only when not running locally
-    ssl_cert_reqs=None if is_local else 'required'
-)
-
-# Print connection details for debugging
-print(f"Redis connection details:")
-print(f"Host: {redis_url.hostname}")
-print(f"Port: {redis_url.port}")
-print(f"Using SSL: {not is_local}")
-
-# Test the connection
-try:
-    redis_connection.ping()
-    print("Successfully connected to Redis")
-except redis.ConnectionError as e:
-    print(f"Failed to connect to Redis: {str(e)}")
\ No newline at end of file
+from . import settings  # noqa: F401  loads .env before the reads below
+
+logger = logging.getLogger(__name__)
+
+REDIS_URL = os.environ.get("REDIS_URL", "redis://localhost:6379/0")
+
+# Pool settings shared by the web app, Celery and the admin scripts
+REDIS_MAX_CONNECTIONS = int(os.environ.get("REDIS_MAX_CONNECTIONS", 50))
+REDIS_HEALTH_CHECK_INTERVAL = int(os.environ.get("REDIS_HEALTH_CHECK_INTERVAL", 30))
+REDIS_SOCKET_TIMEOUT = float(os.environ.get("REDIS_SOCKET_TIMEOUT", 10))
+REDIS_CONNECT_TIMEOUT = float(os.environ.get("REDIS_CONNECT_TIMEOUT", 30))
+
+_pools = {}
+_pools_lock = Lock()
+
+def is_local_url(url):
+    return urlparse(url).hostname in ['localhost', '127.0.0.1']
+
+def connection_kwargs(url=REDIS_URL):
+    """Connection pool arguments for ``url``, shared by the sync and async clients."""
+    parsed = urlparse(url)
+    is_local = is_local_url(url)
+    kwargs = {
+        'host': parsed.hostname,
+        'port': parsed.port or 6379,
+        'db': int(parsed.path.lstrip('/') or 0),
+        'username': parsed.username,
+        'password': parsed.password,
+        'max_connections': REDIS_MAX_CONNECTIONS,
+        'health_check_interval': REDIS_HEALTH_CHECK_INTERVAL,
+        'socket_keepalive': True,
+        'socket_timeout': REDIS_SOCKET_TIMEOUT,
+        'socket_connect_timeout': REDIS_CONNECT_TIMEOUT,
+        'retry_on_timeout': True,
+    }
+    # Use SSL only when not running locally
+    if not is_local:
+        kwargs['ssl_cert_reqs'] = 'required'
+    return kwargs
+
+def get_connection_pool(url=None):
+    """Return the process-wide connection pool for ``url``.
+
+    redis-py resets pools after a fork, so gunicorn and Celery workers each
+    get their own connections without any extra handling.
+    """
+    url = url or REDIS_URL
+    with _pools_lock:
+        pool = _pools.get(url)
+        if pool is None:
+            connection_class = redis.Connection if is_local_url(url) else redis.SSLConnection
+            pool = redis.BlockingConnectionPool(connection_class=connection_class, timeout=REDIS_CONNECT_TIMEOUT, **connection_kwargs(url))
+            _pools[url] = pool
+    return pool
+
+def get_redis(url=None):
+    """Return a Redis client backed by the shared pool for ``url``."""
+    return redis.Redis(connection_pool=get_connection_pool(url))
+
+def get_async_redis(url=None):
+    """Return an asyncio Redis client with the same pool settings.
+
+    Async pools are bound to an event loop, so each call builds a new one.
+    """
+    url = url or REDIS_URL
+    connection_class = aioredis.Connection if is_local_url(url) else aioredis.SSLConnection
+    pool = aioredis.BlockingConnectionPool(connection_class=connection_class, timeout=REDIS_CONNECT_TIMEOUT, **connection_kwargs(url))
+    return aioredis.Redis(connection_pool=pool)
+
+def check_connection(client=None, url=None):
+    """Ping Redis and log the outcome; returns whether it answered.
+
+    Nothing connects at import time, so processes call this once they are up
+    rather than stalling startup on an unreachable server.
+    """
+    url = url or REDIS_URL
+    client = client or get_redis(url)
+    parsed = urlparse(url)
+    try:
+        client.ping()
+    except redis.RedisError as e:
+        logger.error(f"Failed to connect to Redis at {parsed.hostname}:{parsed.port or 6379} (ssl={not is_local_url(url)}): {str(e)}")
+        return False
+    logger.info(f"Connected to Redis at {parsed.hostname}:{parsed.port or 6379} (ssl={not is_local_url(url)}, max connections {REDIS_MAX_CONNECTIONS})")
+    return True
+
+redis_connection = get_redis()
@@ -0,0 +1,182 @@
+"""Redis-backed Flask sessions that load lazily and write only on change.
+
+A drop-in replacement for Flask-Session's Redis interface. It uses the same
+``session:`` keys, pickle payloads and signed cookie, so asgi.py keeps
+reading and writing the same sessions. What changes is the cost of a request:
+
+* nothing is read from Redis until a view actually touches the session
+* the session is written back only when its serialized contents differ from
+  what was loaded, so reads and no-op assignments cost one round trip (GET
+  and TTL, pipelined) and no SETEX
+* static files, the health check and CORS preflights get a detached session
+  that never talks to Redis at all
+
+A session that is only read still lives ``PERMANENT_SESSION_LIFETIME`` past
+its last request: once less than half the lifetime remains, the next request
+that reads it extends the key with a single EXPIRE (and re-sends the cookie
+of a permanent session) instead of rewriting the payload.
+"""
+import logging
+import pickle
+import uuid
+from collections.abc import MutableMapping
+
+from flask.sessions import SessionInterface, SessionMixin
+from itsdangerous import BadSignature, Signer, want_bytes
+
+logger = logging.getLogger(__name__)
+
+
+class LazyRedisSession(SessionMixin, MutableMapping):
+    """Session whose data is fetched from Redis on first access.
+
+    ``sid`` is None for detached sessions (skipped routes); those start empty
+    and are never saved.
+    """
+
+    def __init__(self, interface, sid, new):
+        self.interface = interface
+        self.sid = sid
+        self.new = new
+        self.modified = False
+        self.accessed = False
+        self.raw = None
+        self.ttl = None
+        self._data = None
+
+    @property
+    def loaded(self):
+        return self._data is not None
+
+    def _load(self):
+        if self._data is None:
+            self.accessed = True
+            if self.new or self.sid is None:
+                self._data = {}
+            else:
+                self.raw, self._data, self.ttl = self.interface.fetch(self.sid)
+        return self._data
+
+    def __getitem__(self, key):
+        return self._load()[key]
+
+    def __setitem__(self, key, value):
+        self._load()[key] = value
+        self.modified = True
+
+    def __delitem__(self, key):
+        del self._load()[key]
+        self.modified = True
+
+    def __contains__(self, key):
+        return key in self._load()
+
+    def __iter__(self):
+        return iter(self._load())
+
+    def __len__(self):
+        return len(self._load())
+
+    def get(self, key, default=None):
+        return self._load().get(key, default)
+
+    def __repr__(self):
+        state = repr(self._data) if self.loaded else 'not loaded'
+        return f"<{type(self).__name__} {self.sid} {state}>"
+
+
+class LazyRedisSessionInterface(SessionInterface):
+    serializer = pickle
+    session_class = LazyRedisSession
+
+    def __init__(self, redis, key_prefix='session:', use_signer=True, permanent=False, skip_paths=()):
+        self.redis = redis
+        self.key_prefix = key_prefix
+        self.use_signer = use_signer
+        self.permanent = permanent
+        self.skip_paths = tuple(skip_paths)
+
+    def _signer(self, app):
+        # Same signer Flask-Session uses for SESSION_USE_SIGNER
+        return Signer(app.secret_key, salt='flask-session', key_derivation='hmac')
+
+    def skip(self, request):
+        return request.method == 'OPTIONS' or request.path.startswith(self.skip_paths)
+
+    def fetch(self, sid):
+        """Return ``(raw, data, ttl)`` for ``sid``; ``raw`` is None if nothing is stored."""
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.get(self.key_prefix + sid)
+        pipe.ttl(self.key_prefix + sid)
+        raw, ttl = pipe.execute()
+        if raw is None:
+            return None, {}, None
+        try:
+            return raw, dict(self.serializer.loads(raw)), ttl
+        except Exception as e:
+            logger.error(f"Error decoding session {sid}: {str(e)}")
+            return None, {}, None
+
+    @staticmethod
+    def needs_refresh(session, lifetime):
+        # -1 is a key without an expiry; -2 and None mean nothing is stored
+        return session.ttl is not None and session.ttl != -2 and session.ttl < lifetime // 2
+
+    def open_session(self, app, request):
+        if self.skip(request):
+            return self.session_class(self, None, new=True)
+
+        sid = request.cookies.get(app.config['SESSION_COOKIE_NAME'])
+        if sid and self.use_signer:
+            try:
+                sid = self._signer(app).unsign(sid).decode()
+            except BadSignature:
+                sid = None
+        if not sid:
+            session = self.session_class(self, str(uuid.uuid4()), new=True)
+            if self.permanent:
+                session.permanent = True
+                session.modified = False
+            return session
+        return self.session_class(self, sid, new=False)
+
+    def save_session(self, app, session, response):
+        if session.sid is None or not session.loaded:
+            return
+        response.vary.add('Cookie')
+
+        name = app.config['SESSION_COOKIE_NAME']
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        key = self.key_prefix + session.sid
+
+        data = dict(session)
+        if not data:
+            if session.raw is not None:
+                self.redis.delete(key)
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+
+        payload = self.serializer.dumps(data)
+        lifetime = int(app.permanent_session_lifetime.total_seconds())
+        # Compare bytes rather than trusting ``modified``, which misses in-place
+        # edits of nested values and flags assignments of an unchanged value
+        if payload != session.raw:
+            self.redis.setex(key, lifetime, payload)
+        elif self.needs_refresh(session, lifetime):
+            self.redis.expire(key, lifetime)
+        else:
+            return
+
+        if session.new or session.permanent:
+            cookie_value = self._signer(app).sign(want_bytes(session.sid)).decode() if self.use_signer else session.sid
+            response.set_cookie(
+                name,
+                cookie_value,
+                expires=self.get_expiration_time(app, session),
+                httponly=self.get_cookie_httponly(app),
+                domain=domain,
+                path=path,
+                secure=self.get_cookie_secure(app),
+                samesite=self.get_cookie_samesite(app)
+            )
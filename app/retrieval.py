@@ -0,0 +1,193 @@
+"""In-process nearest-neighbour search over the catalog embedding store.
+
+Scores are cosine similarities computed with one matrix-vector product per
+chunk of the memory-mapped matrix, and the top ``k`` are picked with
+``argpartition`` rather than a full sort. With an ``IVFIndex`` only the rows
+in the probed lists are scored (see ``ann_index``). Optional filters on riding style,
+category, brand and stock status narrow the candidate rows before scoring;
+their values are read once from the block texts when the index is built.
+"""
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Rows scored per matrix product; bounds the float32 copy made for float16 stores
+CHUNK_ROWS = 65536
+# Above this share of candidate rows, filtered queries score every row and mask
+DENSE_FILTER_RATIO = 0.1
+# Hybrid search ranks this many times k from each side before fusing
+CANDIDATE_MULTIPLIER = 4
+
+FILTER_FIELDS = {
+    'riding_style': 'ProductRidingStyle',
+    'brand': 'Brands',
+    'stock_status': 'StockStatus',
+}
+CATEGORY_FIELD = 'Productcategories'
+
+
+def block_fields(text, fields):
+    """Return ``{field: value}`` for the ``Field: value`` lines of a block."""
+    values = {}
+    for line in text.split('\n'):
+        name, sep, value = line.partition(': ')
+        if sep and name in fields:
+            values[name] = value.strip()
+    return values
+
+
+class ProductRetriever:
+    def __init__(self, store, index=None, nprobe=8, lexical=None, lexical_weight=0.5, rrf_k=60):
+        self.store = store
+        # Optional IVFIndex; when set, queries only score the rows it probes
+        self.index = index
+        self.nprobe = nprobe
+        # Optional LexicalIndex fused with vector results by weighted reciprocal rank
+        self.lexical = lexical
+        self.lexical_weight = lexical_weight
+        self.rrf_k = rrf_k
+        self.matrix = store.matrix
+        rows = store.rows
+        # Blocks without an embedding are never candidates
+        self.block_indices = np.flatnonzero(rows >= 0)
+        self.block_rows = rows[self.block_indices]
+        # True whenever every block is embedded, so full scans can slice instead of gather
+        self.rows_contiguous = np.array_equal(self.block_rows, np.arange(len(self.matrix)))
+
+        norms = np.empty(len(self.matrix), dtype=np.float32)
+        for start in range(0, len(self.matrix), CHUNK_ROWS):
+            chunk = np.asarray(self.matrix[start:start + CHUNK_ROWS], dtype=np.float32)
+            norms[start:start + len(chunk)] = np.linalg.norm(chunk, axis=1)
+        norms[norms == 0] = 1.0
+        self.inverse_norms = 1.0 / norms
+
+        self._build_filters()
+        logger.info(f"Product retriever ready over {len(self.block_indices)} embedded blocks")
+
+    def _build_filters(self):
+        wanted = set(FILTER_FIELDS.values()) | {CATEGORY_FIELD}
+        self.codes = {name: np.full(len(self.block_indices), -1, dtype=np.int32) for name in FILTER_FIELDS}
+        self.vocabularies = {name: {} for name in FILTER_FIELDS}
+        categories = {}
+
+        for position, index in enumerate(self.block_indices):
+            values = block_fields(self.store.text(index), wanted)
+            for name, field in FILTER_FIELDS.items():
+                value = values.get(field)
+                if value:
+                    vocabulary = self.vocabularies[name]
+                    self.codes[name][position] = vocabulary.setdefault(value.lower(), len(vocabulary))
+            # A category filter matches any node of the '>' path
+            for node in values.get(CATEGORY_FIELD, '').split('>'):
+                node = node.strip().lower()
+                if node:
+                    categories.setdefault(node, []).append(position)
+
+        self.categories = {node: np.array(positions, dtype=np.int64) for node, positions in categories.items()}
+
+    def candidates(self, riding_style=None, category=None, brand=None, stock_status=None, in_stock=None):
+        """Positions (into ``block_indices``) that pass every given filter, or ``None`` for all."""
+        if in_stock is not None and stock_status is None:
+            stock_status = 'instock' if in_stock else 'outofstock'
+        filters = {'riding_style': riding_style, 'brand': brand, 'stock_status': stock_status}
+
+        mask = None
+        for name, value in filters.items():
+            if value is None:
+                continue
+            code = self.vocabularies[name].get(str(value).lower(), -2)
+            matches = self.codes[name] == code
+            mask = matches if mask is None else mask & matches
+        if category is not None:
+            matches = np.zeros(len(self.block_indices), dtype=bool)
+            matches[self.categories.get(str(category).strip().lower(), [])] = True
+            mask = matches if mask is None else mask & matches
+        return None if mask is None else np.flatnonzero(mask)
+
+    def search(self, query_embedding, k=5, **filters):
+        """Return up to ``k`` ``(block_index, score)`` pairs, best first."""
+        query = np.asarray(query_embedding, dtype=np.float32)
+        query = query / (np.linalg.norm(query) or 1.0)
+
+        positions = self.candidates(**filters)
+        if positions is not None and not len(positions):
+            return []
+
+        if self.index is not None:
+            # block_rows is increasing, so rows map back to positions by binary search
+            probed = np.sort(np.searchsorted(self.block_rows, self.index.probe(query, self.nprobe)))
+            if positions is not None:
+                probed = np.intersect1d(probed, positions, assume_unique=True)
+            # A selective filter can leave the probed lists short; search exactly then
+            if len(probed) >= k:
+                return self._top(self._scores(self.block_rows[probed], query), probed, k)
+
+        if positions is None or len(positions) > len(self.block_rows) * DENSE_FILTER_RATIO:
+            # Scanning the matrix in order beats gathering a large share of its rows
+            scores = self._scores(self.block_rows, query)
+            if positions is not None:
+                scores = scores[positions]
+        else:
+            scores = self._scores(self.block_rows[positions], query)
+        return self._top(scores, positions, k)
+
+    def _top(self, scores, positions, k):
+        if not len(scores):
+            return []
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        selected = top if positions is None else positions[top]
+        return [(int(self.block_indices[position]), float(scores[i])) for position, i in zip(selected, top)]
+
+    def _scores(self, rows, query):
+        scores = np.empty(len(rows), dtype=np.float32)
+        contiguous = rows is self.block_rows and self.rows_contiguous
+        for start in range(0, len(rows), CHUNK_ROWS):
+            chunk_rows = rows[start:start + CHUNK_ROWS]
+            chunk = self.matrix[start:start + len(chunk_rows)] if contiguous else self.matrix[chunk_rows]
+            scores[start:start + len(chunk_rows)] = np.asarray(chunk, dtype=np.float32) @ query
+        return scores * self.inverse_norms[rows]
+
+    def allowed_blocks(self, **filters):
+        """Boolean mask over all blocks for the given filters, or ``None`` for all."""
+        positions = self.candidates(**filters)
+        if positions is None:
+            return None
+        allowed = np.zeros(len(self.store), dtype=bool)
+        allowed[self.block_indices[positions]] = True
+        return allowed
+
+    def hybrid_search(self, question, query_embedding, k=5, **filters):
+        """Fuse vector and BM25 rankings; returns ``(block_index, score)`` pairs."""
+        depth = k * CANDIDATE_MULTIPLIER
+        vector_hits = self.search(query_embedding, k=depth, **filters)
+        if self.lexical is None:
+            return vector_hits[:k]
+        lexical_hits = self.lexical.search(question, k=depth, allowed=self.allowed_blocks(**filters))
+
+        fused = {}
+        for weight, hits in ((1 - self.lexical_weight, vector_hits), (self.lexical_weight, lexical_hits)):
+            for rank, (index, _) in enumerate(hits):
+                fused[index] = fused.get(index, 0.0) + weight / (self.rrf_k + rank + 1)
+        return sorted(fused.items(), key=lambda item: -item[1])[:k]
+
+    def search_text(self, question, k=5, **filters):
+        """Return the top ``k`` blocks for ``question`` with a ``score`` key."""
+        if self.lexical is not None:
+            # A product ID or SKU in the question answers it without an embeddings call
+            allowed = self.allowed_blocks(**filters)
+            exact = [index for index in self.lexical.exact_matches(question) if allowed is None or allowed[index]]
+            if exact:
+                hits = [(index, 1.0) for index in exact[:k]]
+                if len(hits) < k:
+                    fill = self.lexical.search(question, k=k, allowed=allowed)
+                    hits += [hit for hit in fill if hit[0] not in exact][:k - len(hits)]
+                return [{**self.store.block(index), 'score': score} for index, score in hits]
+
+        from .embeddings import get_embedding
+
+        hits = self.hybrid_search(question, get_embedding(question), k=k, **filters)
+        return [{**self.store.block(index), 'score': score} for index, score in hits]
@@ -1,21 +1,26 @@
 import json
+import time
+import logging
 from threading import Lock
+import redis
 from .redis_config import redis_connection
-from langchain_core.messages import HumanMessage, AIMessage
-from openai import OpenAI
-from dotenv import load_dotenv
-import os
+from .settings import config
+from .openai_client import get_openai_client
 
-# Load config
-with open('config.json', 'r') as f:
-    config = json.load(f)
 
-# Load environment variables
-load_dotenv()
+logger = logging.getLogger(__name__)
 
-client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+# Seconds a fetched user profile is reused within one chat session
+USER_INFO_TTL = int(config.get('user_info_cache_ttl', 300))
+
+# Threads idle longer than this are deleted from OpenAI and Redis by the sweeper
+THREAD_IDLE_TTL = int(config.get('thread_idle_ttl', 86400))
+# Sorted set of thread id -> last activity timestamp
+THREAD_ACTIVITY_KEY = 'threads:last_active'
 
 def get_session_memory(session_id):
+    from langchain_core.messages import HumanMessage, AIMessage
+
     memory = redis_connection.get(f"memory:{session_id}")
     if memory:
         memory_list = json.loads(memory)
@@ -26,29 +31,108 @@ def get_session_memory(session_id):
     return []
 
 def update_session_memory(session_id, memory):
+    from langchain_core.messages import HumanMessage
+
     serializable_memory = [
         {'type': 'human' if isinstance(msg, HumanMessage) else 'ai', 'content': msg.content}
         for msg in memory
     ]
-    redis_connection.set(f"memory:{session_id}", json.dumps(serializable_memory))
+    redis_connection.set(f"memory:{session_id}", json.dumps(serializable_memory), ex=THREAD_IDLE_TTL)
 
 def get_session_products(session_id):
     products = redis_connection.get(f"products:{session_id}")
     return json.loads(products) if products else []
 
 def update_session_products(session_id, products):
-    redis_connection.set(f"products:{session_id}", json.dumps(products))
+    redis_connection.set(f"products:{session_id}", json.dumps(products), ex=THREAD_IDLE_TTL)
+
+def get_cached_user_info(session_id, wp_username):
+    try:
+        cached = redis_connection.get(f"user_info:{session_id}")
+    except redis.RedisError as e:
+        logger.error(f"Error reading cached user info for session {session_id}: {str(e)}")
+        return None
+    if cached:
+        entry = json.loads(cached)
+        # A different login in the same session must not see the old profile
+        if entry.get('wp_username') == wp_username:
+            return entry['user_info']
+    return None
+
+def cache_user_info(session_id, wp_username, user_info):
+    try:
+        redis_connection.set(
+            f"user_info:{session_id}",
+            json.dumps({'wp_username': wp_username, 'user_info': user_info}),
+            ex=USER_INFO_TTL
+        )
+    except redis.RedisError as e:
+        logger.error(f"Error caching user info for session {session_id}: {str(e)}")
+
+def invalidate_user_info(session_id):
+    try:
+        redis_connection.delete(f"user_info:{session_id}")
+    except redis.RedisError as e:
+        logger.error(f"Error invalidating user info for session {session_id}: {str(e)}")
+
+def register_thread(session_id, thread_id):
+    # thread_session:<thread_id> is the reverse index used to clean up by thread id
+    pipe = redis_connection.pipeline(transaction=False)
+    pipe.set(f"thread:{session_id}", thread_id)
+    pipe.set(f"thread_session:{thread_id}", session_id)
+    pipe.zadd(THREAD_ACTIVITY_KEY, {thread_id: time.time()})
+    pipe.execute()
+
+def touch_thread(thread_id, session_id=None):
+    """Record activity on a thread so the idle sweeper leaves it alone."""
+    try:
+        pipe = redis_connection.pipeline(transaction=False)
+        pipe.zadd(THREAD_ACTIVITY_KEY, {thread_id: time.time()})
+        if session_id:
+            pipe.set(f"thread_session:{thread_id}", session_id)
+        pipe.execute()
+    except redis.RedisError as e:
+        logger.error(f"Error recording activity for thread {thread_id}: {str(e)}")
+
+def unregister_thread(thread_id):
+    """Remove a thread's Redis keys. Returns False if the thread was not stored."""
+    redis_connection.zrem(THREAD_ACTIVITY_KEY, thread_id)
+    session_id = redis_connection.get(f"thread_session:{thread_id}")
+    if session_id:
+        redis_connection.delete(f"thread:{ensure_str(session_id)}", f"thread_session:{thread_id}")
+        return True
+
+    # Threads stored before the reverse index existed
+    for keys in scan_batches('thread:*'):
+        for key, value in zip(keys, redis_connection.mget(keys)):
+            if ensure_str(value) == thread_id:
+                redis_connection.delete(key)
+                return True
+    return False
+
+def scan_batches(pattern, batch_size=500):
+    """Yield lists of keys matching ``pattern`` without blocking Redis like KEYS does."""
+    batch = []
+    for key in redis_connection.scan_iter(match=pattern, count=batch_size):
+        batch.append(key)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
 
 def get_or_create_thread(session_id):
     thread_id = redis_connection.get(f"thread:{session_id}")
     if not thread_id:
-        thread = client.beta.threads.create()
-        redis_connection.set(f"thread:{session_id}", thread.id)
+        thread = get_openai_client().beta.threads.create()
+        register_thread(session_id, thread.id)
         return thread.id
-    return ensure_str(thread_id)
+    thread_id = ensure_str(thread_id)
+    touch_thread(thread_id)
+    return thread_id
 
 def add_message_to_thread(thread_id, role, content):
-    client.beta.threads.messages.create(
+    get_openai_client().beta.threads.messages.create(
         thread_id=thread_id,
         role=role,
         content=content
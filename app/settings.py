@@ -0,0 +1,25 @@
+"""config.json and .env, read once per process.
+
+Modules import ``config`` from here rather than opening the file themselves,
+so importing one doesn't drag in the OpenAI client or the web app. Loading
+the config also loads ``.env``, so environment reads anywhere in the package
+see it without each module calling ``load_dotenv`` itself.
+"""
+import json
+import os
+from functools import lru_cache
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+CONFIG_PATH = os.getenv('CONFIG_PATH', 'config.json')
+
+
+@lru_cache(maxsize=None)
+def load_config(path=CONFIG_PATH):
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+config = load_config()
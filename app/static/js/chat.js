@@ -203,6 +203,8 @@ document.addEventListener('DOMContentLoaded', function() {
                 const reader = response.body.getReader();
                 const decoder = new TextDecoder();
                 let buffer = '';
+                let eventName = '';
+                let streamedText = '';
     
                 while (true) {
                     const { done, value } = await reader.read();
@@ -213,12 +215,32 @@ document.addEventListener('DOMContentLoaded', function() {
                     buffer = lines.pop();
     
                     for (const line of lines) {
+                        if (line === '') {
+                            eventName = '';
+                            continue;
+                        }
+                        if (line.startsWith('event: ')) {
+                            eventName = line.slice(7).trim();
+                            continue;
+                        }
                         if (line.startsWith('data: ')) {
                             const data = line.slice(5).trim();
                             if (data === '[DONE]') {
                                 console.log('Stream completed');
                                 continue;
                             }
+
+                            if (eventName === 'delta') {
+                                // Show the answer as it is generated
+                                try {
+                                    streamedText += JSON.parse(data).delta;
+                                    placeholderMessage.querySelector('.placeholder-message').innerHTML = `<p>${formatMarkdown(encodeHTML(streamedText))}</p>`;
+                                    scrollToBottom();
+                                } catch (error) {
+                                    console.error('Failed to parse delta: ', error);
+                                }
+                                continue;
+                            }
     
                             try {
                                 const jsonData = JSON.parse(data);
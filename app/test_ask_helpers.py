@@ -0,0 +1,109 @@
+import os
+from collections import Counter
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from flask import Flask, session
+from openai import BadRequestError, InternalServerError, NotFoundError
+
+os.environ.setdefault('OPENAI_API_KEY', 'sk-test')
+
+from app import ask_helpers
+
+
+def api_error(error_class, status, message, path='/v1/threads/thread_old/runs'):
+    request = httpx.Request('POST', f'https://api.openai.com{path}')
+    return error_class(message, response=httpx.Response(status, request=request), body=None)
+
+
+class StubClient:
+    """Records every Assistants call; ``failures`` are raised by the next ``runs.create`` calls, in order."""
+
+    def __init__(self, failures=()):
+        self.calls = Counter()
+        self.failures = list(failures)
+        self.run_kwargs = []
+        self.beta = SimpleNamespace(threads=SimpleNamespace(
+            create_and_run=self._record('threads.create_and_run', self._create_and_run),
+            messages=SimpleNamespace(create=self._record('messages.create', lambda **kwargs: None)),
+            runs=SimpleNamespace(
+                create=self._record('runs.create', self._create_run),
+                cancel=self._record('runs.cancel', lambda **kwargs: SimpleNamespace(status='cancelled')),
+                retrieve=self._record('runs.retrieve', lambda **kwargs: SimpleNamespace(status='cancelled')),
+                list=self._record('runs.list', lambda **kwargs: SimpleNamespace(data=[SimpleNamespace(id='run_active')])),
+            ),
+        ))
+
+    def _record(self, name, func):
+        def wrapper(**kwargs):
+            self.calls[name] += 1
+            return func(**kwargs)
+        return wrapper
+
+    def _create_and_run(self, stream=False, **kwargs):
+        if stream:
+            return iter([SimpleNamespace(event='thread.created', data=SimpleNamespace(id='thread_new'))])
+        return SimpleNamespace(id='run_new', thread_id='thread_new')
+
+    def _create_run(self, thread_id, stream=False, **kwargs):
+        self.run_kwargs.append(kwargs)
+        if self.failures:
+            raise self.failures.pop(0)
+        if stream:
+            return iter([])
+        return SimpleNamespace(id='run', thread_id=thread_id)
+
+
+@pytest.fixture
+def turn(monkeypatch):
+    flask_app = Flask(__name__)
+    flask_app.secret_key = 'test'
+    monkeypatch.setattr(ask_helpers, 'touch_thread', lambda *args: None)
+
+    def run_turn(thread_id=None, failures=(), stream=False):
+        client = StubClient(failures)
+        monkeypatch.setattr(ask_helpers, 'get_openai_client', lambda: client)
+        with flask_app.test_request_context():
+            if thread_id:
+                session['thread_id'] = thread_id
+            result = ask_helpers.create_or_get_thread("Do you carry fly masks?", stream=stream)
+            return client, result[0], session.get('thread_id')
+    return run_turn
+
+
+@pytest.mark.parametrize('stream', [False, True])
+def test_new_session_creates_thread_and_run_in_one_call(turn, stream):
+    client, thread_id, stored = turn(stream=stream)
+    assert client.calls == Counter({'threads.create_and_run': 1})
+    assert thread_id == stored == 'thread_new'
+
+
+@pytest.mark.parametrize('stream', [False, True])
+def test_existing_thread_appends_and_runs_in_one_call(turn, stream):
+    client, thread_id, stored = turn('thread_old', stream=stream)
+    assert client.calls == Counter({'runs.create': 1})
+    assert client.run_kwargs[0]['additional_messages'][0]['role'] == 'user'
+    assert thread_id == stored == 'thread_old'
+
+
+def test_deleted_thread_moves_to_a_new_thread(turn):
+    client, thread_id, stored = turn('thread_old', [api_error(NotFoundError, 404, 'No thread found')])
+    assert client.calls == Counter({'runs.create': 1, 'threads.create_and_run': 1})
+    assert thread_id == stored == 'thread_new'
+
+
+def test_active_run_is_cancelled_and_the_thread_kept(turn):
+    conflict = api_error(BadRequestError, 400, 'Thread thread_old already has an active run run_active.')
+    client, thread_id, stored = turn('thread_old', [conflict])
+    assert client.calls == Counter({'runs.create': 2, 'runs.cancel': 1})
+    assert thread_id == stored == 'thread_old'
+
+
+@pytest.mark.parametrize('error', [
+    api_error(InternalServerError, 500, 'The server had an error'),
+    api_error(BadRequestError, 400, 'Invalid assistant_id'),
+])
+def test_other_errors_keep_the_thread_and_reach_the_caller(turn, error):
+    with pytest.raises(type(error)):
+        turn('thread_old', [error])
@@ -0,0 +1,76 @@
+import time
+
+import pytest
+import redis
+
+from app import product_cache as cache_module
+from app.product_cache import DEFAULT_TTL, KEY_PREFIX, PRICE_TTL, STOCK_TTL, ProductInfoCache, entry_ttl
+
+
+class FakeRedis:
+    def __init__(self, keys=(), lock_error=False):
+        self.keys = set(keys)
+        self.lock_error = lock_error
+        self.unlinks = []
+
+    def get(self, key):
+        return None
+
+    def scan_iter(self, match=None, count=None):
+        return iter(sorted(self.keys))
+
+    def unlink(self, *keys):
+        self.unlinks.append(len(keys))
+        found = self.keys & set(keys)
+        self.keys -= found
+        return len(found)
+
+    def set(self, *args, **kwargs):
+        if self.lock_error:
+            raise redis.ConnectionError('Connection refused')
+        return True
+
+    def publish(self, channel, message):
+        pass
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    product_cache = ProductInfoCache()
+    monkeypatch.setattr(product_cache, '_subscriber', False)
+    monkeypatch.setattr(product_cache, '_flush_counters', lambda force=False: None)
+
+    def use_redis(fake):
+        monkeypatch.setattr(cache_module, 'redis_connection', fake)
+        return fake
+    return product_cache, use_redis
+
+
+@pytest.mark.parametrize('product_info, ttl', [
+    ({'name': 'Fly Mask'}, DEFAULT_TTL),
+    ({'name': 'Fly Mask', 'Price': '25'}, PRICE_TTL),
+    ({'name': 'Fly Mask', 'variations': [{'size': 'Cob', 'price': '25'}]}, PRICE_TTL),
+    ({'name': 'Fly Mask', 'variations': [{'attributes': {'stock_status': 'instock'}}]}, STOCK_TTL),
+])
+def test_entry_ttl_reads_nested_variations(product_info, ttl):
+    assert entry_ttl(product_info) == ttl
+
+
+def test_refresh_is_skipped_when_the_lock_is_unavailable(cache):
+    product_cache, use_redis = cache
+    use_redis(FakeRedis(lock_error=True))
+    product_cache._local_set('7', {'data': {'name': 'old'}, 'fetched_at': time.time() - DEFAULT_TTL - 1, 'ttl': DEFAULT_TTL})
+    calls = []
+    assert product_cache.get(7, lambda: calls.append(1) or {'name': 'new'}) == {'name': 'old'}
+    product_cache._refresh_executor.shutdown(wait=True)
+    assert calls == []
+    assert product_cache._refreshing == set()
+
+
+def test_invalidate_all_unlinks_in_scan_batches(cache, monkeypatch):
+    product_cache, use_redis = cache
+    monkeypatch.setattr(cache_module, 'INVALIDATE_BATCH_SIZE', 2)
+    fake = use_redis(FakeRedis(f'{KEY_PREFIX}{n}' for n in range(5)))
+    assert product_cache.invalidate() == 5
+    assert fake.unlinks == [2, 2, 1]
+    assert fake.keys == set()
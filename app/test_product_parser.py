@@ -0,0 +1,98 @@
+import random
+import string
+
+import pytest
+
+from app.product_parser import FIELDS, extract_products
+
+LABELS = {key: label for label, key in FIELDS.items()}
+PROSE = [
+    "Here are a few options that should suit you and your horse.",
+    "These are all popular with riders who trail ride often.",
+    "Let me know if you'd like something in a different colour!",
+]
+
+
+def random_value(rng, key):
+    if key in ('id', 'WcRatingCount'):
+        return str(rng.randrange(1, 10 ** 6))
+    if key in ('Price', 'SalePrice', 'WcReviewAverage'):
+        return f"{rng.uniform(1, 500):.2f}"
+    if key in ('permalink', 'image_url'):
+        return f"https://eqbay.co/{''.join(rng.choices(string.ascii_lowercase, k=12))}"
+    words = rng.choices(['padded', 'leather', 'Fly', 'Mask', 'ID:', 'Price', 'bridle', '>', 'Western', '5"'], k=rng.randint(1, 12))
+    return ' '.join(words)
+
+
+def random_product(rng, layout):
+    # The layout's first field is always kept, so back-to-back products stay separable
+    keys = [key for position, key in enumerate(layout) if position == 0 or rng.random() < 0.6]
+    return {key: random_value(rng, key) for key in keys}
+
+
+def render_field(rng, key, value):
+    style = rng.random()
+    if style < 0.2:
+        return f"- **{LABELS[key]}:** {value}"
+    if style < 0.3:
+        return f"  {LABELS[key]}: {value}"
+    return f"{LABELS[key]}: {value}"
+
+
+def render(rng, products, headings):
+    lines = [rng.choice(PROSE), '']
+    for number, product in enumerate(products, start=1):
+        if headings:
+            lines.append(rng.choice([f"### {number}. Option", f"{number}. **Option {number}**", "## Product"]))
+        for key, value in product.items():
+            lines.append(render_field(rng, key, value))
+            # Blank lines and asides between fields stay inside the product
+            if rng.random() < 0.3:
+                lines.append('')
+            if rng.random() < 0.1:
+                lines.append(rng.choice(PROSE))
+        lines.append(rng.choice(PROSE + ['']))
+    return '\n'.join(lines)
+
+
+def random_layout(rng):
+    keys = list(FIELDS.values())
+    rng.shuffle(keys)
+    return keys
+
+
+@pytest.mark.parametrize('seed', range(500))
+def test_round_trip(seed):
+    rng = random.Random(seed)
+    headings = rng.random() < 0.5
+    # With headings every product picks its own field order, ID anywhere;
+    # without them products share one order, as a model's template would
+    shared = random_layout(rng)
+    products = [random_product(rng, random_layout(rng) if headings else shared) for _ in range(rng.randint(0, 20))]
+    assert extract_products(render(rng, products, headings)) == products
+
+
+def test_id_in_the_middle_of_each_record():
+    text = "Title: Fly Mask\nID: 101\nPrice: 25\nTitle: Halter\nID: 202\nPrice: 40"
+    assert extract_products(text) == [
+        {'title': 'Fly Mask', 'id': '101', 'Price': '25'},
+        {'title': 'Halter', 'id': '202', 'Price': '40'},
+    ]
+
+
+def test_blank_lines_between_fields_keep_one_product():
+    text = "ID: 101\n\nTitle: Fly Mask\n\n\nPrice: 25\n"
+    assert extract_products(text) == [{'id': '101', 'title': 'Fly Mask', 'Price': '25'}]
+
+
+def test_heading_starts_a_new_product():
+    text = "### 1. Fly Mask\nTitle: Fly Mask\nID: 101\n\n### 2. Halter\nPrice: 40\nID: 202"
+    assert extract_products(text) == [{'title': 'Fly Mask', 'id': '101'}, {'Price': '40', 'id': '202'}]
+
+
+def test_labels_mid_sentence_are_not_fields():
+    assert extract_products("The one with ID: 101 is cheaper. Price: 25 today.") == []
+
+
+def test_sale_price_is_not_read_as_price():
+    assert extract_products("ID: 7\nSalePrice: 19.99") == [{'id': '7', 'SalePrice': '19.99'}]
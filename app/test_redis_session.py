@@ -0,0 +1,171 @@
+import os
+from collections import Counter
+from datetime import timedelta
+
+import pytest
+from flask import Flask, jsonify, session
+
+from app.redis_session import LazyRedisSessionInterface
+
+SKIP_PATHS = ['/static/', '/test_json']
+LIFETIME = 3600
+
+
+class CountingRedis:
+    """In-memory Redis that counts commands and round trips."""
+
+    def __init__(self):
+        self.data = {}
+        self.ttls = {}
+        self.commands = Counter()
+        self.round_trips = 0
+
+    def _command(self, name):
+        self.commands[name] += 1
+        self.round_trips += 1
+
+    def get(self, key):
+        self._command('GET')
+        return self.data.get(key)
+
+    def setex(self, key, seconds, value):
+        self._command('SETEX')
+        self.data[key] = value
+        self.ttls[key] = seconds
+
+    def expire(self, key, seconds):
+        self._command('EXPIRE')
+        self.ttls[key] = seconds
+
+    def delete(self, key):
+        self._command('DEL')
+        self.data.pop(key, None)
+
+    def pipeline(self, transaction=True):
+        return CountingPipeline(self)
+
+
+class CountingPipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.queued = []
+
+    def get(self, key):
+        self.queued.append(('GET', lambda: self.redis.data.get(key)))
+
+    def ttl(self, key):
+        self.queued.append(('TTL', lambda: self.redis.ttls.get(key, -1) if key in self.redis.data else -2))
+
+    def execute(self):
+        self.redis.round_trips += 1
+        for name, _ in self.queued:
+            self.redis.commands[name] += 1
+        return [result() for _, result in self.queued]
+
+
+def create_app(redis, permanent=False):
+    flask_app = Flask(__name__)
+    flask_app.secret_key = 'test'
+    flask_app.permanent_session_lifetime = timedelta(seconds=LIFETIME)
+    flask_app.session_interface = LazyRedisSessionInterface(redis, use_signer=True, permanent=permanent, skip_paths=SKIP_PATHS)
+
+    def ensure_session_id():
+        if 'sid' not in session:
+            session['sid'] = os.urandom(16).hex()
+        return session['sid']
+
+    @flask_app.route('/static/<path:filename>')
+    def static_file(filename):
+        return 'console.log(1)'
+
+    @flask_app.route('/test_json')
+    def test_json():
+        return jsonify({"status": "success"})
+
+    @flask_app.route('/welcome')
+    def welcome():
+        # Stands in for issue_csrf_token, which reads the cached token
+        return jsonify({"csrf_token": session.get('csrf_token', 'token')})
+
+    @flask_app.route('/ask', methods=['POST'])
+    def ask():
+        session_id = ensure_session_id()
+        if 'chat_session_started' not in session:
+            session['chat_session_started'] = True
+        if 'thread_id' not in session:
+            session['thread_id'] = 'thread_1'
+        return jsonify({"session_id": session_id})
+
+    @flask_app.route('/end_chat', methods=['POST'])
+    def end_chat():
+        ensure_session_id()
+        session.pop('chat_session_started', None)
+        return jsonify({"status": "success"})
+
+    return flask_app
+
+
+@pytest.fixture
+def redis():
+    return CountingRedis()
+
+
+@pytest.fixture
+def client(redis):
+    with create_app(redis).test_client() as client:
+        # Start from an existing chat session, as most traffic does
+        client.post('/ask')
+        redis.commands.clear()
+        redis.round_trips = 0
+        yield client
+
+
+def commands_for(client, redis, method, path):
+    redis.commands.clear()
+    redis.round_trips = 0
+    client.open(path, method=method)
+    return dict(redis.commands), redis.round_trips
+
+
+@pytest.mark.parametrize('method, path', [('GET', '/static/app.js'), ('GET', '/test_json'), ('OPTIONS', '/ask')])
+def test_skipped_routes_never_touch_redis(client, redis, method, path):
+    assert commands_for(client, redis, method, path) == ({}, 0)
+
+
+@pytest.mark.parametrize('method, path', [('GET', '/welcome'), ('POST', '/ask')])
+def test_reads_cost_one_round_trip_and_no_write(client, redis, method, path):
+    for _ in range(2):
+        assert commands_for(client, redis, method, path) == ({'GET': 1, 'TTL': 1}, 1)
+
+
+def test_change_is_written_once(client, redis):
+    assert commands_for(client, redis, 'POST', '/end_chat') == ({'GET': 1, 'TTL': 1, 'SETEX': 1}, 2)
+    assert commands_for(client, redis, 'POST', '/end_chat') == ({'GET': 1, 'TTL': 1}, 1)
+
+
+def test_new_visitor_is_written_on_first_change(redis):
+    with create_app(redis).test_client() as client:
+        assert commands_for(client, redis, 'GET', '/welcome') == ({}, 0)
+        assert commands_for(client, redis, 'POST', '/ask') == ({'SETEX': 1}, 1)
+
+
+def test_read_only_session_ttl_is_refreshed_past_half_life(client, redis):
+    key, = redis.data
+    redis.ttls[key] = LIFETIME // 2 - 1
+    commands, _ = commands_for(client, redis, 'GET', '/welcome')
+    assert commands == {'GET': 1, 'TTL': 1, 'EXPIRE': 1}
+    assert redis.ttls[key] == LIFETIME
+    # Refreshed, so the next read leaves the TTL alone
+    assert commands_for(client, redis, 'GET', '/welcome')[0] == {'GET': 1, 'TTL': 1}
+
+
+def test_refresh_resends_the_permanent_cookie(redis):
+    with create_app(redis, permanent=True).test_client() as client:
+        client.post('/ask')
+        key, = redis.data
+        redis.ttls[key] = 10
+        response = client.get('/welcome')
+        assert 'session=' in response.headers.get('Set-Cookie', '')
+        redis.ttls[key] = LIFETIME
+        response = client.get('/welcome')
+        assert 'Set-Cookie' not in response.headers
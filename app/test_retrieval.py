@@ -0,0 +1,85 @@
+import numpy as np
+import pytest
+
+from app import embeddings, retrieval
+from app.embedding_store import EmbeddingStore, save_store
+from app.lexical_index import LexicalIndex
+from app.retrieval import ProductRetriever
+
+# (id, sku, brand, category, riding style, stock status, embedding)
+PRODUCTS = [
+    ('100001', 'DV-0001', 'Dover', 'Tack>Bridles>Snaffle Bridles', 'English', 'instock', [1, 0, 0, 0]),
+    ('100002', 'HW-0002', 'Horseware', 'Horse Care>Fly Control>Fly Masks', 'Trail', 'instock', [0.9, 0.1, 0, 0]),
+    ('100003', 'HW-0003', 'Horseware', 'Horse Care>Fly Control>Fly Masks', 'Trail', 'outofstock', [0.8, 0.2, 0, 0]),
+    ('100004', 'WB-0004', 'Weatherbeeta', 'Blankets>Turnout Sheets', 'Western', 'instock', [0, 1, 0, 0]),
+    ('100005', 'T1-0005', 'Tough-1', 'Saddle Pads>Western Pads', 'Western', 'outofstock', [0, 0, 1, 0]),
+    # Embedding failed, so only the lexical side can return it
+    ('100006', 'HW-0006', 'Horseware', 'Blankets>Turnout Sheets', 'Trail', 'instock', None),
+]
+QUERY = [1, 0, 0, 0]
+
+
+def product_text(product_id, sku, brand, category, riding_style, stock_status):
+    return (
+        f"ID: {product_id}\nSku: {sku}\nTitle: {brand} {category.split('>')[-1]}\nBrands: {brand}\n"
+        f"Productcategories: {category}\nProductRidingStyle: {riding_style}\nStockStatus: {stock_status}"
+    )
+
+
+@pytest.fixture
+def retriever(tmp_path):
+    texts = [product_text(*product[:6]) for product in PRODUCTS]
+    base = str(tmp_path / 'catalog')
+    blocks = [{'text': text, 'page_num': i + 1, 'product_id': product[0]} for i, (text, product) in enumerate(zip(texts, PRODUCTS))]
+    save_store(base, blocks, [product[6] for product in PRODUCTS])
+    return ProductRetriever(EmbeddingStore.open(base), lexical=LexicalIndex.build(texts, 'test'))
+
+
+def product_ids(retriever, hits):
+    return [retriever.store.block(index)['product_id'] for index, _ in hits]
+
+
+@pytest.fixture(params=[0.0, 1.0], ids=['dense', 'sparse'])
+def filter_path(request, monkeypatch):
+    # Filtered queries either score every row and mask, or gather the candidates
+    monkeypatch.setattr(retrieval, 'DENSE_FILTER_RATIO', request.param)
+
+
+def test_unfiltered_search_ranks_by_similarity(retriever):
+    assert product_ids(retriever, retriever.search(QUERY, k=3)) == ['100001', '100002', '100003']
+
+
+@pytest.mark.parametrize('filters, expected', [
+    ({'brand': 'horseware'}, ['100002', '100003']),
+    ({'category': 'Fly Control'}, ['100002', '100003']),
+    ({'category': 'blankets'}, ['100004']),
+    ({'riding_style': 'Western', 'in_stock': True}, ['100004']),
+    ({'in_stock': False}, ['100003', '100005']),
+    ({'brand': 'Horseware', 'stock_status': 'instock'}, ['100002']),
+    ({'brand': 'Ariat'}, []),
+])
+def test_filters_narrow_the_candidates(retriever, filter_path, filters, expected):
+    assert product_ids(retriever, retriever.search(QUERY, k=10, **filters)) == expected
+
+
+def test_blocks_without_embeddings_are_never_filter_candidates(retriever):
+    assert retriever.allowed_blocks() is None
+    assert np.flatnonzero(retriever.allowed_blocks(brand='Horseware')).tolist() == [1, 2]
+
+
+def test_exact_sku_skips_the_embeddings_call(retriever, monkeypatch):
+    def fail(question):
+        raise AssertionError('embeddings called')
+    monkeypatch.setattr(embeddings, 'get_embedding', fail)
+    hits = retriever.search_text('Is HW-0003 back in stock?', k=1)
+    assert [hit['product_id'] for hit in hits] == ['100003']
+    assert hits[0]['score'] == 1.0
+
+
+def test_exact_match_respects_filters(retriever, monkeypatch):
+    queries = []
+    monkeypatch.setattr(embeddings, 'get_embedding', lambda question: queries.append(question) or QUERY)
+    hits = retriever.search_text('Is HW-0003 back in stock?', k=1, in_stock=True)
+    # The out-of-stock SKU is filtered out, so the search falls back to hybrid
+    assert queries == ['Is HW-0003 back in stock?']
+    assert [hit['product_id'] for hit in hits] != ['100003']
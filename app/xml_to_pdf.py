@@ -1,43 +1,104 @@
 import xml.etree.ElementTree as ET
 from bs4 import BeautifulSoup
-from reportlab.lib.pagesizes import letter
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, PageBreak
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.enums import TA_JUSTIFY
-from reportlab.lib.units import inch
 from io import BytesIO
 import html
 import requests
+import urllib3
 import logging
 
 def parse_xml(xml_content):
     root = ET.fromstring(xml_content)
     return root.findall('.//post')
 
+def iter_posts(source):
+    """Yield ``post`` elements one at a time from a file-like XML source.
+
+    Each post is cleared and detached from its parent once the caller moves on,
+    so memory stays flat no matter how large the catalog is.
+    """
+    stack = []
+    for event, elem in ET.iterparse(source, events=('start', 'end')):
+        if event == 'start':
+            stack.append(elem)
+            continue
+        stack.pop()
+        if elem.tag == 'post':
+            yield elem
+            elem.clear()
+            if stack:
+                stack[-1].remove(elem)
+
+def stream_posts(xml_url, timeout=60):
+    """Stream the catalog feed over HTTP and yield its posts incrementally.
+
+    Reading ``response.raw`` bypasses requests' own error wrapping, so a feed
+    that is cut off or stalls mid-stream raises urllib3 errors; they are
+    re-raised as the requests exceptions callers already handle.
+    """
+    with requests.get(xml_url, stream=True, timeout=timeout) as response:
+        response.raise_for_status()
+        # Let urllib3 undo any gzip/deflate transfer encoding while we read
+        response.raw.decode_content = True
+        try:
+            yield from iter_posts(response.raw)
+        except urllib3.exceptions.ReadTimeoutError as e:
+            raise requests.ReadTimeout(e) from e
+        except urllib3.exceptions.HTTPError as e:
+            raise requests.ConnectionError(e) from e
+
 def clean_html(content):
     if content is None:
         return ""
     soup = BeautifulSoup(content, 'html.parser')
     return soup.get_text(separator=' ', strip=True)
 
-def create_page(post, story, styles):
+def post_lines(post):
+    """Yield the ``Field: value`` lines for a post, as rendered on its PDF page."""
     for child in post:
         if child.tag == 'Content':
-            content = clean_html(html.unescape(child.text or ""))
-            story.append(Paragraph(f"Content: {content}", styles['BodyText']))
+            yield f"Content: {clean_html(html.unescape(child.text or ''))}"
         else:
-            text = child.text or ""
-            story.append(Paragraph(f"{child.tag}: {text}", styles['BodyText']))
+            yield f"{child.tag}: {child.text or ''}"
+
+def post_to_text_block(post, page_num):
+    lines = list(post_lines(post))
+    return {
+        'text': "\n".join(lines),
+        'page_num': page_num,
+        'product_id': (post.findtext('ID') or '').strip()
+    }
+
+def create_page(post, story, styles):
+    from reportlab.lib.units import inch
+    from reportlab.platypus import Paragraph, Spacer
+
+    for line in post_lines(post):
+        story.append(Paragraph(line, styles['BodyText']))
         story.append(Spacer(1, 0.2*inch))
 
+def xml_to_text_blocks(xml_url):
+    """Build one text block per catalog post straight from the XML feed.
+
+    Blocks carry the same ``Field: value`` layout ``extract_products`` parses,
+    and ``page_num`` matches the page the post would occupy in the PDF.
+    """
+    try:
+        return [post_to_text_block(post, page_num) for page_num, post in enumerate(stream_posts(xml_url), start=1)]
+    except requests.RequestException as e:
+        logging.error(f"Error fetching XML: {e}")
+        return None
+    except ET.ParseError as e:
+        logging.error(f"Error parsing XML: {e}")
+        return None
+
 def generate_pdf(xml_url):
+    # ReportLab is only loaded when the optional PDF artifact is built
+    from reportlab.lib.enums import TA_JUSTIFY
+    from reportlab.lib.pagesizes import letter
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.platypus import SimpleDocTemplate, PageBreak
+
     try:
-        response = requests.get(xml_url)
-        response.raise_for_status()
-        
-        xml_content = response.content
-        posts = parse_xml(xml_content)
-        
         buffer = BytesIO()
         doc = SimpleDocTemplate(buffer, pagesize=letter, rightMargin=72, leftMargin=72, topMargin=72, bottomMargin=18)
         
@@ -48,7 +109,7 @@ def generate_pdf(xml_url):
         
         story = []
         
-        for post in posts:
+        for post in stream_posts(xml_url):
             create_page(post, story, styles)
             story.append(PageBreak())
 